@@ -1,6 +1,8 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.utils.html import format_html
-from .models import Order, OrderItem, Cart, CartItem, OrderStatusHistory
+from .models import Order, OrderItem, Cart, CartItem, OrderStatusHistory, IdempotencyKey
+from .services import OrderService
 
 
 class OrderItemInline(admin.TabularInline):
@@ -15,8 +17,24 @@ class OrderItemInline(admin.TabularInline):
     subtotal.short_description = 'Subtotal'
 
 
+class OrderAdminForm(forms.ModelForm):
+    
+    class Meta:
+        model = Order
+        fields = '__all__'
+    
+    def clean_status(self):
+        status = self.cleaned_data['status']
+        current = self.initial.get('status')
+        if self.instance.pk and status != current and not OrderService.can_transition(current, status):
+            raise forms.ValidationError(f"An order cannot move from {current} to {status}")
+        return status
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
+    actions = ['mark_processing', 'mark_shipped', 'mark_delivered', 'mark_cancelled']
     list_display = ['order_number', 'user', 'status_badge', 'payment_status_badge', 'total', 'created_at']
     list_filter = ['status', 'payment_status', 'created_at']
     search_fields = ['order_number', 'user__email', 'user__first_name', 'user__last_name', 'email']
@@ -62,6 +80,42 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     
+    def save_model(self, request, obj, form, change):
+        if not (change and 'status' in form.changed_data):
+            return super().save_model(request, obj, form, change)
+        
+        # Save the other fields, then move the status through the state machine
+        status = obj.status
+        obj.status = form.initial['status']
+        super().save_model(request, obj, form, change)
+        OrderService.transition(obj, status, user=request.user, notes='Status changed in admin')
+    
+    def _transition(self, request, queryset, status):
+        result = OrderService.transition_orders(
+            list(queryset.values_list('id', flat=True)), status, user=request.user, notes='Status changed in admin'
+        )
+        if result['updated']:
+            self.message_user(request, f"{len(result['updated'])} orders moved to {status}.", messages.SUCCESS)
+        if result['rejected']:
+            numbers = ', '.join(order['order_number'] for order in result['rejected'])
+            self.message_user(request, f"Cannot move to {status}: {numbers}", messages.WARNING)
+    
+    def mark_processing(self, request, queryset):
+        self._transition(request, queryset, 'processing')
+    mark_processing.short_description = 'Mark selected orders as processing'
+    
+    def mark_shipped(self, request, queryset):
+        self._transition(request, queryset, 'shipped')
+    mark_shipped.short_description = 'Mark selected orders as shipped'
+    
+    def mark_delivered(self, request, queryset):
+        self._transition(request, queryset, 'delivered')
+    mark_delivered.short_description = 'Mark selected orders as delivered'
+    
+    def mark_cancelled(self, request, queryset):
+        self._transition(request, queryset, 'cancelled')
+    mark_cancelled.short_description = 'Cancel selected orders'
+    
     def status_badge(self, obj):
         colors = {
             'pending': '#FFA500',
@@ -171,3 +225,14 @@ class OrderStatusHistoryAdmin(admin.ModelAdmin):
     
     def has_change_permission(self, request, obj=None):
         return False
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'status_code', 'created_at', 'expires_at']
+    list_filter = ['status_code', 'created_at']
+    search_fields = ['key']
+    readonly_fields = ['key', 'fingerprint', 'status_code', 'response_body', 'created_at', 'expires_at']
+    
+    def has_add_permission(self, request):
+        return False
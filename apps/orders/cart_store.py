@@ -0,0 +1,605 @@
+# Location: apps\orders\cart_store.py
+"""
+NexCart Cart Store
+Optional Redis-backed carts: every cart click is one or two Redis round
+trips instead of several database queries. Carts live in one hash each,
+keep the price seen when an item was added, validate stock against the
+cached product documents and are written to Cart/CartItem at checkout or
+by the write-behind task. Guests get a cart keyed by their session, merged
+into their own cart when they log in.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from decimal import Decimal
+import logging
+import uuid
+
+from core.common.redis_utils import get_redis_client
+from apps.products.cache import get_product_detail_documents
+from apps.products.images import absolute_srcset, absolute_url
+from apps.products.inventory import InsufficientStock
+from apps.products.models import Product
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+# One hash per cart: meta:<name> plus q:/p:/t:/i:<product_id> for quantity, price snapshot,
+# added at and the cart item id (the CartItem id once persisted, so both stores expose the same ids)
+CART_KEY = 'cart:{}'
+# Owners whose cart changed since it was last written to the database
+CART_DIRTY_KEY = 'cart:dirty'
+
+CART_OPERATIONS = ('add', 'update', 'remove')
+
+_datetime_field = serializers.DateTimeField()
+
+
+class CartError(Exception):
+    """A cart mutation that cannot be applied, with the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+def user_cart_owner(user):
+    return f'user:{user.pk}'
+
+
+def cart_owner(request, create=True):
+    """
+    Owner key of the request's cart: the user, or the session for guests.
+    A guest session is only started when `create` is set (cart writes);
+    returns None for a guest without one.
+    """
+    if request.user.is_authenticated:
+        return user_cart_owner(request.user)
+
+    session = request.session
+    if not session.session_key:
+        if not create:
+            return None
+        session.create()
+        # Make SessionMiddleware send the cookie
+        session.modified = True
+    return f'session:{session.session_key}'
+
+
+def owner_lookup(owner):
+    """Cart filter kwargs for an owner key"""
+    kind, _, value = owner.partition(':')
+    if kind == 'user':
+        return {'user_id': value}
+    if kind == 'session':
+        return {'session_id': value, 'user__isnull': True}
+    raise ValueError(f"Unknown cart owner: {owner}")
+
+
+def get_cart_store():
+    """RedisCartStore when CART_STORE is 'redis' and Redis is reachable, else None"""
+    if getattr(settings, 'CART_STORE', 'database') != 'redis':
+        return None
+    client = get_redis_client()
+    if client is None:
+        return None
+    return RedisCartStore(client)
+
+
+def stock_allows(document, quantity):
+    """Advisory stock check against a cached product document"""
+    return (
+        not document['track_inventory']
+        or document['allow_backorder']
+        or document['stock_quantity'] >= quantity
+    )
+
+
+def product_summary(document, request=None):
+    """ProductListSerializer output built from a cached product detail document"""
+    category = document['category']
+    data = {
+        'id': document['id'],
+        'name': document['name'],
+        'slug': document['slug'],
+        'short_description': document['short_description'],
+        'category': category['id'] if category else None,
+    }
+    if category:
+        data['category_name'] = category['name']
+    data['price'] = document['price']
+    data['compare_price'] = document['compare_price']
+    data['discount_percentage'] = document['discount_percentage']
+    data['featured_image'] = absolute_url(document['featured_image'], request)
+    data['featured_image_srcset'] = {
+        image_format: absolute_srcset(value, request) if value and request is not None else value
+        for image_format, value in document['featured_image_srcset'].items()
+    }
+    data['is_in_stock'] = document['is_in_stock']
+    data['average_rating'] = document['average_rating']
+    data['review_count'] = document['review_count']
+    data['is_featured'] = document['is_featured']
+    return data
+
+
+def resolve_operations(current, operations):
+    """
+    Replay [{op, product_id, quantity}, ...] over {product_id: quantity} and
+    return the final quantity of every product touched (0 means removed).
+    Raises CartError for a malformed operation.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise CartError('operations must be a non-empty list')
+
+    final = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in CART_OPERATIONS:
+            raise CartError(f"Operation {index}: op must be one of {', '.join(CART_OPERATIONS)}")
+        try:
+            product_id = str(uuid.UUID(str(operation.get('product_id'))))
+        except ValueError:
+            raise CartError(f"Operation {index}: invalid product_id")
+
+        quantity = 0
+        if operation['op'] != 'remove':
+            try:
+                quantity = int(operation.get('quantity', 1))
+            except (TypeError, ValueError):
+                raise CartError(f"Operation {index}: quantity must be an integer")
+            if quantity < 1:
+                raise CartError(f"Operation {index}: quantity must be at least 1")
+
+        previous = final.get(product_id, current.get(product_id, 0))
+        if operation['op'] == 'add':
+            final[product_id] = previous + quantity
+        elif operation['op'] == 'update':
+            if not previous:
+                raise CartError(f"Operation {index}: product is not in the cart", 404)
+            final[product_id] = quantity
+        else:
+            final[product_id] = 0
+    return final
+
+
+def _batch_conflicts(final, products):
+    """
+    Stock conflicts for the resulting quantities; `products` maps product ids
+    to dicts with name, stock_quantity, track_inventory, allow_backorder
+    """
+    conflicts = []
+    for product_id, quantity in final.items():
+        if not quantity:
+            continue
+        product = products.get(product_id)
+        if product is None:
+            conflicts.append({'product_id': product_id, 'name': None, 'requested': quantity, 'available': 0})
+        elif not stock_allows(product, quantity):
+            conflicts.append({
+                'product_id': product_id,
+                'name': product['name'],
+                'requested': quantity,
+                'available': product['stock_quantity'],
+            })
+    return conflicts
+
+
+def apply_operations(owner, operations):
+    """
+    Apply a batch of cart operations in one transaction: one stock query for
+    every product involved, then one DELETE, one bulk_update and one
+    bulk_create. All or nothing: raises CartError or InsufficientStock.
+    Returns the cart.
+    """
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(**owner_lookup(owner))
+        items = {str(item.product_id): item for item in CartItem.objects.select_for_update().filter(cart=cart)}
+        final = resolve_operations({product_id: item.quantity for product_id, item in items.items()}, operations)
+
+        products = {
+            str(row['id']): row for row in Product.objects.filter(
+                id__in=[product_id for product_id, quantity in final.items() if quantity], is_active=True
+            ).values('id', 'name', 'price', 'stock_quantity', 'track_inventory', 'allow_backorder')
+        }
+        conflicts = _batch_conflicts(final, products)
+        if conflicts:
+            raise InsufficientStock(conflicts)
+
+        now = timezone.now()
+        removed, changed, created = [], [], []
+        for product_id, quantity in final.items():
+            item = items.get(product_id)
+            if not quantity:
+                if item is not None:
+                    removed.append(item.pk)
+            elif item is None:
+                created.append(CartItem(cart=cart, product_id=product_id, quantity=quantity, price=products[product_id]['price']))
+            elif item.quantity != quantity:
+                item.quantity = quantity
+                item.updated_at = now
+                changed.append(item)
+
+        if removed:
+            CartItem.objects.filter(pk__in=removed).delete()
+        if changed:
+            CartItem.objects.bulk_update(changed, ['quantity', 'updated_at'])
+        if created:
+            CartItem.objects.bulk_create(created)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=now)
+    return cart
+
+
+def persist_cart(owner, cart_id, items):
+    """
+    Write a cart snapshot {product_id: {'quantity', 'price', 'id'}} to Cart/CartItem
+    (new items keep the snapshot's item id):
+    one upsert on (cart, product) plus one DELETE for items no longer in the
+    snapshot. Products deleted meanwhile are dropped. Returns the Cart.
+    """
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(**owner_lookup(owner), defaults={'id': cart_id})
+        existing = {
+            str(pk) for pk in Product.objects.filter(id__in=list(items)).values_list('id', flat=True)
+        }
+        CartItem.objects.filter(cart=cart).exclude(product_id__in=existing).delete()
+        CartItem.objects.bulk_create(
+            [
+                CartItem(
+                    **({'id': item['id']} if item.get('id') else {}),
+                    cart=cart, product_id=product_id, quantity=item['quantity'], price=item['price']
+                )
+                for product_id, item in items.items() if product_id in existing
+            ],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'price', 'updated_at'],
+        )
+        if not created:
+            Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+    return cart
+
+
+def merge_carts(guest_owner, user_owner):
+    """
+    Fold a guest cart into the user's cart: quantities of products in both
+    are added up, the user's price snapshot wins. One upsert on
+    (cart, product) writes every item. Returns the number of items merged.
+    """
+    with transaction.atomic():
+        guest = Cart.objects.filter(**owner_lookup(guest_owner)).first()
+        if guest is None:
+            return 0
+        guest_items = list(guest.items.values_list('product_id', 'quantity', 'price'))
+
+        if guest_items:
+            cart, _ = Cart.objects.get_or_create(**owner_lookup(user_owner))
+            current = dict(
+                CartItem.objects.select_for_update()
+                .filter(cart=cart, product_id__in=[product_id for product_id, _, _ in guest_items])
+                .values_list('product_id', 'quantity')
+            )
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(cart=cart, product_id=product_id, quantity=current.get(product_id, 0) + quantity, price=price)
+                    for product_id, quantity, price in guest_items
+                ],
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity', 'updated_at'],
+            )
+        guest.delete()
+    return len(guest_items)
+
+
+def merge_guest_cart(request, user):
+    """Merge the session's guest cart into `user`'s cart at login; never fails the login"""
+    session_key = request.session.session_key
+    if not session_key:
+        return 0
+
+    guest_owner = f'session:{session_key}'
+    try:
+        store = get_cart_store()
+        if store is not None:
+            merged = store.merge(guest_owner, user_cart_owner(user))
+        else:
+            merged = merge_carts(guest_owner, user_cart_owner(user))
+        if merged:
+            logger.info(f"Merged {merged} guest cart items into the cart of user {user.pk}")
+        return merged
+    except Exception as e:
+        logger.error(f"Error merging guest cart for user {user.pk}: {str(e)}")
+        return 0
+
+
+class RedisCartStore:
+    """Cart reads and mutations against Redis hashes"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _key(self, owner):
+        return CART_KEY.format(owner)
+
+    def _ttl(self):
+        return settings.CART_TTL_DAYS * 24 * 60 * 60
+
+    def _ensure(self, owner):
+        """Load the database cart into Redis the first time an owner is seen"""
+        key = self._key(owner)
+        if self.client.exists(key):
+            return
+
+        now = timezone.now().isoformat()
+        fields = {'meta:id': str(uuid.uuid4()), 'meta:created_at': now, 'meta:updated_at': now}
+        cart = Cart.objects.filter(**owner_lookup(owner)).first()
+        if cart is not None:
+            fields.update({
+                'meta:id': str(cart.id),
+                'meta:created_at': cart.created_at.isoformat(),
+                'meta:updated_at': cart.updated_at.isoformat(),
+            })
+            for item_id, product_id, quantity, price, created_at in cart.items.values_list(
+                'id', 'product_id', 'quantity', 'price', 'created_at'
+            ):
+                fields[f'q:{product_id}'] = quantity
+                fields[f'p:{product_id}'] = str(price)
+                fields[f't:{product_id}'] = created_at.isoformat()
+                fields[f'i:{product_id}'] = str(item_id)
+
+        pipe = self.client.pipeline(transaction=True)
+        for field, value in fields.items():
+            pipe.hsetnx(key, field, value)
+        pipe.expire(key, self._ttl())
+        pipe.execute()
+
+    def _touch(self, pipe, owner):
+        pipe.hset(self._key(owner), 'meta:updated_at', timezone.now().isoformat())
+        pipe.expire(self._key(owner), self._ttl())
+        pipe.sadd(CART_DIRTY_KEY, owner)
+
+    def _read(self, owner):
+        """(meta, {product_id: {'quantity', 'price', 'added_at', 'id'}}) in insertion order"""
+        key = self._key(owner)
+        raw = self.client.hgetall(key)
+        fields = {
+            (name.decode() if isinstance(name, bytes) else name): (value.decode() if isinstance(value, bytes) else value)
+            for name, value in raw.items()
+        }
+        meta = {name[5:]: value for name, value in fields.items() if name.startswith('meta:')}
+        items = {}
+        for name, value in fields.items():
+            if name.startswith('q:'):
+                product_id = name[2:]
+                items[product_id] = {
+                    'quantity': int(value),
+                    'price': Decimal(fields.get(f'p:{product_id}', '0')),
+                    'added_at': fields.get(f't:{product_id}', ''),
+                    'id': fields.get(f'i:{product_id}'),
+                }
+
+        missing = [product_id for product_id, item in items.items() if not item['id']]
+        if missing:
+            # Carts cached before items had ids get them now
+            pipe = self.client.pipeline(transaction=True)
+            for product_id in missing:
+                pipe.hsetnx(key, f'i:{product_id}', str(uuid.uuid4()))
+            pipe.hmget(key, *[f'i:{product_id}' for product_id in missing])
+            for product_id, item_id in zip(missing, pipe.execute()[-1]):
+                items[product_id]['id'] = item_id.decode() if isinstance(item_id, bytes) else item_id
+
+        items = dict(sorted(items.items(), key=lambda item: item[1]['added_at']))
+        return meta, items
+
+    def _snapshot(self, quantity, price, added_at, item_id):
+        if isinstance(price, bytes):
+            price, added_at, item_id = price.decode(), added_at.decode(), item_id.decode()
+        return {'quantity': int(quantity), 'price': Decimal(price), 'added_at': added_at, 'id': item_id}
+
+    def _item_fields(self, product_id):
+        return [f'q:{product_id}', f'p:{product_id}', f't:{product_id}', f'i:{product_id}']
+
+    def _item(self, product_id, item, document, request):
+        total = (item['price'] * item['quantity']).quantize(Decimal('0.01'))
+        return {
+            'id': item['id'],
+            'product': product_summary(document, request),
+            'quantity': item['quantity'],
+            'price': str(item['price'].quantize(Decimal('0.01'))),
+            'total_price': str(total),
+            'created_at': _datetime_field.to_representation(parse_datetime(item['added_at'])) if item['added_at'] else None,
+        }
+
+    def get_cart(self, owner, request=None):
+        """The cart in CartSerializer's shape"""
+        self._ensure(owner)
+        meta, items = self._read(owner)
+        documents = get_product_detail_documents(items)
+
+        data_items = []
+        total_items = 0
+        subtotal = Decimal('0.00')
+        for product_id, item in items.items():
+            document = documents.get(product_id)
+            if document is None:
+                # Product deleted or deactivated since it was added
+                continue
+            data_items.append(self._item(product_id, item, document, request))
+            total_items += item['quantity']
+            subtotal += item['price'] * item['quantity']
+
+        return {
+            'id': meta.get('id'),
+            'items': data_items,
+            'total_items': total_items,
+            'subtotal': str(subtotal.quantize(Decimal('0.01'))),
+            'created_at': _datetime_field.to_representation(parse_datetime(meta['created_at'])),
+            'updated_at': _datetime_field.to_representation(parse_datetime(meta['updated_at'])),
+        }
+
+    def add_item(self, owner, product_id, quantity, request=None):
+        """Add `quantity` of a product (price snapshot taken on first add)"""
+        product_id = str(product_id)
+        document = get_product_detail_documents([product_id]).get(product_id)
+        if document is None:
+            raise CartError('Product not found', 404)
+
+        self._ensure(owner)
+        key = self._key(owner)
+        current = int(self.client.hget(key, f'q:{product_id}') or 0)
+        if not stock_allows(document, current + quantity):
+            raise CartError('Insufficient stock')
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hincrby(key, f'q:{product_id}', quantity)
+        pipe.hsetnx(key, f'p:{product_id}', document['price'])
+        pipe.hsetnx(key, f't:{product_id}', timezone.now().isoformat())
+        pipe.hsetnx(key, f'i:{product_id}', str(uuid.uuid4()))
+        pipe.hmget(key, f'p:{product_id}', f't:{product_id}', f'i:{product_id}')
+        self._touch(pipe, owner)
+        results = pipe.execute()
+
+        return self._item(product_id, self._snapshot(results[0], *results[4]), document, request)
+
+    def set_quantity(self, owner, product_id, quantity, request=None):
+        """Set the quantity of an item already in the cart"""
+        product_id = str(product_id)
+        self._ensure(owner)
+        key = self._key(owner)
+        if not self.client.hexists(key, f'q:{product_id}'):
+            raise CartError('Cart item not found', 404)
+
+        document = get_product_detail_documents([product_id]).get(product_id)
+        if document is None:
+            raise CartError('Product not found', 404)
+        if not stock_allows(document, quantity):
+            raise CartError('Insufficient stock')
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(key, f'q:{product_id}', quantity)
+        pipe.hmget(key, f'p:{product_id}', f't:{product_id}', f'i:{product_id}')
+        self._touch(pipe, owner)
+        results = pipe.execute()
+
+        return self._item(product_id, self._snapshot(quantity, *results[1]), document, request)
+
+    def product_for_item(self, owner, item_id):
+        """Product id of the cart item `item_id`; raises CartError when absent"""
+        self._ensure(owner)
+        _, items = self._read(owner)
+        for product_id, item in items.items():
+            if item['id'] == str(item_id):
+                return product_id
+        raise CartError('Cart item not found', 404)
+
+    def remove_item(self, owner, product_id):
+        product_id = str(product_id)
+        self._ensure(owner)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hdel(self._key(owner), *self._item_fields(product_id))
+        self._touch(pipe, owner)
+        removed = pipe.execute()[0]
+        if not removed:
+            raise CartError('Cart item not found', 404)
+
+    def clear(self, owner):
+        self._ensure(owner)
+        key = self._key(owner)
+        item_fields = [
+            field for field in self.client.hkeys(key)
+            if not (field.decode() if isinstance(field, bytes) else field).startswith('meta:')
+        ]
+        pipe = self.client.pipeline(transaction=True)
+        if item_fields:
+            pipe.hdel(key, *item_fields)
+        self._touch(pipe, owner)
+        pipe.execute()
+
+    def apply_operations(self, owner, operations, request=None):
+        """Apply a batch of cart operations in one pipeline and return the cart"""
+        self._ensure(owner)
+        _, items = self._read(owner)
+        final = resolve_operations({product_id: item['quantity'] for product_id, item in items.items()}, operations)
+
+        documents = get_product_detail_documents([product_id for product_id, quantity in final.items() if quantity])
+        conflicts = _batch_conflicts(final, documents)
+        if conflicts:
+            raise InsufficientStock(conflicts)
+
+        key = self._key(owner)
+        now = timezone.now().isoformat()
+        pipe = self.client.pipeline(transaction=True)
+        for product_id, quantity in final.items():
+            if not quantity:
+                pipe.hdel(key, *self._item_fields(product_id))
+                continue
+            pipe.hset(key, f'q:{product_id}', quantity)
+            pipe.hsetnx(key, f'p:{product_id}', documents[product_id]['price'])
+            pipe.hsetnx(key, f't:{product_id}', now)
+            pipe.hsetnx(key, f'i:{product_id}', str(uuid.uuid4()))
+        self._touch(pipe, owner)
+        pipe.execute()
+
+        return self.get_cart(owner, request)
+
+    def merge(self, guest_owner, user_owner):
+        """Add the guest cart's items to the user's cart and drop the guest cart"""
+        guest_key = self._key(guest_owner)
+        if not self.client.exists(guest_key) and not Cart.objects.filter(**owner_lookup(guest_owner)).exists():
+            return 0
+
+        self._ensure(guest_owner)
+        _, items = self._read(guest_owner)
+        self._ensure(user_owner)
+
+        key = self._key(user_owner)
+        pipe = self.client.pipeline(transaction=True)
+        for product_id, item in items.items():
+            pipe.hincrby(key, f'q:{product_id}', item['quantity'])
+            pipe.hsetnx(key, f'p:{product_id}', str(item['price']))
+            pipe.hsetnx(key, f't:{product_id}', item['added_at'])
+            pipe.hsetnx(key, f'i:{product_id}', item['id'])
+        pipe.delete(guest_key)
+        pipe.srem(CART_DIRTY_KEY, guest_owner)
+        self._touch(pipe, user_owner)
+        pipe.execute()
+
+        Cart.objects.filter(**owner_lookup(guest_owner)).delete()
+        return len(items)
+
+    def persist(self, owner):
+        """Write the Redis cart to the database (checkout, write-behind)"""
+        if not self.client.exists(self._key(owner)):
+            # Never loaded into Redis: the database copy is current
+            self.client.srem(CART_DIRTY_KEY, owner)
+            return Cart.objects.filter(**owner_lookup(owner)).first()
+
+        # Unmark first: a change made while we write marks the cart again
+        self.client.srem(CART_DIRTY_KEY, owner)
+        meta, items = self._read(owner)
+        try:
+            return persist_cart(owner, meta['id'], items)
+        except Exception:
+            # Retry with the next write-behind run
+            self.client.sadd(CART_DIRTY_KEY, owner)
+            raise
+
+    def persist_dirty(self, batch_size=500):
+        """Write every changed cart to the database; returns the number written"""
+        written = 0
+        # Bounded by the backlog at the start, so failed carts (marked again) wait for the next run
+        remaining = self.client.scard(CART_DIRTY_KEY)
+        while remaining > 0:
+            owners = self.client.srandmember(CART_DIRTY_KEY, min(batch_size, remaining)) or []
+            if not owners:
+                break
+            remaining -= len(owners)
+            for owner in owners:
+                owner = owner.decode() if isinstance(owner, bytes) else owner
+                try:
+                    self.persist(owner)
+                    written += 1
+                except Exception as e:
+                    logger.error(f"Error persisting cart {owner}: {str(e)}")
+        return written
@@ -0,0 +1,185 @@
+# Location: apps\orders\idempotency.py
+"""
+NexCart Idempotency Keys
+Requests retried with the same Idempotency-Key header get the first
+response replayed instead of running the view again. Keys live in Redis,
+or in the idempotency_keys table when Redis is unavailable.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from datetime import timedelta
+from functools import wraps
+import hashlib
+import json
+import logging
+
+from core.common.redis_utils import get_redis_client
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_REDIS_KEY = 'idempotency:{}'
+MAX_KEY_LENGTH = 200
+
+
+def _ttl():
+    return timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def _lock_ttl():
+    return timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+
+
+def request_fingerprint(request):
+    """SHA-256 of what makes two requests "the same": method, path and body"""
+    body = JSONRenderer().render(request.data)
+    return hashlib.sha256(b'\n'.join([request.method.encode(), request.path.encode(), body])).hexdigest()
+
+
+class RedisIdempotencyStore:
+    """
+    One JSON value per key: claimed with SET NX for the lock TTL, completed
+    with SET XX for the full TTL
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def claim(self, key, fingerprint):
+        """None when claimed, else the stored record"""
+        redis_key = IDEMPOTENCY_REDIS_KEY.format(key)
+        record = {'fingerprint': fingerprint, 'status_code': None, 'response_body': None}
+        ttl = int(_lock_ttl().total_seconds())
+        if self.client.set(redis_key, json.dumps(record), nx=True, ex=ttl):
+            return None
+        stored = self.client.get(redis_key)
+        if stored is None:
+            # Expired between the two calls
+            return self.claim(key, fingerprint)
+        return json.loads(stored)
+
+    def complete(self, key, fingerprint, status_code, body):
+        record = {'fingerprint': fingerprint, 'status_code': status_code, 'response_body': body}
+        self.client.set(IDEMPOTENCY_REDIS_KEY.format(key), json.dumps(record), xx=True, ex=int(_ttl().total_seconds()))
+
+    def release(self, key):
+        self.client.delete(IDEMPOTENCY_REDIS_KEY.format(key))
+
+
+class DatabaseIdempotencyStore:
+    """
+    IdempotencyKey rows: claimed by the unique constraint on key until the
+    lock TTL, kept for the full TTL once completed
+    """
+
+    def claim(self, key, fingerprint):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(key=key, fingerprint=fingerprint, expires_at=now + _lock_ttl())
+            return None
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(key=key).values('fingerprint', 'status_code', 'response_body', 'expires_at').first()
+        if record is None or record['expires_at'] <= now:
+            IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+            return self.claim(key, fingerprint)
+        return record
+
+    def complete(self, key, fingerprint, status_code, body):
+        IdempotencyKey.objects.filter(key=key).update(
+            status_code=status_code, response_body=body, expires_at=timezone.now() + _ttl()
+        )
+
+    def release(self, key):
+        IdempotencyKey.objects.filter(key=key).delete()
+
+
+def get_idempotency_store():
+    client = get_redis_client()
+    if client is not None:
+        return RedisIdempotencyStore(client)
+    return DatabaseIdempotencyStore()
+
+
+def idempotent(scope):
+    """
+    Make a DRF view function honour the Idempotency-Key header.
+
+    The first request with a key runs the view; its response (unless it is a
+    server error) is stored for IDEMPOTENCY_KEY_TTL_HOURS and replayed for
+    every retry with the same key and body. Reusing a key with a different
+    body is rejected with 422; a retry while the first request is still
+    running gets 409, for at most IDEMPOTENCY_LOCK_SECONDS so a request that
+    died mid-flight does not block its key. The claim is not renewed: the
+    lock must outlast the worker timeout, since a request still running
+    when it expires can be run again by a retry. Requests without the
+    header are not affected.
+    Use method_decorator for class-based views.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            client_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not client_key:
+                return view_func(request, *args, **kwargs)
+            if len(client_key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            user_id = request.user.pk if request.user.is_authenticated else 'anonymous'
+            key = f'{scope}:{user_id}:{client_key}'
+            fingerprint = request_fingerprint(request)
+            store = get_idempotency_store()
+
+            record = store.claim(key, fingerprint)
+            if record is not None:
+                return _replay(record, fingerprint)
+
+            try:
+                response = view_func(request, *args, **kwargs)
+            except Exception:
+                store.release(key)
+                raise
+
+            if response.status_code >= 500:
+                # Let the client retry a failure we did not finish
+                store.release(key)
+                return response
+
+            body = json.loads(JSONRenderer().render(response.data)) if response.data is not None else None
+            try:
+                store.complete(key, fingerprint, response.status_code, body)
+            except Exception as e:
+                logger.error(f"Error storing idempotent response for {key}: {str(e)}")
+            return response
+        return wrapper
+    return decorator
+
+
+def _replay(record, fingerprint):
+    if record['fingerprint'] != fingerprint:
+        return Response(
+            {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record['status_code'] is None:
+        return Response(
+            {'error': f'A request with this {IDEMPOTENCY_HEADER} is still being processed'},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response(record['response_body'], status=record['status_code'], headers={'Idempotent-Replayed': 'true'})
+
+
+def purge_expired_keys():
+    """Delete expired database records; Redis keys expire on their own"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,86 @@
+"""
+Benchmark OrderCreateView for carts of different sizes
+Runs inside a transaction that is rolled back, so no rows are left behind
+"""
+from decimal import Decimal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.orders.models import Cart, CartItem
+from apps.orders.views import OrderCreateView
+from apps.products.models import Product
+from apps.users.models import User
+
+CHECKOUT_DATA = {
+    'email': 'bench@example.com',
+    'phone': '5550100',
+    'shipping_first_name': 'Bench',
+    'shipping_last_name': 'Mark',
+    'shipping_address_line1': '1 Benchmark Way',
+    'shipping_city': 'Testville',
+    'shipping_state': 'TS',
+    'shipping_country': 'US',
+    'shipping_postal_code': '00000',
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure checkout latency and queries per order for 1/10/50-item carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1, 10, 50])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'items':>6} {'queries':>8} {'ms/order':>9}")
+        try:
+            with transaction.atomic():
+                self._run(options['sizes'], options['repeat'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, repeat):
+        factory = APIRequestFactory()
+        view = OrderCreateView.as_view()
+        user = User.objects.create_user(email='checkout-bench@example.com')
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Checkout Bench {i}', slug=f'checkout-bench-{i}', description='Benchmark',
+                price=Decimal('10.00'), sku=f'CHECKOUT-BENCH-{i}', stock_quantity=10 ** 6
+            )
+            for i in range(max(sizes))
+        ])
+
+        for size in sizes:
+            queries = 0
+            elapsed = 0.0
+            for _ in range(repeat):
+                cart, _ = Cart.objects.get_or_create(user=user)
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, product=product, quantity=2, price=product.price)
+                    for product in products[:size]
+                ])
+
+                request = factory.post('/api/orders/create/', CHECKOUT_DATA, format='json')
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = view(request)
+                    elapsed += time.perf_counter() - start
+                if response.status_code != 201:
+                    self.stdout.write(self.style.ERROR(f'Checkout failed: {response.data}'))
+                    return
+                queries += len(captured)
+
+            self.stdout.write(f'{size:>6} {queries / repeat:>8.0f} {elapsed / repeat * 1000:>9.1f}')
+
+        self.stdout.write(self.style.SUCCESS('✓ Checkout benchmark complete (rolled back)'))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:19
+
+from django.db import migrations, models
+
+
+def create_order_number_sequence(apps, schema_editor):
+    """PostgreSQL draws order numbers from a sequence (CACHE 1 keeps them monotonic across connections)"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE SEQUENCE IF NOT EXISTS order_number_seq CACHE 1')
+
+
+def drop_order_number_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS order_number_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'order_number_sequence',
+            },
+        ),
+        migrations.RunPython(create_order_number_sequence, drop_order_number_sequence),
+    ]
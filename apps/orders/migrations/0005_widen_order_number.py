@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(db_index=True, max_length=32, unique=True),
+        ),
+    ]
@@ -4,11 +4,40 @@ NexCart Order Models
 Complete order management system
 """
 from django.db import models
+from django.db.models import DecimalField, F, IntegerField, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
-from django.utils import timezone
+from decimal import Decimal
 import uuid
 
 
+def cart_totals():
+    """Aggregate expressions for a cart's item count and subtotal"""
+    return {
+        'item_quantity_total': Coalesce(Sum('items__quantity'), Value(0), output_field=IntegerField()),
+        'item_price_total': Coalesce(
+            Sum(F('items__price') * F('items__quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+    }
+
+
+class CartQuerySet(models.QuerySet):
+    
+    def for_read(self):
+        """
+        Carts with their totals computed in SQL and their items, products and
+        categories prefetched: two queries for any number of items
+        """
+        return self.annotate(**cart_totals()).prefetch_related(
+            Prefetch(
+                'items',
+                queryset=CartItem.objects.select_related('product__category').order_by('created_at')
+            )
+        )
+
+
 class Cart(models.Model):
     """Shopping cart"""
     
@@ -25,6 +54,8 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CartQuerySet.as_manager()
+    
     class Meta:
         db_table = 'carts'
         verbose_name = 'Cart'
@@ -33,13 +64,27 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart {self.id}"
     
+    def _load_totals(self):
+        # Carts fetched with for_read() already carry the annotations
+        if not hasattr(self, 'item_quantity_total'):
+            totals = Cart.objects.filter(pk=self.pk).aggregate(**cart_totals())
+            self.item_quantity_total = totals['item_quantity_total']
+            self.item_price_total = totals['item_price_total']
+    
+    def refresh_totals(self):
+        """Drop totals loaded before the items changed"""
+        self.__dict__.pop('item_quantity_total', None)
+        self.__dict__.pop('item_price_total', None)
+    
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        self._load_totals()
+        return self.item_quantity_total
     
     @property
     def subtotal(self):
-        return sum(item.total_price for item in self.items.all())
+        self._load_totals()
+        return self.item_price_total
 
 
 class CartItem(models.Model):
@@ -69,6 +114,33 @@ class CartItem(models.Model):
         return self.price * self.quantity
 
 
+# Columns of Order that the order list serializes
+ORDER_LIST_FIELDS = ['id', 'order_number', 'status', 'payment_status', 'total', 'created_at']
+
+
+class OrderQuerySet(models.QuerySet):
+    
+    def for_list(self):
+        """Orders with only the list columns, not the ~40 address and pricing ones"""
+        return self.only(*ORDER_LIST_FIELDS)
+    
+    def for_detail(self):
+        """
+        Orders with their items and status history (and who made each change)
+        prefetched: three queries however long the order or its history
+        """
+        return self.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.order_by('created_at')),
+            Prefetch(
+                'status_history',
+                queryset=OrderStatusHistory.objects.select_related('created_by').only(
+                    'id', 'order_id', 'status', 'notes', 'created_at', 'created_by_id',
+                    'created_by__first_name', 'created_by__last_name', 'created_by__email'
+                )
+            )
+        )
+
+
 class Order(models.Model):
     """Order model"""
     
@@ -89,7 +161,7 @@ class Order(models.Model):
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    order_number = models.CharField(max_length=20, unique=True, db_index=True)
+    order_number = models.CharField(max_length=32, unique=True, db_index=True)
     
     # Customer
     user = models.ForeignKey(
@@ -161,6 +233,8 @@ class Order(models.Model):
     shipped_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         db_table = 'orders'
         verbose_name = 'Order'
@@ -181,8 +255,8 @@ class Order(models.Model):
     
     def _generate_order_number(self):
         """Generate unique order number"""
-        timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-        return f"ORD-{timestamp}-{str(uuid.uuid4())[:8].upper()}"
+        from .numbering import next_order_number
+        return next_order_number()
 
 
 class OrderItem(models.Model):
@@ -240,4 +314,41 @@ class OrderStatusHistory(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.order.order_number} - {self.status}"
\ No newline at end of file
+        return f"{self.order.order_number} - {self.status}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    First response of a request sent with an Idempotency-Key header
+    (database fallback when Redis is unavailable)
+    """
+    
+    key = models.CharField(max_length=255, unique=True)  # <scope>:<user>:<client key>
+    fingerprint = models.CharField(max_length=64)  # SHA-256 of method, path and body
+    
+    # Empty while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'idempotency_keys'
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+    
+    def __str__(self):
+        return self.key
+
+
+class OrderNumberSequence(models.Model):
+    """
+    Counter for order numbers on databases without sequences: each insert
+    takes the next auto-increment id. PostgreSQL uses order_number_seq instead.
+    """
+    
+    id = models.BigAutoField(primary_key=True)
+    
+    class Meta:
+        db_table = 'order_number_sequence'
@@ -0,0 +1,47 @@
+# Location: apps\orders\numbering.py
+"""
+NexCart Order Numbers
+Order numbers come from a database sequence, so they are unique without
+retrying on the unique index, increase monotonically and append to the
+right-hand edge of the order_number index.
+"""
+from django.db import connection
+from django.utils import timezone
+import logging
+import threading
+
+from .models import OrderNumberSequence
+
+logger = logging.getLogger(__name__)
+
+ORDER_NUMBER_SEQUENCE = 'order_number_seq'
+
+# SQLite allows a single writer; take turns in-process instead of failing
+# with "database table is locked" when threads insert at the same time
+_sequence_lock = threading.Lock()
+
+
+def format_order_number(value, day=None):
+    """
+    ORD-YYMMDD-NNNNNNNN: 19 characters, sorting in sequence order. Past
+    99,999,999 the number simply grows; any bigint sequence value fits
+    order_number's 32 characters.
+    """
+    day = day or timezone.now()
+    return f"ORD-{day.strftime('%y%m%d')}-{value:08d}"
+
+
+def next_sequence_value():
+    """Next value of the order number sequence"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [ORDER_NUMBER_SEQUENCE])
+            return cursor.fetchone()[0]
+
+    with _sequence_lock:
+        return OrderNumberSequence.objects.create().pk
+
+
+def next_order_number():
+    """Allocate the next order number"""
+    return format_order_number(next_sequence_value())
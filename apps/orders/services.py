@@ -0,0 +1,348 @@
+# Location: apps\orders\services.py
+"""
+NexCart Order Services
+Business logic for order placement and status transitions
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+from decimal import Decimal
+import logging
+import uuid
+
+from core.common.db import bulk_assign, bulk_increment
+from apps.products.cache import invalidate_product_details
+from apps.products.images import image_url
+from apps.products.inventory import InsufficientStock, hold_stock, release_reservations
+from apps.products.models import Product
+from .models import Order, OrderItem, OrderStatusHistory
+
+logger = logging.getLogger(__name__)
+
+# Columns of Product that checkout reads
+CHECKOUT_PRODUCT_FIELDS = [
+    'id', 'name', 'sku', 'featured_image', 'featured_image_urls',
+    'stock_quantity', 'track_inventory', 'allow_backorder', 'is_active',
+]
+
+
+class InvalidTransition(Exception):
+    """
+    Raised when orders cannot move to the requested status.
+    `rejected` is a list of {order_id, order_number, status}.
+    """
+
+    def __init__(self, status, rejected):
+        self.status = status
+        self.rejected = rejected
+        numbers = ', '.join(order['order_number'] or order['order_id'] for order in rejected)
+        super().__init__(f"Cannot move {numbers} to {status}")
+
+
+def _prefetched(model, rows):
+    """Queryset whose results are already known, for _prefetched_objects_cache"""
+    queryset = model.objects.none()
+    queryset._result_cache = list(rows)
+    queryset._prefetch_done = True
+    return queryset
+
+
+class OrderService:
+    """Order business logic"""
+
+    SHIPPING_COST = Decimal('10.00')  # Fixed shipping, can be dynamic
+    TAX_RATE = Decimal('0.1')  # 10% tax
+    
+    # Statuses an order may move to from each status
+    TRANSITIONS = {
+        'pending': {'processing', 'cancelled'},
+        'processing': {'shipped', 'cancelled', 'refunded'},
+        'shipped': {'delivered', 'refunded'},
+        'delivered': {'refunded'},
+        'cancelled': set(),
+        'refunded': set(),
+    }
+    # Column stamped when an order enters the status
+    STATUS_TIMESTAMPS = {'shipped': 'shipped_at', 'delivered': 'delivered_at'}
+    # Statuses the customer is emailed about
+    NOTIFIED_STATUSES = {'processing', 'shipped'}
+    # Per-order columns a transition may set (e.g. tracking numbers when shipping)
+    TRANSITION_FIELDS = ['tracking_number', 'carrier']
+
+    @staticmethod
+    def place_order(user, cart, cart_items, order_data):
+        """
+        Turn cart rows [{product_id, quantity, price}, ...] into a pending order
+        with a constant number of queries:
+
+        - one SELECT ... FOR UPDATE locks and validates every product
+        - one conditional UPDATE takes the stock (held until payment)
+        - one bulk INSERT for the order items, one UPDATE for purchase counts
+
+        Raises InsufficientStock with every conflict; nothing is written then.
+        The order comes back with items and history prefetched.
+        """
+        quantities = {str(item['product_id']): item['quantity'] for item in cart_items}
+
+        with transaction.atomic():
+            products = {
+                str(product.id): product for product in
+                Product.objects.select_for_update().filter(id__in=list(quantities)).only(*CHECKOUT_PRODUCT_FIELDS)
+            }
+            conflicts = OrderService._conflicts(quantities, products)
+            if conflicts:
+                raise InsufficientStock(conflicts)
+
+            # Hold stock for all items in one conditional UPDATE (all or nothing)
+            order_id = uuid.uuid4()
+            hold_stock(str(order_id), quantities, stock_levels={
+                product_id: product.stock_quantity for product_id, product in products.items()
+                if product.track_inventory and product.allow_backorder
+            })
+
+            subtotal = sum((item['price'] * item['quantity'] for item in cart_items), Decimal('0.00'))
+            tax = subtotal * OrderService.TAX_RATE
+            order = Order.objects.create(
+                id=order_id,
+                user=user,
+                subtotal=subtotal,
+                shipping_cost=OrderService.SHIPPING_COST,
+                tax=tax,
+                total=subtotal + OrderService.SHIPPING_COST + tax,
+                **order_data
+            )
+
+            order_items = OrderItem.objects.bulk_create([
+                OrderService._order_item(order, item, products[str(item['product_id'])])
+                for item in cart_items
+            ])
+
+            bulk_increment(Product, {
+                product_id: {'purchase_count': quantity} for product_id, quantity in quantities.items()
+            })
+            # Raw UPDATEs send no signals
+            transaction.on_commit(lambda: invalidate_product_details(list(quantities)), robust=True)
+
+            history = OrderStatusHistory.objects.create(
+                order=order,
+                status='pending',
+                notes='Order created',
+                created_by=user
+            )
+
+            cart.items.all().delete()
+
+        order._prefetched_objects_cache = {
+            'items': _prefetched(OrderItem, order_items),
+            'status_history': _prefetched(OrderStatusHistory, [history]),
+        }
+        logger.info(f"Order {order.order_number} placed with {len(order_items)} items")
+        return order
+
+    @staticmethod
+    def can_transition(current, status):
+        return status in OrderService.TRANSITIONS.get(current, ())
+    
+    @staticmethod
+    def transition(order, status, user=None, notes='', **fields):
+        """
+        Move one order to `status` (see transition_orders); `fields` are
+        TRANSITION_FIELDS such as tracking_number. Raises InvalidTransition.
+        """
+        result = OrderService.transition_orders({order.id: fields}, status, user=user, notes=notes)
+        if result['rejected']:
+            raise InvalidTransition(status, result['rejected'])
+        
+        order.refresh_from_db(fields=['status', 'updated_at', *OrderService.STATUS_TIMESTAMPS.values(), *fields])
+        return order
+    
+    @staticmethod
+    def transition_orders(orders, status, user=None, notes=''):
+        """
+        Move many orders to `status` with a constant number of statements:
+        one UPDATE ... RETURNING for the orders whose current status allows
+        it, one UPDATE for per-order fields, one INSERT for history, and a
+        single notification task for the whole set once committed.
+        
+        `orders` is a list of ids, or {order_id: {tracking_number, carrier}}.
+        Orders that cannot make the transition are left alone and reported.
+        Returns {'updated': [order_id, ...], 'rejected': [{order_id, order_number, status}, ...]}.
+        """
+        if status not in OrderService.TRANSITIONS:
+            raise ValueError(f"Unknown order status: {status}")
+        
+        pk = Order._meta.pk
+        if isinstance(orders, dict):
+            updates = {pk.to_python(order_id): fields or {} for order_id, fields in orders.items()}
+        else:
+            updates = {pk.to_python(order_id): {} for order_id in orders}
+        for fields in updates.values():
+            unknown = set(fields) - set(OrderService.TRANSITION_FIELDS)
+            if unknown:
+                raise ValueError(f"Cannot set {', '.join(sorted(unknown))} in a status transition")
+        
+        with transaction.atomic():
+            updated = OrderService._apply_transition(list(updates), status, user=user, notes=notes, updates=updates)
+        
+        rejected_ids = set(updates) - set(updated)
+        rejected = []
+        if rejected_ids:
+            found = {
+                row['id']: row for row in
+                Order.objects.filter(id__in=rejected_ids).values('id', 'order_number', 'status')
+            }
+            rejected = [
+                {
+                    'order_id': str(order_id),
+                    'order_number': found[order_id]['order_number'] if order_id in found else None,
+                    'status': found[order_id]['status'] if order_id in found else None,
+                }
+                for order_id in updates if order_id in rejected_ids
+            ]
+        
+        if updated:
+            logger.info(f"Moved {len(updated)} orders to {status}")
+        return {'updated': updated, 'rejected': rejected}
+    
+    @staticmethod
+    def _apply_transition(order_ids, status, user=None, notes='', updates=None, from_statuses=None):
+        """Transition inside the caller's transaction; returns the ids that moved"""
+        if from_statuses is None:
+            from_statuses = [
+                current for current, targets in OrderService.TRANSITIONS.items() if status in targets
+            ]
+        values = {}
+        if status in OrderService.STATUS_TIMESTAMPS:
+            values[OrderService.STATUS_TIMESTAMPS[status]] = timezone.now()
+        
+        order_ids = OrderService._set_status(order_ids, from_statuses, status, **values)
+        if not order_ids:
+            return []
+        
+        # Per-order fields, one UPDATE for each distinct set of columns
+        groups = {}
+        for order_id in order_ids:
+            fields = (updates or {}).get(order_id)
+            if fields:
+                groups.setdefault(tuple(sorted(fields)), {})[order_id] = fields
+        for fields, rows in groups.items():
+            bulk_assign(Order, rows, list(fields))
+        
+        if status == 'cancelled':
+            # Stock the orders still hold (the sweeper may already have released it)
+            release_reservations(*order_ids)
+        
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(order_id=order_id, status=status, notes=notes, created_by=user)
+            for order_id in order_ids
+        ])
+        
+        if status in OrderService.NOTIFIED_STATUSES:
+            from .tasks import send_order_notifications
+            notified = [str(order_id) for order_id in order_ids]
+            transaction.on_commit(lambda: send_order_notifications.delay(status, notified), robust=True)
+        
+        return order_ids
+    
+    @staticmethod
+    def cancel_expired_orders(created_before, batch_size=500):
+        """
+        Cancel unpaid pending orders created before `created_before`, a batch
+        at a time. Each batch claims its orders with SELECT ... FOR UPDATE
+        SKIP LOCKED (so several workers can share the backlog), flips them
+        with one UPDATE ... RETURNING, returns their held stock with one
+        UPDATE and writes their history with one INSERT.
+        Returns the number of orders cancelled.
+        """
+        cancelled = 0
+        while True:
+            with transaction.atomic():
+                claimed = list(
+                    Order.objects.select_for_update(skip_locked=True)
+                    .filter(status='pending', payment_status='pending', created_at__lt=created_before)
+                    .order_by('created_at')
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                order_ids = OrderService._apply_transition(
+                    claimed, 'cancelled', notes='Order cancelled due to payment timeout', from_statuses=['pending']
+                )
+            cancelled += len(order_ids)
+            if len(claimed) < batch_size:
+                break
+
+        return cancelled
+
+    @staticmethod
+    def _set_status(order_ids, from_statuses, status, **values):
+        """
+        Move the given orders that are still in one of `from_statuses` to
+        `status` (also setting `values` on them) in one UPDATE; returns the
+        ids that changed
+        """
+        if not order_ids:
+            return []
+
+        qn = connection.ops.quote_name
+        opts = Order._meta
+        pk = opts.pk
+        values = {'status': status, 'updated_at': timezone.now(), **values}
+
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            # No UPDATE ... RETURNING: read the matching ids under lock first
+            changed = list(
+                Order.objects.select_for_update()
+                .filter(id__in=order_ids, status__in=from_statuses)
+                .values_list('id', flat=True)
+            )
+            Order.objects.filter(id__in=changed).update(**values)
+            return changed
+
+        fields = [opts.get_field(name) for name in values]
+        sql = (
+            f'UPDATE {qn(opts.db_table)} SET {", ".join(f"{qn(field.column)} = %s" for field in fields)} '
+            f'WHERE {qn(pk.column)} IN ({", ".join(["%s"] * len(order_ids))}) '
+            f'AND {qn(opts.get_field("status").column)} IN ({", ".join(["%s"] * len(from_statuses))}) '
+            f'RETURNING {qn(pk.column)}'
+        )
+        params = [
+            *[field.get_db_prep_save(values[field.name], connection) for field in fields],
+            *[pk.get_db_prep_value(order_id, connection) for order_id in order_ids],
+            *from_statuses,
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [pk.to_python(row[0]) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _order_item(order, item, product):
+        """OrderItem snapshotting the product as it is at checkout"""
+        return OrderItem(
+            order=order,
+            product_id=product.id,
+            product_name=product.name,
+            product_sku=product.sku,
+            product_image=image_url(product.featured_image_urls, product.featured_image) or '',
+            quantity=item['quantity'],
+            price=item['price'],
+            total=item['price'] * item['quantity']
+        )
+
+    @staticmethod
+    def _conflicts(quantities, products):
+        conflicts = []
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None or not product.is_active:
+                conflicts.append({
+                    'product_id': product_id,
+                    'name': product.name if product else None,
+                    'requested': quantity,
+                    'available': 0,
+                })
+            elif product.track_inventory and not product.allow_backorder and product.stock_quantity < quantity:
+                conflicts.append({
+                    'product_id': product_id,
+                    'name': product.name,
+                    'requested': quantity,
+                    'available': product.stock_quantity,
+                })
+        return conflicts
@@ -4,9 +4,9 @@ NexCart Order Celery Tasks
 Background tasks for order processing
 """
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import send_mass_mail
 from django.conf import settings
-from .models import Order, OrderStatusHistory
+from .models import Order
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,39 +15,27 @@ logger = logging.getLogger(__name__)
 @shared_task
 def process_order(order_id):
     """Process order after payment confirmation"""
+    from .services import InvalidTransition, OrderService
+    
     try:
         order = Order.objects.get(id=order_id)
         
-        # Send order confirmation email
-        send_order_confirmation_email.delay(str(order.id))
-        
-        # Update order status
-        order.status = 'processing'
-        order.save()
-        
-        # Create status history
-        OrderStatusHistory.objects.create(
-            order=order,
-            status='processing',
-            notes='Payment confirmed, order is being processed'
-        )
+        # Validated move to processing; history and the confirmation email come with it
+        OrderService.transition(order, 'processing', notes='Payment confirmed, order is being processed')
         
         logger.info(f"Order {order.order_number} processed successfully")
         
     except Order.DoesNotExist:
         logger.error(f"Order {order_id} not found")
+    except InvalidTransition as e:
+        logger.warning(f"Order {order_id} not processed: {str(e)}")
     except Exception as e:
         logger.error(f"Error processing order {order_id}: {str(e)}")
 
 
-@shared_task
-def send_order_confirmation_email(order_id):
-    """Send order confirmation email to customer"""
-    try:
-        order = Order.objects.get(id=order_id)
-        
-        subject = f'Order Confirmation - {order.order_number}'
-        message = f"""
+def _confirmation_email(order):
+    subject = f'Order Confirmation - {order.order_number}'
+    message = f"""
         Dear {order.shipping_first_name},
         
         Thank you for your order!
@@ -60,31 +48,12 @@ def send_order_confirmation_email(order_id):
         Best regards,
         NexCart Team
         """
-        
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.email],
-            fail_silently=False,
-        )
-        
-        logger.info(f"Order confirmation email sent for {order.order_number}")
-        
-    except Order.DoesNotExist:
-        logger.error(f"Order {order_id} not found")
-    except Exception as e:
-        logger.error(f"Error sending confirmation email: {str(e)}")
+    return subject, message
 
 
-@shared_task
-def send_shipping_notification(order_id):
-    """Send shipping notification email"""
-    try:
-        order = Order.objects.get(id=order_id)
-        
-        subject = f'Your Order Has Shipped - {order.order_number}'
-        message = f"""
+def _shipping_email(order):
+    subject = f'Your Order Has Shipped - {order.order_number}'
+    message = f"""
         Dear {order.shipping_first_name},
         
         Great news! Your order has been shipped.
@@ -98,58 +67,88 @@ def send_shipping_notification(order_id):
         Best regards,
         NexCart Team
         """
+    return subject, message
+
+
+# Email sent when orders enter each status
+STATUS_EMAILS = {
+    'processing': _confirmation_email,
+    'shipped': _shipping_email,
+}
+
+
+@shared_task
+def send_order_notifications(status, order_ids):
+    """
+    Email every customer whose order moved to `status`: one query for the
+    orders and one mail connection for all messages
+    """
+    try:
+        build = STATUS_EMAILS.get(status)
+        if build is None:
+            return
         
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.email],
-            fail_silently=False,
+        orders = Order.objects.filter(id__in=order_ids).only(
+            'id', 'order_number', 'email', 'shipping_first_name', 'total', 'tracking_number', 'carrier'
         )
+        messages = [
+            (*build(order), settings.DEFAULT_FROM_EMAIL, [order.email])
+            for order in orders
+        ]
+        sent = send_mass_mail(messages, fail_silently=False)
         
-        logger.info(f"Shipping notification sent for {order.order_number}")
+        logger.info(f"Sent {sent} {status} notifications")
         
-    except Order.DoesNotExist:
-        logger.error(f"Order {order_id} not found")
     except Exception as e:
-        logger.error(f"Error sending shipping notification: {str(e)}")
+        logger.error(f"Error sending {status} notifications: {str(e)}")
 
 
 @shared_task
-def cancel_expired_orders():
+def cancel_expired_orders(batch_size=500):
     """Cancel orders that have been pending for too long"""
     from django.utils import timezone
     from datetime import timedelta
+    from .services import OrderService
     
     try:
         # Cancel orders pending for more than 24 hours
         expiry_time = timezone.now() - timedelta(hours=24)
         
-        expired_orders = Order.objects.filter(
-            status='pending',
-            payment_status='pending',
-            created_at__lt=expiry_time
-        )
+        cancelled = OrderService.cancel_expired_orders(expiry_time, batch_size=batch_size)
         
-        for order in expired_orders:
-            order.status = 'cancelled'
-            order.save()
-            
-            # Restore stock
-            from apps.products.services import ProductService
-            for item in order.items.all():
-                ProductService.restore_stock(item.product.id, item.quantity)
-            
-            # Create status history
-            OrderStatusHistory.objects.create(
-                order=order,
-                status='cancelled',
-                notes='Order cancelled due to payment timeout'
-            )
-            
-            logger.info(f"Order {order.order_number} cancelled due to expiry")
-        
-        logger.info(f"Cancelled {expired_orders.count()} expired orders")
+        logger.info(f"Cancelled {cancelled} expired orders")
+        
+    except Exception as e:
+        logger.error(f"Error cancelling expired orders: {str(e)}")
+
+
+@shared_task
+def persist_dirty_carts():
+    """Write-behind for the Redis cart store: save changed carts to the database"""
+    from .cart_store import get_cart_store
+    
+    try:
+        store = get_cart_store()
+        if store is None:
+            return
+        
+        written = store.persist_dirty()
+        if written:
+            logger.info(f"Persisted {written} carts from the cart store")
+        
+    except Exception as e:
+        logger.error(f"Error persisting carts: {str(e)}")
+
+
+@shared_task
+def purge_expired_idempotency_keys():
+    """Delete stored Idempotency-Key responses past their TTL"""
+    from .idempotency import purge_expired_keys
+    
+    try:
+        deleted = purge_expired_keys()
+        if deleted:
+            logger.info(f"Purged {deleted} expired idempotency keys")
         
     except Exception as e:
-        logger.error(f"Error cancelling expired orders: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error purging idempotency keys: {str(e)}")
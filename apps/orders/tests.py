@@ -0,0 +1,897 @@
+# Location: apps\orders\tests.py
+"""
+NexCart Order Tests
+"""
+from django.core import mail
+from django.db import DatabaseError, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework import status
+from apps.users.models import User
+from apps.products.cache import get_product_detail_documents
+from apps.products.inventory import hold_stock
+from apps.products.models import Category, Product
+from apps.products.serializers import ProductListSerializer
+from .cart_store import RedisCartStore, get_cart_store, persist_cart, product_summary, user_cart_owner
+from .idempotency import DatabaseIdempotencyStore, request_fingerprint
+from .models import Cart, CartItem, IdempotencyKey, Order, OrderItem, OrderStatusHistory
+from .numbering import format_order_number, next_order_number
+from .services import InvalidTransition, OrderService
+from .tasks import persist_dirty_carts, send_order_notifications
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+import json
+
+
+class CartReadTest(APITestCase):
+    """Test the cart read path"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='shopper@example.com')
+        self.category = Category.objects.create(name='Shoes', slug='shoes')
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('orders:cart')
+
+    def _fill(self, count):
+        products = Product.objects.bulk_create([
+            Product(name=f'Item {i}', slug=f'item-{i}', description='Test', price='2.50', sku=f'ITEM-{i}', category=self.category)
+            for i in range(count)
+        ])
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=product, quantity=2, price=product.price)
+            for product in products
+        ])
+
+    def test_two_queries_for_any_cart_size(self):
+        """Test carts of 1, 10 and 100 items load in two queries with SQL totals"""
+        for count in (1, 10, 100):
+            with self.subTest(items=count):
+                CartItem.objects.all().delete()
+                Product.objects.all().delete()
+                self._fill(count)
+                self.client.get(self.url)
+
+                with self.assertNumQueries(2):
+                    response = self.client.get(self.url)
+
+                data = response.json()
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(data['items']), count)
+                self.assertEqual(data['total_items'], 2 * count)
+                self.assertEqual(Decimal(data['subtotal']), Decimal('5.00') * count)
+                self.assertEqual(data['items'][0]['product']['category_name'], 'Shoes')
+
+    def test_totals_without_prefetch(self):
+        """Test a plain cart computes both totals with one aggregate"""
+        self._fill(3)
+        cart = Cart.objects.get(pk=self.cart.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual((cart.total_items, cart.subtotal), (6, Decimal('15.00')))
+
+    def test_empty_cart_is_created(self):
+        """Test a user without a cart gets an empty one"""
+        self.cart.delete()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.json()['total_items'], Decimal(response.json()['subtotal'])), (0, Decimal('0')))
+
+
+class CartStoreTest(APITestCase):
+    """Test the database side of the Redis cart store"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='shopper@example.com')
+        self.category = Category.objects.create(name='Shoes', slug='shoes')
+        self.products = [
+            Product.objects.create(
+                name=f'Shoe {i}', description='Test', price='30.00', compare_price='40.00',
+                sku=f'SHOE-{i}', category=self.category, stock_quantity=3
+            )
+            for i in range(3)
+        ]
+        self.owner = user_cart_owner(self.user)
+
+    @override_settings(CART_STORE='redis')
+    def test_falls_back_without_redis(self):
+        """Test the database cart is used when the cache is not Redis"""
+        self.assertIsNone(get_cart_store())
+
+    def test_product_summary_matches_list_serializer(self):
+        """Test cart items built from cached documents look like ProductListSerializer output"""
+        request = APIRequestFactory().get('/api/cart/')
+        product = Product.objects.get(pk=self.products[0].pk)
+        document = get_product_detail_documents([product.id])[str(product.id)]
+
+        expected = json.loads(JSONRenderer().render(ProductListSerializer(product, context={'request': request}).data))
+
+        self.assertEqual(product_summary(document, request), expected)
+
+    def test_persist_upserts_and_prunes(self):
+        """Test a snapshot write updates, inserts and deletes items in one pass"""
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=1, price='30.00')
+        CartItem.objects.create(cart=cart, product=self.products[1], quantity=1, price='30.00')
+        gone = str(self.products[2].id)
+
+        persist_cart(self.owner, str(cart.id), {
+            str(self.products[0].id): {'quantity': 4, 'price': Decimal('25.00')},
+            gone: {'quantity': 1, 'price': Decimal('30.00')},
+        })
+        self.products[2].delete()
+        persist_cart(self.owner, str(cart.id), {
+            str(self.products[0].id): {'quantity': 5, 'price': Decimal('25.00')},
+            gone: {'quantity': 1, 'price': Decimal('30.00')},
+        })
+
+        items = list(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity', 'price'))
+        self.assertEqual(items, [(self.products[0].id, 5, Decimal('25.00'))])
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 1)
+
+    def test_persist_creates_cart_with_store_id(self):
+        """Test the first write creates the cart under the id the store handed out"""
+        cart_id = '6f1c3c1e-0c1b-4c7e-9d6a-3f1f7a0e9b11'
+
+        persist_cart(self.owner, cart_id, {str(self.products[0].id): {'quantity': 2, 'price': Decimal('30.00')}})
+
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual((str(cart.id), cart.total_items), (cart_id, 2))
+
+
+class FakeRedis:
+    """The hash and set commands RedisCartStore uses, answering with bytes like redis-py"""
+
+    def __init__(self):
+        self.data = {}
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def hset(self, key, field, value):
+        fields = self.data.setdefault(key, {})
+        created = field not in fields
+        fields[field] = self._bytes(value)
+        return int(created)
+
+    def hsetnx(self, key, field, value):
+        if field in self.data.get(key, {}):
+            return 0
+        return self.hset(key, field, value)
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hmget(self, key, *fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hgetall(self, key):
+        return {field.encode(): value for field, value in self.data.get(key, {}).items()}
+
+    def hkeys(self, key):
+        return [field.encode() for field in self.data.get(key, {})]
+
+    def hexists(self, key, field):
+        return field in self.data.get(key, {})
+
+    def hincrby(self, key, field, amount):
+        value = int(self.hget(key, field) or 0) + amount
+        self.hset(key, field, value)
+        return value
+
+    def hdel(self, key, *fields):
+        hash_ = self.data.get(key, {})
+        return sum(hash_.pop(field, None) is not None for field in fields)
+
+    def sadd(self, key, *members):
+        members_ = self.data.setdefault(key, set())
+        added = {self._bytes(member) for member in members} - members_
+        members_.update(added)
+        return len(added)
+
+    def srem(self, key, *members):
+        members_ = self.data.get(key, set())
+        removed = {self._bytes(member) for member in members} & members_
+        members_.difference_update(removed)
+        return len(removed)
+
+    def scard(self, key):
+        return len(self.data.get(key, set()))
+
+    def srandmember(self, key, count):
+        return list(self.data.get(key, set()))[:count]
+
+
+class FakePipeline:
+    """Queues FakeRedis calls and runs them on execute()"""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.client, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
+
+
+@override_settings(CART_STORE='redis')
+class RedisCartStoreTest(APITestCase):
+    """Test the Redis cart store against an in-memory Redis"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='redis@example.com', password='testpass123')
+        self.products = [
+            Product.objects.create(name=f'Sock {i}', description='Test', price='5.00', sku=f'SOCK-{i}', stock_quantity=10)
+            for i in range(3)
+        ]
+        self.redis = FakeRedis()
+        patcher = mock.patch('apps.orders.cart_store.get_redis_client', side_effect=lambda: self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _add(self, product, quantity):
+        return self.client.post(reverse('orders:cart-add'), {'product_id': str(product.id), 'quantity': quantity}, format='json')
+
+    def test_mutations_update_redis_only(self):
+        """Test adding and updating items touches Redis and marks the cart dirty"""
+        self.client.force_authenticate(self.user)
+        self.assertIsInstance(get_cart_store(), RedisCartStore)
+
+        self.assertEqual(self._add(self.products[0], 2).status_code, status.HTTP_201_CREATED)
+        item = self._add(self.products[0], 1).json()
+        self.assertEqual(item['quantity'], 3)
+
+        response = self.client.patch(
+            reverse('orders:cart-item-operations', args=[item['id']]), {'quantity': 5}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.json()['id'], response.json()['quantity']), (item['id'], 5))
+
+        cart = self.client.get(reverse('orders:cart')).json()
+        self.assertEqual(cart['total_items'], 5)
+        self.assertEqual(cart['items'][0]['product']['id'], str(self.products[0].id))
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.redis.scard('cart:dirty'), 1)
+
+    def test_persist_round_trip_keeps_item_ids(self):
+        """Test the write-behind task writes the cart under the ids Redis handed out"""
+        self.client.force_authenticate(self.user)
+        self._add(self.products[0], 2)
+        self._add(self.products[1], 1)
+        before = self.client.get(reverse('orders:cart')).json()
+
+        persist_dirty_carts()
+
+        self.assertEqual(self.redis.scard('cart:dirty'), 0)
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(str(cart.id), before['id'])
+        self.assertEqual(
+            {str(item_id): quantity for item_id, quantity in cart.items.values_list('id', 'quantity')},
+            {item['id']: item['quantity'] for item in before['items']}
+        )
+
+        # A cold Redis reloads the same cart and ids from the database
+        self.redis.data.clear()
+        after = self.client.get(reverse('orders:cart')).json()
+        self.assertEqual(
+            [(item['id'], item['quantity']) for item in after['items']],
+            [(item['id'], item['quantity']) for item in before['items']]
+        )
+
+        response = self.client.delete(reverse('orders:cart-item-operations', args=[before['items'][0]['id']]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        persist_dirty_carts()
+        self.assertEqual(list(cart.items.values_list('product_id', flat=True)), [self.products[1].id])
+
+    def test_login_merges_guest_cart(self):
+        """Test a guest's Redis cart is added to the user's at login"""
+        store = get_cart_store()
+        store.add_item(user_cart_owner(self.user), self.products[0].id, 1)
+        self._add(self.products[0], 2)
+        self._add(self.products[2], 4)
+        guest_key = f'cart:session:{self.client.session.session_key}'
+        self.assertTrue(self.redis.exists(guest_key))
+
+        response = self.client.post(
+            reverse('users:login'), {'email': 'redis@example.com', 'password': 'testpass123'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertFalse(self.redis.exists(guest_key))
+        cart = store.get_cart(user_cart_owner(self.user))
+        self.assertEqual(
+            {item['product']['id']: item['quantity'] for item in cart['items']},
+            {str(self.products[0].id): 3, str(self.products[2].id): 4}
+        )
+
+
+class GuestCartTest(APITestCase):
+    """Test session carts for guests and their merge at login"""
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f'Cap {i}', description='Test', price='12.00', sku=f'CAP-{i}', stock_quantity=20)
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(email='guest@example.com', password='testpass123')
+
+    def _add(self, product, quantity):
+        return self.client.post(reverse('orders:cart-add'), {'product_id': str(product.id), 'quantity': quantity}, format='json')
+
+    def test_guest_cart_lives_in_session(self):
+        """Test guests can build a cart without an account"""
+        empty = self.client.get(reverse('orders:cart'))
+        self.assertEqual(empty.json()['total_items'], 0)
+        self.assertFalse(Cart.objects.exists())
+
+        self.assertEqual(self._add(self.products[0], 2).status_code, status.HTTP_201_CREATED)
+        self._add(self.products[0], 1)
+
+        response = self.client.get(reverse('orders:cart'))
+        self.assertEqual(response.json()['total_items'], 3)
+        cart = Cart.objects.get()
+        self.assertIsNone(cart.user_id)
+        self.assertEqual(cart.session_id, self.client.session.session_key)
+
+    def test_login_merges_guest_cart(self):
+        """Test login adds guest quantities to the user's cart with one upsert"""
+        user_cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=user_cart, product=self.products[0], quantity=1, price='10.00')
+        self._add(self.products[0], 2)
+        self._add(self.products[1], 4)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('users:login'), {'email': 'guest@example.com', 'password': 'testpass123'}, format='json'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "cart_items"')]
+        self.assertEqual(len(inserts), 1)
+        items = dict(CartItem.objects.filter(cart=user_cart).values_list('product_id', 'quantity'))
+        self.assertEqual(items, {self.products[0].id: 3, self.products[1].id: 4})
+        # The user's price snapshot is kept
+        self.assertEqual(CartItem.objects.get(cart=user_cart, product=self.products[0]).price, Decimal('10.00'))
+        self.assertEqual(Cart.objects.count(), 1)
+
+    def test_login_creates_user_cart(self):
+        """Test a user without a cart takes over the guest items"""
+        self._add(self.products[2], 1)
+
+        self.client.post(reverse('users:login'), {'email': 'guest@example.com', 'password': 'testpass123'}, format='json')
+
+        cart = Cart.objects.get()
+        self.assertEqual((cart.user_id, cart.total_items), (self.user.id, 1))
+
+
+class CartBatchTest(APITestCase):
+    """Test the batch cart mutation endpoint"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='batch@example.com')
+        self.products = [
+            Product.objects.create(name=f'Mug {i}', description='Test', price='8.00', sku=f'MUG-{i}', stock_quantity=5)
+            for i in range(4)
+        ]
+        self.cart = Cart.objects.create(user=self.user)
+        for product in self.products[:2]:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1, price='8.00')
+        self.client.force_authenticate(self.user)
+        self.url = reverse('orders:cart-batch')
+
+    def _ids(self, *indexes):
+        return [str(self.products[i].id) for i in indexes]
+
+    def test_applies_batch_set_based(self):
+        """Test add/update/remove run with one stock query and one write per kind"""
+        first, second, third, fourth = self._ids(0, 1, 2, 3)
+        operations = [
+            {'op': 'update', 'product_id': first, 'quantity': 4},
+            {'op': 'remove', 'product_id': second},
+            {'op': 'add', 'product_id': third, 'quantity': 2},
+            {'op': 'add', 'product_id': fourth},
+            {'op': 'add', 'product_id': third, 'quantity': 1},
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'operations': operations}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['total_items'], 8)
+        self.assertEqual(Decimal(data['subtotal']), Decimal('64.00'))
+        self.assertEqual(
+            {item['product']['id']: item['quantity'] for item in data['items']},
+            {first: 4, third: 3, fourth: 1}
+        )
+
+        sql = [q['sql'] for q in queries]
+        self.assertEqual(len([q for q in sql if q.startswith('SELECT') and 'FROM "products"' in q]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "cart_items"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "cart_items"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('DELETE FROM "cart_items"')]), 1)
+
+    def test_conflict_applies_nothing(self):
+        """Test one short item rejects the whole batch with its conflict"""
+        first, second = self._ids(0, 1)
+
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'remove', 'product_id': first},
+            {'op': 'update', 'product_id': second, 'quantity': 9},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()['conflicts'][0]['available'], 5)
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 2)
+
+    def test_rejects_malformed_operations(self):
+        """Test invalid operations are reported without changing the cart"""
+        first = self._ids(0)[0]
+
+        for operations in ([], [{'op': 'swap', 'product_id': first}], [{'op': 'add', 'product_id': 'x'}],
+                           [{'op': 'add', 'product_id': first, 'quantity': 0}]):
+            with self.subTest(operations=operations):
+                response = self.client.post(self.url, {'operations': operations}, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(CartItem.objects.get(cart=self.cart, product=self.products[0]).quantity, 1)
+
+
+CHECKOUT_DATA = {
+    'email': 'buyer@example.com',
+    'phone': '5550100',
+    'shipping_first_name': 'Ada',
+    'shipping_last_name': 'Buyer',
+    'shipping_address_line1': '1 Main Street',
+    'shipping_city': 'Springfield',
+    'shipping_state': 'SP',
+    'shipping_country': 'US',
+    'shipping_postal_code': '12345',
+}
+
+
+class CheckoutTest(APITestCase):
+    """Test set-based order placement"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com')
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Lamp {i}', slug=f'lamp-{i}', description='Test', price='15.00', sku=f'LAMP-{i}', stock_quantity=10)
+            for i in range(50)
+        ])
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('orders:order-create')
+
+    def _fill(self, count, quantity=2):
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=product, quantity=quantity, price=product.price)
+            for product in self.products[:count]
+        ])
+
+    def _statements(self, queries):
+        return [q for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+    def test_constant_queries_for_any_cart_size(self):
+        """Test carts of 1, 10 and 50 items check out with the same statements"""
+        counts = []
+        for count in (1, 10, 50):
+            with self.subTest(items=count):
+                self._fill(count)
+
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.post(self.url, CHECKOUT_DATA, format='json')
+
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(len(response.json()['items']), count)
+                self.assertEqual(Decimal(response.json()['subtotal']), Decimal('30.00') * count)
+                counts.append(len(self._statements(queries)))
+
+        self.assertEqual(len(set(counts)), 1)
+        self.assertLessEqual(counts[0], 11)
+        self.assertFalse(CartItem.objects.exists())
+        self.products[0].refresh_from_db()
+        self.assertEqual((self.products[0].stock_quantity, self.products[0].purchase_count), (4, 6))
+
+    def test_checkout_refreshes_purchase_count(self):
+        """Test cached product documents pick up the purchase count after checkout"""
+        self._fill(1)
+        product_id = str(self.products[0].id)
+        get_product_detail_documents([product_id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, CHECKOUT_DATA, format='json')
+
+        self.assertEqual(get_product_detail_documents([product_id])[product_id]['purchase_count'], 2)
+
+    def test_conflicts_write_nothing(self):
+        """Test a short product rejects checkout with no order, hold or stock change"""
+        self._fill(3)
+        Product.objects.filter(pk=self.products[1].pk).update(stock_quantity=1)
+        Product.objects.filter(pk=self.products[2].pk).update(is_active=False)
+
+        response = self.client.post(self.url, CHECKOUT_DATA, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            {c['product_id']: c['available'] for c in response.json()['conflicts']},
+            {str(self.products[1].id): 1, str(self.products[2].id): 0}
+        )
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 3)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock_quantity, 10)
+
+    def test_order_items_snapshot_products(self):
+        """Test order items keep the product name, sku and cart price"""
+        self._fill(1)
+        CartItem.objects.update(price='12.00')
+
+        self.client.post(self.url, CHECKOUT_DATA, format='json')
+
+        item = OrderItem.objects.get()
+        self.assertEqual((item.product_name, item.product_sku, item.total), ('Lamp 0', 'LAMP-0', Decimal('24.00')))
+
+
+
+class IdempotencyKeyTest(APITestCase):
+    """Test Idempotency-Key replay on checkout"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='retry@example.com')
+        self.product = Product.objects.create(name='Mug', slug='mug', description='Test', price=Decimal('8.00'), sku='MUG-1', stock_quantity=10)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2, price=self.product.price)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('orders:order-create')
+
+    def test_retry_replays_first_response(self):
+        """Test a retried checkout returns the same order without placing another"""
+        first = self.client.post(self.url, CHECKOUT_DATA, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.client.post(self.url, CHECKOUT_DATA, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(any('FROM "products"' in q['sql'] or 'FROM "carts"' in q['sql'] for q in queries))
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 8)
+
+    def test_key_reused_for_different_body(self):
+        """Test reusing a key with another payload is rejected"""
+        self.client.post(self.url, CHECKOUT_DATA, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        response = self.client.post(self.url, {**CHECKOUT_DATA, 'phone': '5550199'}, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_in_flight_claim_expires_after_lock_ttl(self):
+        """Test a claim left by a crashed request blocks retries only until the lock TTL"""
+        request = Request(APIRequestFactory().post(self.url, CHECKOUT_DATA, format='json'), parsers=[JSONParser()])
+        claimed = timezone.now()
+        DatabaseIdempotencyStore().claim(f'checkout:{self.user.pk}:abc-123', request_fingerprint(request))
+        # Outlasts gunicorn's 30s worker timeout
+        self.assertGreater(IdempotencyKey.objects.get().expires_at, claimed + timedelta(seconds=30))
+
+        blocked = self.client.post(self.url, CHECKOUT_DATA, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(blocked.status_code, status.HTTP_409_CONFLICT)
+
+        IdempotencyKey.objects.update(expires_at=claimed - timedelta(seconds=1))
+        retry = self.client.post(self.url, CHECKOUT_DATA, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 1)
+        record = IdempotencyKey.objects.get()
+        self.assertEqual(record.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(record.expires_at, claimed + timedelta(hours=23))
+
+    def test_server_error_not_stored(self):
+        """Test an unexpected checkout failure is a 500 that a retry can get past"""
+        self.client.raise_request_exception = False
+        with mock.patch.object(OrderService, 'place_order', side_effect=DatabaseError('connection lost')):
+            failed = self.client.post(self.url, CHECKOUT_DATA, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        self.assertEqual(failed.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        retry = self.client.post(self.url, CHECKOUT_DATA, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+
+    def test_invalid_body_reports_fields(self):
+        """Test serializer errors come back as a 400 naming the fields"""
+        response = self.client.post(self.url, {**CHECKOUT_DATA, 'email': 'not-an-email'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', json.dumps(response.json()))
+
+    def test_without_header_runs_checkout(self):
+        """Test requests without the header are not deduplicated"""
+        self.client.post(self.url, CHECKOUT_DATA, format='json')
+
+        response = self.client.post(self.url, CHECKOUT_DATA, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class OrderReadTest(APITestCase):
+    """Test the order list and detail read paths"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='reader@example.com')
+        self.staff = User.objects.create_user(email='staff@example.com', first_name='Sam', last_name='Staff')
+        self.client.force_authenticate(self.user)
+
+    def _order(self, items=1, history=1):
+        order = Order.objects.create(user=self.user, subtotal=Decimal('10.00'), total=Decimal('20.00'), **CHECKOUT_DATA)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_name=f'Item {i}', product_sku=f'SKU-{i}', quantity=1, price=Decimal('10.00'), total=Decimal('10.00'))
+            for i in range(items)
+        ])
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(order=order, status='pending', notes=f'Step {i}', created_by=User.objects.create_user(email=f'{order.pk}-{i}@example.com'))
+            for i in range(history)
+        ])
+        return order
+
+    def _statements(self, queries):
+        return [q['sql'] for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+    def test_list_selects_only_serialized_columns(self):
+        """Test the order list does not load address columns"""
+        for _ in range(5):
+            self._order()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('orders:order-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 5)
+        order_selects = [sql for sql in self._statements(queries) if 'FROM "orders"' in sql and 'COUNT(' not in sql]
+        self.assertEqual(len(order_selects), 1)
+        self.assertNotIn('shipping_address_line1', order_selects[0])
+        self.assertNotIn('billing_city', order_selects[0])
+
+    def test_detail_queries_do_not_grow_with_items_or_history(self):
+        """Test order detail costs the same for 1 or 20 items and history rows"""
+        counts = []
+        for size in (1, 20):
+            order = self._order(items=size, history=size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('orders:order-detail', args=[order.id]))
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.json()['items']), size)
+            self.assertEqual(len(response.json()['status_history']), size)
+            counts.append(len(self._statements(queries)))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertLessEqual(counts[0], 3)
+
+    def test_detail_history_names_who_made_the_change(self):
+        """Test created_by_name comes from the joined user"""
+        order = self._order(history=0)
+        OrderStatusHistory.objects.create(order=order, status='processing', created_by=self.staff)
+
+        response = self.client.get(reverse('orders:order-detail', args=[order.id]))
+
+        self.assertEqual(response.json()['status_history'][0]['created_by_name'], 'Sam Staff')
+
+
+class OrderNumberTest(TransactionTestCase):
+    """Test sequence-backed order numbers"""
+
+    def _allocate(self, count):
+        try:
+            return [next_order_number() for _ in range(count)]
+        finally:
+            connection.close()
+
+    def _assert_unique_and_monotonic(self, threads, per_thread):
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            batches = list(pool.map(self._allocate, [per_thread] * threads))
+
+        numbers = [number for batch in batches for number in batch]
+        self.assertEqual(len(set(numbers)), threads * per_thread)
+        for batch in batches:
+            self.assertEqual(batch, sorted(batch))
+
+    @skipUnless(connection.vendor == 'postgresql', 'order_number_seq only exists on PostgreSQL')
+    def test_concurrent_sequence_numbers_are_unique_and_monotonic(self):
+        """Test 100k numbers drawn from the PostgreSQL sequence by 8 threads never collide"""
+        self._assert_unique_and_monotonic(8, 12500)
+
+    def test_concurrent_fallback_numbers_are_unique_and_monotonic(self):
+        """Test the auto-increment fallback (serialised by a process lock on SQLite) never collides"""
+        self._assert_unique_and_monotonic(8, 500)
+
+    def test_largest_sequence_value_fits(self):
+        """Test a number past 99,999,999 still fits the order_number column"""
+        max_length = Order._meta.get_field('order_number').max_length
+
+        self.assertEqual(len(format_order_number(12)), 19)
+        self.assertLessEqual(len(format_order_number(2 ** 63 - 1)), max_length)
+
+    def test_orders_get_sequential_numbers(self):
+        """Test saving orders assigns increasing numbers"""
+        user = User.objects.create_user(email='numbered@example.com')
+        orders = [
+            Order.objects.create(user=user, subtotal=Decimal('1.00'), total=Decimal('1.00'), **CHECKOUT_DATA)
+            for _ in range(3)
+        ]
+
+        numbers = [order.order_number for order in orders]
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(len(set(numbers)), 3)
+
+
+class CancelExpiredOrdersTest(APITestCase):
+    """Test the batched cancellation of unpaid orders"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='late@example.com')
+        self.product = Product.objects.create(name='Kettle', slug='kettle', description='Test', price=Decimal('20.00'), sku='KET-1', stock_quantity=20)
+        self.cutoff = timezone.now() - timedelta(hours=24)
+
+    def _order(self, hours_old, quantity=1, **fields):
+        order = Order.objects.create(user=self.user, subtotal=Decimal('20.00'), total=Decimal('20.00'), **CHECKOUT_DATA, **fields)
+        hold_stock(str(order.id), {self.product.id: quantity})
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(hours=hours_old))
+        return order
+
+    def _stock(self):
+        return Product.objects.values_list('stock_quantity', flat=True).get(pk=self.product.pk)
+
+    def test_cancels_expired_and_returns_stock(self):
+        """Test only expired unpaid orders are cancelled, with stock and history"""
+        expired = [self._order(30, quantity=2) for _ in range(5)]
+        recent = self._order(1)
+        paid = self._order(30, payment_status='paid')
+        self.assertEqual(self._stock(), 8)
+
+        self.assertEqual(OrderService.cancel_expired_orders(self.cutoff, batch_size=2), 5)
+
+        self.assertEqual(set(Order.objects.filter(status='cancelled').values_list('id', flat=True)), {o.id for o in expired})
+        self.assertEqual(Order.objects.get(pk=recent.pk).status, 'pending')
+        self.assertEqual(Order.objects.get(pk=paid.pk).status, 'pending')
+        self.assertEqual(self._stock(), 18)
+        self.assertEqual(OrderStatusHistory.objects.filter(status='cancelled').count(), 5)
+        self.assertEqual(OrderService.cancel_expired_orders(self.cutoff), 0)
+
+    def test_batch_statements_do_not_grow_with_orders(self):
+        """Test a batch of 1 or 20 orders costs the same statements"""
+        counts = []
+        for size in (1, 20):
+            for _ in range(size):
+                self._order(30)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(OrderService.cancel_expired_orders(self.cutoff, batch_size=50), size)
+            counts.append(len([q for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+class OrderTransitionTest(APITestCase):
+    """Test the order state machine and bulk transitions"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com')
+        self.admin = User.objects.create_user(email='warehouse@example.com', role='admin')
+        self.client.force_authenticate(self.admin)
+        self.url = reverse('orders:order-bulk-transition')
+
+    def _orders(self, count, order_status='processing'):
+        return [
+            Order.objects.create(user=self.user, status=order_status, subtotal=Decimal('5.00'), total=Decimal('5.00'), **CHECKOUT_DATA)
+            for _ in range(count)
+        ]
+
+    def _ship(self, orders):
+        return self.client.post(self.url, {
+            'status': 'shipped',
+            'orders': [{'id': str(order.id), 'tracking_number': f'TRK{i}', 'carrier': 'UPS'} for i, order in enumerate(orders)],
+        }, format='json')
+
+    def test_transition_validates_and_writes_history(self):
+        """Test an allowed move stamps the order and an invalid one is refused"""
+        order = self._orders(1, 'pending')[0]
+
+        with self.assertRaises(InvalidTransition):
+            OrderService.transition(order, 'shipped')
+
+        OrderService.transition(order, 'processing', user=self.admin, notes='Paid')
+        OrderService.transition(order, 'shipped', tracking_number='TRK1', carrier='DHL')
+
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.tracking_number, order.carrier), ('shipped', 'TRK1', 'DHL'))
+        self.assertIsNotNone(order.shipped_at)
+        self.assertEqual(
+            list(order.status_history.order_by('created_at').values_list('status', 'created_by')),
+            [('processing', self.admin.id), ('shipped', None)]
+        )
+
+    def test_bulk_ship_is_set_based(self):
+        """Test shipping 1 or 50 orders costs the same statements and queues one notification"""
+        counts = []
+        for size in (1, 50):
+            orders = self._orders(size)
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+                response = self._ship(orders)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.json()['updated']), size)
+            self.assertEqual(len(callbacks), 1)
+            counts.append(len([q for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(
+            set(Order.objects.filter(status='shipped').values_list('tracking_number', flat=True)),
+            {f'TRK{i}' for i in range(50)}
+        )
+        self.assertEqual(OrderStatusHistory.objects.filter(status='shipped', created_by=self.admin).count(), 51)
+
+    def test_bulk_reports_rejected_orders(self):
+        """Test orders that cannot ship are left alone and reported"""
+        ready = self._orders(2)
+        pending = self._orders(1, 'pending')[0]
+
+        response = self._ship([*ready, pending])
+
+        self.assertEqual(len(response.json()['updated']), 2)
+        self.assertEqual(response.json()['rejected'], [
+            {'order_id': str(pending.id), 'order_number': pending.order_number, 'status': 'pending'}
+        ])
+        pending.refresh_from_db()
+        self.assertEqual((pending.status, pending.tracking_number), ('pending', ''))
+
+    def test_batched_notification_emails_each_customer(self):
+        """Test the notification task sends one email per shipped order"""
+        orders = self._orders(3)
+        self._ship(orders)
+
+        send_order_notifications('shipped', [str(order.id) for order in orders])
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn('TRK0', ''.join(message.body for message in mail.outbox))
+
+    def test_requires_admin(self):
+        """Test customers cannot move orders"""
+        self.client.force_authenticate(self.user)
+
+        response = self._ship(self._orders(1))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -11,7 +11,9 @@ from .views import (
     OrderListView,
     OrderDetailView,
     OrderCreateView,
-    cart_item_operations
+    cart_item_operations,
+    batch_cart_operations,
+    bulk_transition_orders
 )
 
 app_name = 'orders'
@@ -21,10 +23,14 @@ urlpatterns = [
     path('cart/', CartView.as_view(), name='cart'),
     path('cart/add/', add_to_cart, name='cart-add'),
     path('cart/items/<uuid:item_id>/', cart_item_operations, name='cart-item-operations'),
+    path('cart/batch/', batch_cart_operations, name='cart-batch'),
     path('cart/clear/', clear_cart, name='cart-clear'),
     
     # Orders
     path('orders/', OrderListView.as_view(), name='order-list'),
     path('orders/create/', OrderCreateView.as_view(), name='order-create'),
     path('orders/<uuid:id>/', OrderDetailView.as_view(), name='order-detail'),
+    
+    # Admin
+    path('admin/orders/transition/', bulk_transition_orders, name='order-bulk-transition'),
 ]
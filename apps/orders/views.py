@@ -6,10 +6,11 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
-from decimal import Decimal
+from django.utils.decorators import method_decorator
 
-from .models import Cart, CartItem, Order, OrderItem, OrderStatusHistory
+from .models import Cart, CartItem, Order
 from .serializers import (
     CartSerializer,
     CartItemSerializer,
@@ -19,22 +20,41 @@ from .serializers import (
 )
 from apps.products.models import Product
 from apps.products.services import ProductService
+from apps.users.permissions import IsAdmin
+from apps.products.inventory import InsufficientStock
+from .services import OrderService
+from .cart_store import CartError, apply_operations, cart_owner, get_cart_store, owner_lookup, user_cart_owner
+from .idempotency import idempotent
+
+
+# Cart of a guest who has not added anything yet (no session, no row)
+EMPTY_CART = {'id': None, 'items': [], 'total_items': 0, 'subtotal': '0.00', 'created_at': None, 'updated_at': None}
 
 
 class CartView(generics.RetrieveAPIView):
-    """Get user cart - requires authentication"""
+    """Get the cart of the user, or of the session for guests"""
     serializer_class = CartSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [AllowAny]
     
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        cart, created = Cart.objects.for_read().get_or_create(**owner_lookup(self.owner))
         return cart
+    
+    def retrieve(self, request, *args, **kwargs):
+        self.owner = cart_owner(request, create=False)
+        if self.owner is None:
+            return Response(EMPTY_CART)
+        
+        store = get_cart_store()
+        if store is not None:
+            return Response(store.get_cart(self.owner, request))
+        return super().retrieve(request, *args, **kwargs)
 
 
 @api_view(['POST'])
-@permission_classes([IsAuthenticated])
+@permission_classes([AllowAny])
 def add_to_cart(request):
-    """Add product to cart - requires authentication"""
+    """Add product to cart (guests get a session cart)"""
     try:
         product_id = request.data.get('product_id')
         quantity = int(request.data.get('quantity', 1))
@@ -42,8 +62,13 @@ def add_to_cart(request):
         if quantity < 1:
             return Response({'error': 'Quantity must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
         
+        store = get_cart_store()
+        if store is not None:
+            item = store.add_item(cart_owner(request), product_id, quantity, request)
+            return Response(item, status=status.HTTP_201_CREATED)
+        
         # Get or create cart
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        cart, created = Cart.objects.get_or_create(**owner_lookup(cart_owner(request)))
         
         # Get product
         try:
@@ -69,6 +94,8 @@ def add_to_cart(request):
         
         return Response(CartItemSerializer(cart_item).data, status=status.HTTP_201_CREATED)
         
+    except CartError as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -117,11 +144,19 @@ def remove_from_cart(request, item_id):
 
 
 @api_view(['PATCH', 'DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([AllowAny])
 def cart_item_operations(request, item_id):
     """Update or delete cart item"""
     try:
-        cart = Cart.objects.get(user=request.user)
+        owner = cart_owner(request, create=False)
+        if owner is None:
+            return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        store = get_cart_store()
+        if store is not None:
+            return _redis_cart_item_operation(store, request, owner, item_id)
+        
+        cart = Cart.objects.get(**owner_lookup(owner))
         cart_item = CartItem.objects.get(id=item_id, cart=cart)
         
         if request.method == 'PATCH':
@@ -149,16 +184,69 @@ def cart_item_operations(request, item_id):
         return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
     except CartItem.DoesNotExist:
         return Response({'error': 'Cart item not found'}, status=status.HTTP_404_NOT_FOUND)
+    except CartError as e:
+        return Response({'error': str(e)}, status=e.status_code)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _redis_cart_item_operation(store, request, owner, item_id):
+    product_id = store.product_for_item(owner, item_id)
+    if request.method == 'PATCH':
+        quantity = int(request.data.get('quantity', 1))
+        if quantity < 1:
+            return Response({'error': 'Quantity must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(store.set_quantity(owner, product_id, quantity, request))
+    
+    store.remove_item(owner, product_id)
+    return Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def batch_cart_operations(request):
+    """
+    Apply many cart changes at once and return the updated cart:
+    {"operations": [{"op": "add" | "update" | "remove", "product_id": ..., "quantity": ...}, ...]}
+    """
+    try:
+        operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        owner = cart_owner(request)
+        
+        store = get_cart_store()
+        if store is not None:
+            return Response(store.apply_operations(owner, operations, request))
+        
+        cart = apply_operations(owner, operations)
+        cart = Cart.objects.for_read().get(pk=cart.pk)
+        return Response(CartSerializer(cart, context={'request': request}).data)
+        
+    except InsufficientStock as e:
+        return Response({
+            'error': str(e),
+            'conflicts': e.conflicts
+        }, status=status.HTTP_409_CONFLICT)
+    except CartError as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['DELETE'])
-@permission_classes([IsAuthenticated])
+@permission_classes([AllowAny])
 def clear_cart(request):
-    """Clear user cart"""
+    """Clear the user's or the guest session's cart"""
     try:
-        cart = Cart.objects.get(user=request.user)
+        owner = cart_owner(request, create=False)
+        if owner is None:
+            return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        store = get_cart_store()
+        if store is not None:
+            store.clear(owner)
+            return Response({'message': 'Cart cleared'}, status=status.HTTP_204_NO_CONTENT)
+        
+        cart = Cart.objects.get(**owner_lookup(owner))
         cart.items.all().delete()
         
         return Response({'message': 'Cart cleared'}, status=status.HTTP_204_NO_CONTENT)
@@ -173,7 +261,7 @@ class OrderListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return Order.objects.for_list().filter(user=self.request.user).order_by('-created_at')
 
 
 class OrderDetailView(generics.RetrieveAPIView):
@@ -183,7 +271,7 @@ class OrderDetailView(generics.RetrieveAPIView):
     lookup_field = 'id'
     
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return Order.objects.for_detail().filter(user=self.request.user)
 
 
 class OrderCreateView(generics.CreateAPIView):
@@ -191,70 +279,38 @@ class OrderCreateView(generics.CreateAPIView):
     serializer_class = OrderCreateSerializer
     permission_classes = [IsAuthenticated]
     
+    @method_decorator(idempotent('checkout'))
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         try:
-            # Get user cart
-            cart = Cart.objects.get(user=request.user)
-            
-            if not cart.items.exists():
-                return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Validate stock for all items
-            for item in cart.items.all():
-                if not ProductService.check_stock_availability(item.product.id, item.quantity):
-                    return Response({
-                        'error': f'Insufficient stock for {item.product.name}'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Calculate totals
-            subtotal = cart.subtotal
-            shipping_cost = Decimal('10.00')  # Fixed shipping, can be dynamic
-            tax = subtotal * Decimal('0.1')  # 10% tax
-            total = subtotal + shipping_cost + tax
-            
-            # Create order
+            # Invalid input raises serializers.ValidationError, answered with 400 by DRF;
+            # anything unexpected is a server error (and is not stored for replay)
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             
-            order = Order.objects.create(
-                user=request.user,
-                subtotal=subtotal,
-                shipping_cost=shipping_cost,
-                tax=tax,
-                total=total,
-                **serializer.validated_data
-            )
+            # Redis carts are written to the database before checkout reads them
+            store = get_cart_store()
+            if store is not None:
+                owner = user_cart_owner(request.user)
+                store.persist(owner)
             
-            # Create order items
-            for item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    product_name=item.product.name,
-                    product_sku=item.product.sku,
-                    product_image=item.product.featured_image.url if item.product.featured_image else '',
-                    quantity=item.quantity,
-                    price=item.price,
-                    total=item.total_price
-                )
-                
-                # Reduce stock
-                ProductService.reduce_stock(item.product.id, item.quantity)
-                
-                # Increment purchase count
-                ProductService.increment_purchase_count(item.product.id, item.quantity)
+            # Get user cart
+            cart = Cart.objects.get(user=request.user)
+            cart_items = list(cart.items.order_by('created_at').values('product_id', 'quantity', 'price'))
             
-            # Create initial status history
-            OrderStatusHistory.objects.create(
-                order=order,
-                status='pending',
-                notes='Order created',
-                created_by=request.user
-            )
+            if not cart_items:
+                return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Clear cart
-            cart.items.all().delete()
+            try:
+                order = OrderService.place_order(request.user, cart, cart_items, serializer.validated_data)
+            except InsufficientStock as e:
+                return Response({
+                    'error': str(e),
+                    'conflicts': e.conflicts
+                }, status=status.HTTP_409_CONFLICT)
+            
+            if store is not None:
+                transaction.on_commit(lambda: store.clear(owner), robust=True)
             
             return Response(
                 OrderDetailSerializer(order).data,
@@ -263,5 +319,36 @@ class OrderCreateView(generics.CreateAPIView):
             
         except Cart.DoesNotExist:
             return Response({'error': 'Cart not found'}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
+        except DjangoValidationError as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def bulk_transition_orders(request):
+    """
+    Move many orders to one status (admin), e.g. shipping a warehouse batch:
+    {"status": "shipped", "notes": ..., "orders": [{"id": ..., "tracking_number": ..., "carrier": ...}, ...]}
+    Orders whose current status does not allow it are returned as rejected.
+    """
+    target = request.data.get('status')
+    orders = request.data.get('orders')
+    if target not in OrderService.TRANSITIONS:
+        return Response({'error': 'status must be a valid order status'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(orders, list) or not orders or not all(isinstance(order, dict) and order.get('id') for order in orders):
+        return Response({'error': 'orders must be a non-empty list of {"id": ...}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        result = OrderService.transition_orders(
+            {order['id']: {k: v for k, v in order.items() if k != 'id'} for order in orders},
+            target,
+            user=request.user,
+            notes=request.data.get('notes', '')
+        )
+    except (ValueError, DjangoValidationError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'updated': [str(order_id) for order_id in result['updated']],
+        'rejected': result['rejected']
+    })
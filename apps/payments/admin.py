@@ -3,10 +3,25 @@ from django.utils.html import format_html
 from .models import Payment, Refund
 
 
+class NeedsReviewFilter(admin.SimpleListFilter):
+    title = 'needs review'
+    parameter_name = 'needs_review'
+    
+    def lookups(self, request, model_admin):
+        return [('yes', 'Yes'), ('no', 'No')]
+    
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.exclude(review_reason='')
+        if self.value() == 'no':
+            return queryset.filter(review_reason='')
+        return queryset
+
+
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['transaction_id', 'order', 'amount', 'payment_method', 'status_badge', 'created_at']
-    list_filter = ['payment_method', 'status', 'created_at']
+    list_filter = ['payment_method', 'status', NeedsReviewFilter, 'created_at']
     search_fields = ['transaction_id', 'order__id']
     readonly_fields = ['order', 'amount', 'payment_method', 'transaction_id', 'currency', 'raw_response', 'created_at', 'updated_at', 'completed_at']
     
@@ -15,7 +30,7 @@ class PaymentAdmin(admin.ModelAdmin):
             'fields': ('order', 'transaction_id', 'amount', 'currency', 'payment_method')
         }),
         ('Status', {
-            'fields': ('status', 'completed_at')
+            'fields': ('status', 'completed_at', 'review_reason')
         }),
         ('Raw Data', {
             'fields': ('raw_response',),
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='review_reason',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -40,6 +40,10 @@ class Payment(models.Model):
     # Store raw response from payment gateway
     raw_response = models.JSONField(default=dict, blank=True)
     
+    # Set when money arrived for an order that cannot take it (e.g. already
+    # cancelled); staff refund or reconcile these by hand
+    review_reason = models.CharField(max_length=255, blank=True)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -11,6 +11,7 @@ import logging
 from decimal import Decimal
 from typing import Dict, Optional
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from apps.orders.models import Order
@@ -211,27 +212,23 @@ class MeSombPaymentService:
             raise PaymentException("Invalid webhook data")
         
         try:
-            # Update payment record
-            payment = Payment.objects.get(transaction_id=transaction_id)
-            payment.status = self._map_mesomb_status(status)
-            payment.raw_response = payload
-            payment.save()
-            
-            # Update order
-            order = Order.objects.get(id=order_id)
-            
-            if payment.status == 'completed':
-                order.payment_status = 'completed'
-                order.status = 'processing'
+            with transaction.atomic():
+                # Lock both rows so duplicate deliveries of the webhook run one at a time
+                payment = Payment.objects.select_for_update().get(transaction_id=transaction_id)
+                order = Order.objects.select_for_update().get(id=order_id)
                 
-                # Trigger order processing
-                from apps.orders.tasks import process_order
-                process_order.delay(str(order.id))
-            
-            elif payment.status == 'failed':
-                order.payment_status = 'failed'
-            
-            order.save()
+                # A completed payment is final; late or repeated webhooks cannot undo it
+                if payment.status != 'completed':
+                    payment.status = self._map_mesomb_status(status)
+                payment.raw_response = payload
+                
+                if payment.status == 'completed':
+                    self._complete_order_payment(payment, order)
+                elif payment.status == 'failed' and order.payment_status != 'completed':
+                    order.payment_status = 'failed'
+                    order.save(update_fields=['payment_status', 'updated_at'])
+                
+                payment.save()
             
             logger.info(f"Webhook processed for order {order.order_number}")
             
@@ -245,6 +242,42 @@ class MeSombPaymentService:
             logger.error(f"Webhook processing error: {str(e)}")
             raise PaymentException(str(e))
     
+    def _complete_order_payment(self, payment, order):
+        """
+        Apply a successful payment to its (locked) order. A repeated success
+        is a no-op; money for an order that is no longer pending is kept
+        apart for refund or review instead of taking stock again.
+        """
+        from apps.orders.services import InvalidTransition, OrderService
+        from apps.products.inventory import InsufficientStock, commit_reservations
+        
+        if order.payment_status == 'completed':
+            logger.info(f"Duplicate payment confirmation for order {order.order_number}")
+            return
+        if order.status != 'pending':
+            payment.review_reason = f"Paid while order was {order.status}"
+            logger.error(f"Order {order.order_number} paid while {order.status}; payment {payment.transaction_id} needs review")
+            return
+        
+        order.payment_status = 'completed'
+        order.save(update_fields=['payment_status', 'updated_at'])
+        
+        # The stock hold becomes a sale (taken again if the hold was swept meanwhile)
+        try:
+            commit_reservations(
+                str(order.id),
+                [(item.product_id, item.quantity) for item in order.items.all() if item.product_id]
+            )
+        except InsufficientStock as e:
+            payment.review_reason = 'Paid after the stock hold expired and stock ran out'
+            logger.error(f"Order {order.order_number} paid after its stock hold expired: {str(e)}")
+        
+        # Start processing (writes history and queues the confirmation email)
+        try:
+            OrderService.transition(order, 'processing', notes='Payment confirmed, order is being processed')
+        except InvalidTransition as e:
+            logger.warning(f"Order {order.order_number} paid but not processed: {str(e)}")
+    
     def _map_mesomb_status(self, mesomb_status: str) -> str:
         """Map MeSomb status to internal payment status"""
         
@@ -0,0 +1,81 @@
+# Location: apps\payments\tests.py
+"""
+NexCart Payment Tests
+"""
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from apps.users.models import User
+from apps.orders.models import Order, OrderItem
+from apps.products.inventory import hold_stock, release_expired_reservations
+from apps.products.models import Product
+from .models import Payment
+from .services import MeSombPaymentService
+from datetime import timedelta
+from decimal import Decimal
+import json
+
+
+@override_settings(MESOMB_SECRET_KEY='webhook-test-secret')
+class PaymentWebhookTest(APITestCase):
+    """Test payment webhooks against order and stock state"""
+
+    def setUp(self):
+        user = User.objects.create_user(email='payer@example.com')
+        self.product = Product.objects.create(name='Radio', description='Test', price=Decimal('30.00'), sku='RADIO-1', stock_quantity=10)
+        self.order = Order.objects.create(
+            user=user, subtotal=Decimal('90.00'), total=Decimal('90.00'), email='payer@example.com', phone='5550100',
+            shipping_first_name='Pat', shipping_last_name='Payer', shipping_address_line1='1 Main Street',
+            shipping_city='Springfield', shipping_state='SP', shipping_country='US', shipping_postal_code='12345'
+        )
+        OrderItem.objects.create(
+            order=self.order, product=self.product, product_name='Radio', product_sku='RADIO-1',
+            quantity=3, price=Decimal('30.00'), total=Decimal('90.00')
+        )
+        self.payment = Payment.objects.create(
+            order=self.order, transaction_id='TX-1', payment_method='MTN', amount=Decimal('90.00')
+        )
+        self.service = MeSombPaymentService()
+
+    def _webhook(self, mesomb_status='SUCCESS'):
+        payload = {'transaction_id': 'TX-1', 'status': mesomb_status, 'extra': {'order_id': str(self.order.id)}}
+        with self.captureOnCommitCallbacks():
+            return self.service.process_webhook(payload, self.service._generate_signature(json.dumps(payload)))
+
+    def _stock(self):
+        return Product.objects.values_list('stock_quantity', flat=True).get(pk=self.product.pk)
+
+    def test_duplicate_success_takes_stock_once(self):
+        """Test a repeated success webhook after the hold lapsed does not reserve again"""
+        hold_stock(str(self.order.id), {self.product.id: 3}, ttl=timedelta(seconds=-1))
+        release_expired_reservations()
+
+        self._webhook()
+        self._webhook()
+
+        self.assertEqual(self._stock(), 7)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.payment_status), ('processing', 'completed'))
+        self.assertEqual(self.order.status_history.filter(status='processing').count(), 1)
+
+    def test_payment_for_cancelled_order_is_flagged(self):
+        """Test paying a cancelled order keeps its stock and flags the payment"""
+        Order.objects.filter(pk=self.order.pk).update(status='cancelled')
+
+        self._webhook()
+
+        self.assertEqual(self._stock(), 10)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertIn('cancelled', self.payment.review_reason)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.payment_status), ('cancelled', 'pending'))
+
+    def test_failure_after_success_keeps_payment(self):
+        """Test a late failure webhook does not undo a completed payment"""
+        hold_stock(str(self.order.id), {self.product.id: 3})
+        self._webhook()
+
+        self._webhook('FAILED')
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'completed')
@@ -9,6 +9,7 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 
 from apps.orders.models import Order
+from apps.orders.idempotency import idempotent
 from .services import MeSombPaymentService, PaymentException
 import logging
 
@@ -17,6 +18,7 @@ logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent('payment')
 def initiate_payment(request):
     """Initiate payment for an order"""
     try:
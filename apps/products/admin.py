@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Product, ProductImage, ProductReview, Wishlist
+from .models import Category, InventorySummary, Product, ProductImage, ProductReview, StockReservation, Wishlist
+from .images import image_url
 
 
 @admin.register(Category)
@@ -23,7 +24,7 @@ class ProductImageInline(admin.TabularInline):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 100px; max-width: 100px; object-fit: contain;" />',
-                obj.image.url
+                image_url(obj.image_urls, obj.image, 'thumbnail')
             )
         return "No image"
     image_preview.short_description = 'Preview'
@@ -73,7 +74,7 @@ class ProductAdmin(admin.ModelAdmin):
         if obj.featured_image:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px; object-fit: cover; border-radius: 4px;" />',
-                obj.featured_image.url
+                image_url(obj.featured_image_urls, obj.featured_image, 'thumbnail')
             )
         return "No image"
     image_thumbnail.short_description = 'Image'
@@ -82,7 +83,7 @@ class ProductAdmin(admin.ModelAdmin):
         if obj.featured_image:
             return format_html(
                 '<img src="{}" style="max-height: 300px; max-width: 300px; object-fit: contain;" />',
-                obj.featured_image.url
+                image_url(obj.featured_image_urls, obj.featured_image, 'card')
             )
         return "No image uploaded"
     main_image_preview.short_description = 'Current Main Image'
@@ -107,7 +108,7 @@ class ProductImageAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px; object-fit: cover; border-radius: 4px;" />',
-                obj.image.url
+                image_url(obj.image_urls, obj.image, 'thumbnail')
             )
         return "No image"
     image_thumbnail.short_description = 'Thumbnail'
@@ -116,7 +117,7 @@ class ProductImageAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 400px; max-width: 400px; object-fit: contain;" />',
-                obj.image.url
+                image_url(obj.image_urls, obj.image, 'detail')
             )
         return "No image uploaded"
     image_preview.short_description = 'Full Preview'
@@ -150,3 +151,20 @@ class WishlistAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['user__email', 'product__name']
     readonly_fields = ['created_at']
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['reference', 'product', 'quantity', 'expires_at', 'created_at']
+    search_fields = ['reference', 'product__name', 'product__sku']
+    list_select_related = ['product']
+    readonly_fields = ['product', 'reference', 'quantity', 'expires_at', 'created_at']
+
+
+@admin.register(InventorySummary)
+class InventorySummaryAdmin(admin.ModelAdmin):
+    list_display = ['product', 'stock_quantity', 'units_sold_7d', 'units_sold_30d', 'days_of_cover', 'is_low_stock', 'refreshed_at']
+    list_filter = ['is_low_stock']
+    search_fields = ['product__name', 'product__sku']
+    list_select_related = ['product']
+    readonly_fields = list_display + ['daily_sell_rate']
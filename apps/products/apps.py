@@ -0,0 +1,15 @@
+# Location: apps\products\apps.py
+"""
+NexCart Products App Configuration
+"""
+from django.apps import AppConfig
+
+
+class ProductsConfig(AppConfig):
+    name = 'apps.products'
+    label = 'products'
+    verbose_name = 'Products'
+
+    def ready(self):
+        # Register cache invalidation signal handlers
+        from . import signals  # noqa: F401
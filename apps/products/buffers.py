@@ -0,0 +1,154 @@
+# Location: apps\products\buffers.py
+"""
+NexCart Write Buffers
+Accumulate product view counts and user activity in Redis and flush them in batches
+"""
+from core.common.db import bulk_increment
+from core.common.redis_utils import get_redis_client
+from .cache import invalidate_product_details
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+VIEW_COUNT_BUFFER_KEY = 'buffer:product_views'
+ACTIVITY_BUFFER_KEY = 'buffer:user_activity'
+
+
+def buffer_product_view(product_id, count=1):
+    """HINCRBY the pending view count; returns False when Redis is unavailable"""
+    client = get_redis_client()
+    if client is None:
+        return False
+    try:
+        client.hincrby(VIEW_COUNT_BUFFER_KEY, str(product_id), count)
+        return True
+    except Exception as e:
+        logger.error(f"Error buffering product view: {str(e)}")
+        return False
+
+
+def get_pending_views(product_id):
+    """Views buffered for a product but not yet flushed to the database"""
+    client = get_redis_client()
+    if client is None:
+        return 0
+    try:
+        return int(client.hget(VIEW_COUNT_BUFFER_KEY, str(product_id)) or 0)
+    except Exception as e:
+        logger.error(f"Error reading pending views: {str(e)}")
+        return 0
+
+
+def buffer_activity(activity):
+    """Push an activity event onto the Redis list; returns False when Redis is unavailable"""
+    client = get_redis_client()
+    if client is None:
+        return False
+    try:
+        event = {key: str(value) if value is not None else None for key, value in activity.items()}
+        client.rpush(ACTIVITY_BUFFER_KEY, json.dumps(event))
+        return True
+    except Exception as e:
+        logger.error(f"Error buffering user activity: {str(e)}")
+        return False
+
+
+def apply_view_counts(view_counts):
+    """Apply {product_id: views} in aggregated UPDATE ... FROM (VALUES ...) batches"""
+    from .models import Product
+
+    return bulk_increment(
+        Product,
+        {product_id: {'view_count': views} for product_id, views in view_counts.items() if views}
+    )
+
+
+def create_activities(events):
+    """bulk_create UserActivity rows, dropping events whose user or product no longer exists"""
+    from apps.users.models import User, UserActivity
+    from .models import Product
+
+    if not events:
+        return 0
+
+    product_ids = {e['product_id'] for e in events if e.get('product_id')}
+    user_ids = {e['user_id'] for e in events if e.get('user_id')}
+    existing_products = {
+        str(pk) for pk in Product.objects.filter(id__in=product_ids).values_list('id', flat=True)
+    }
+    existing_users = {
+        str(pk) for pk in User.objects.filter(id__in=user_ids).values_list('id', flat=True)
+    }
+
+    activities = []
+    for event in events:
+        product_id = event.get('product_id')
+        user_id = event.get('user_id')
+        if (product_id and product_id not in existing_products) or (user_id and user_id not in existing_users):
+            continue
+        activities.append(UserActivity(
+            user_id=user_id,
+            session_id=event.get('session_id') or '',
+            activity_type=event['activity_type'],
+            product_id=product_id,
+        ))
+
+    UserActivity.objects.bulk_create(activities, batch_size=500)
+    return len(activities)
+
+
+def flush_view_counts():
+    """Drain the view-count hash and apply it to the products table"""
+    client = get_redis_client()
+    if client is None:
+        return 0
+
+    pipe = client.pipeline(transaction=True)
+    pipe.hgetall(VIEW_COUNT_BUFFER_KEY)
+    pipe.delete(VIEW_COUNT_BUFFER_KEY)
+    pending, _ = pipe.execute()
+
+    view_counts = {key.decode(): int(value) for key, value in pending.items()}
+    try:
+        apply_view_counts(view_counts)
+    except Exception:
+        # Put the counts back so the next flush retries them
+        pipe = client.pipeline(transaction=False)
+        for product_id, views in view_counts.items():
+            pipe.hincrby(VIEW_COUNT_BUFFER_KEY, product_id, views)
+        pipe.execute()
+        raise
+
+    # The raw UPDATE sends no signals: drop the documents holding the old counts,
+    # or their view_count would fall back to the build-time value
+    invalidate_product_details(list(view_counts))
+    return len(view_counts)
+
+
+def flush_activities(batch_size=1000):
+    """Drain the activity list in batches of `batch_size` events"""
+    client = get_redis_client()
+    if client is None:
+        return 0
+
+    created = 0
+    while True:
+        pipe = client.pipeline(transaction=True)
+        pipe.lrange(ACTIVITY_BUFFER_KEY, 0, batch_size - 1)
+        pipe.ltrim(ACTIVITY_BUFFER_KEY, batch_size, -1)
+        raw_events, _ = pipe.execute()
+        if not raw_events:
+            break
+
+        events = [json.loads(raw) for raw in raw_events]
+        try:
+            created += create_activities(events)
+        except Exception:
+            client.lpush(ACTIVITY_BUFFER_KEY, *reversed(raw_events))
+            raise
+
+        if len(raw_events) < batch_size:
+            break
+
+    return created
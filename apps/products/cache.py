@@ -0,0 +1,288 @@
+# Location: apps\products\cache.py
+"""
+NexCart Product Caching
+Versioned full-response cache with ETag/Last-Modified for public catalog endpoints,
+and write-through product detail documents
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe, quote_etag, parse_etags
+from rest_framework.renderers import JSONRenderer
+from .images import absolute_url, absolute_srcset
+from urllib.parse import urlencode
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'catalog:version'
+RESPONSE_CACHE_PREFIX = 'catalog:response'
+RESPONSE_STATS_PREFIX = 'catalog:response_stats'
+
+# cache_name of every view using CachedResponseMixin (reported by the stats endpoint)
+CACHED_CATALOG_VIEWS = ['categories', 'featured_products', 'product_list']
+
+PRODUCT_DETAIL_KEY = 'product_detail_{}'
+PRODUCT_STOCK_KEY = 'product_stock_{}'
+# {variant key: first page} of a product's review feed
+PRODUCT_REVIEWS_KEY = 'product_reviews_{}'
+
+
+def incr_counter(key, delta=1):
+    """Increment a cache counter, creating it when missing"""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Key does not exist yet (or expired); add() avoids clobbering a concurrent writer
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def get_catalog_version():
+    """Current catalog version stamp used to namespace cached responses"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response by moving to a new version"""
+    return incr_counter(CATALOG_VERSION_KEY)
+
+
+def normalize_query_params(query_dict):
+    """Stable query string: keys and repeated values sorted"""
+    items = []
+    for key in sorted(query_dict.keys()):
+        for value in sorted(query_dict.getlist(key)):
+            items.append((key, value))
+    return urlencode(items)
+
+
+def get_response_cache_stats():
+    """Hit/miss counters and hit ratio for every cached view"""
+    stats = {}
+    for name in CACHED_CATALOG_VIEWS:
+        hits = cache.get(f'{RESPONSE_STATS_PREFIX}:{name}:hits', 0)
+        misses = cache.get(f'{RESPONSE_STATS_PREFIX}:{name}:misses', 0)
+        total = hits + misses
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else 0.0,
+        }
+    return stats
+
+
+class CachedResponseMixin:
+    """
+    Serve GET responses from a versioned cache.
+
+    Entries are keyed on host + path + normalized query params and namespaced
+    by the catalog version, so a product/category write invalidates them all
+    at once. Conditional requests (If-None-Match / If-Modified-Since) that
+    match the cached entry get a 304 without touching the serializer.
+    """
+    cache_name = None
+    cache_timeout = None
+
+    def get_response_cache_key(self, request):
+        raw = f"{request.get_host()}{request.path}?{normalize_query_params(request.query_params)}"
+        digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        return f'{RESPONSE_CACHE_PREFIX}:v{get_catalog_version()}:{self.cache_name}:{digest}'
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        stats_key = f'{RESPONSE_STATS_PREFIX}:{self.cache_name}'
+
+        if entry is not None:
+            incr_counter(f'{stats_key}:hits')
+        else:
+            incr_counter(f'{stats_key}:misses')
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            content = JSONRenderer().render(response.data)
+            entry = {
+                'content': content,
+                'etag': quote_etag(hashlib.md5(content).hexdigest()),
+                'last_modified': int(time.time()),
+            }
+            timeout = self.cache_timeout or getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+            cache.set(key, entry, timeout)
+
+        return self._build_cached_response(request, entry)
+
+    def _build_cached_response(self, request, entry):
+        if self._is_not_modified(request, entry):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(entry['content'], content_type='application/json')
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        return response
+
+    def _is_not_modified(self, request, entry):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or entry['etag'] in etags
+
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if if_modified_since is not None:
+            return entry['last_modified'] <= if_modified_since
+        return False
+
+
+def _detail_timeout():
+    return getattr(settings, 'PRODUCT_DETAIL_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def build_product_detail_document(product_id):
+    """
+    Serialize a product detail document and write it (plus its stock counter)
+    to the cache. Returns None and drops any cached copy for missing or
+    inactive products.
+    """
+    from .serializers import ProductDetailSerializer
+    from .services import ProductService
+
+    product = ProductService.get_detail_queryset().filter(id=product_id).first()
+    if product is None:
+        invalidate_product_details([product_id])
+        return None
+
+    # Plain JSON types so the cached document carries no serializer state
+    document = json.loads(JSONRenderer().render(ProductDetailSerializer(product).data))
+    cache.set_many({
+        PRODUCT_DETAIL_KEY.format(product_id): document,
+        PRODUCT_STOCK_KEY.format(product_id): product.stock_quantity,
+    }, _detail_timeout())
+    return document
+
+
+def invalidate_product_details(product_ids):
+    """Drop cached detail documents; the next read rebuilds them"""
+    keys = []
+    for product_id in product_ids:
+        keys.append(PRODUCT_DETAIL_KEY.format(product_id))
+        keys.append(PRODUCT_STOCK_KEY.format(product_id))
+    cache.delete_many(keys)
+
+
+def set_cached_stock(product_id, stock_quantity):
+    """Update the fast stock counter overlaid on the detail document"""
+    cache.set(PRODUCT_STOCK_KEY.format(product_id), stock_quantity, _detail_timeout())
+
+
+def set_cached_stocks(stock_by_product):
+    """set_cached_stock for many products in one cache round trip"""
+    cache.set_many(
+        {PRODUCT_STOCK_KEY.format(product_id): stock for product_id, stock in stock_by_product.items()},
+        _detail_timeout()
+    )
+
+
+def get_product_detail_document(product_id, request=None):
+    """
+    Product detail from one cache read, rebuilt on a miss.
+    Stock and view counters are overlaid from their fast counters, and image
+    URLs are made absolute for `request`.
+    """
+    from .buffers import get_pending_views
+
+    detail_key = PRODUCT_DETAIL_KEY.format(product_id)
+    stock_key = PRODUCT_STOCK_KEY.format(product_id)
+    cached = cache.get_many([detail_key, stock_key])
+
+    document = cached.get(detail_key)
+    if document is None:
+        document = build_product_detail_document(product_id)
+        if document is None:
+            return None
+    else:
+        _overlay_stock(document, cached.get(stock_key))
+
+    document['view_count'] += get_pending_views(product_id)
+
+    if request is not None:
+        _absolutize_image_urls(document, request)
+    return document
+
+
+def get_product_detail_documents(product_ids):
+    """
+    {product_id: document} for many products from one cache read; misses are
+    rebuilt one by one and missing or inactive products are left out.
+    Stock is overlaid from the fast counters; image URLs stay relative.
+    """
+    keys = {}
+    for product_id in product_ids:
+        keys[str(product_id)] = (PRODUCT_DETAIL_KEY.format(product_id), PRODUCT_STOCK_KEY.format(product_id))
+    cached = cache.get_many([key for pair in keys.values() for key in pair])
+
+    documents = {}
+    for product_id, (detail_key, stock_key) in keys.items():
+        document = cached.get(detail_key)
+        if document is None:
+            document = build_product_detail_document(product_id)
+        else:
+            _overlay_stock(document, cached.get(stock_key))
+        if document is not None:
+            documents[product_id] = document
+    return documents
+
+
+def _overlay_stock(document, stock_quantity):
+    if stock_quantity is None:
+        return
+    document['stock_quantity'] = stock_quantity
+    document['is_in_stock'] = (
+        not document['track_inventory']
+        or document['stock_quantity'] > 0
+        or document['allow_backorder']
+    )
+
+
+def _absolutize_image_urls(document, request):
+    def absolutize_srcsets(srcsets):
+        return {image_format: absolute_srcset(value, request) for image_format, value in srcsets.items()}
+
+    def absolutize_category(category):
+        category['image'] = absolute_url(category.get('image'), request)
+        category['image_srcset'] = absolutize_srcsets(category.get('image_srcset', {}))
+        for child in category.get('children', []):
+            absolutize_category(child)
+
+    document['featured_image'] = absolute_url(document['featured_image'], request)
+    document['featured_image_srcset'] = absolutize_srcsets(document['featured_image_srcset'])
+    for image in document['images']:
+        image['image'] = absolute_url(image['image'], request)
+        image['srcset'] = absolutize_srcsets(image['srcset'])
+    if document['category']:
+        absolutize_category(document['category'])
+
+
+def get_cached_review_page(product_id, variant):
+    """First review page for one query variant, or None"""
+    return (cache.get(PRODUCT_REVIEWS_KEY.format(product_id)) or {}).get(variant)
+
+
+def set_cached_review_page(product_id, variant, data):
+    key = PRODUCT_REVIEWS_KEY.format(product_id)
+    pages = cache.get(key) or {}
+    pages[variant] = data
+    cache.set(key, pages, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+
+
+def invalidate_review_pages(product_id):
+    """Drop every cached first page of a product's review feed"""
+    cache.delete(PRODUCT_REVIEWS_KEY.format(product_id))
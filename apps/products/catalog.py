@@ -0,0 +1,326 @@
+# Location: apps\products\catalog.py
+"""
+NexCart Catalog Import/Export
+Streaming CSV/JSONL catalog loads upserted in chunks keyed on SKU
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from decimal import Decimal
+import csv
+import io
+import json
+import logging
+import time
+
+from core.common.db import bulk_assign
+from .models import Category, Product
+from .images import resolve_image_urls
+from .cache import bump_catalog_version, invalidate_product_details
+
+logger = logging.getLogger(__name__)
+
+# Columns accepted on import and written on export ('category' is the category slug)
+CATALOG_FIELDS = [
+    'sku', 'name', 'description', 'short_description', 'category', 'tags',
+    'price', 'compare_price', 'cost_price', 'stock_quantity', 'track_inventory',
+    'allow_backorder', 'featured_image', 'meta_title', 'meta_description',
+    'is_active', 'is_featured',
+]
+
+# Columns accepted by bulk_update_products besides the sku
+BULK_UPDATE_FIELDS = ['price', 'stock_quantity', 'is_active']
+
+BOOLEAN_FIELDS = {'track_inventory', 'allow_backorder', 'is_active', 'is_featured'}
+NULLABLE_FIELDS = {'compare_price', 'cost_price', 'featured_image'}
+
+
+def read_rows(stream, file_format):
+    """Yield (line_number, row dict) from a CSV or JSONL text stream"""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_number}: invalid JSON ({e.msg})")
+    else:
+        raise ValueError(f"Unsupported catalog format: {file_format}")
+
+
+class CatalogImportResult:
+    """Counters and row errors of one import run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class CatalogImportService:
+    """
+    Validate rows in chunks and upsert them with
+    bulk_create(update_conflicts=True) on sku
+    """
+
+    def __init__(self, chunk_size=1000, dry_run=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.category_ids = dict(Category.objects.values_list('slug', 'id'))
+
+    def run(self, rows):
+        result = CatalogImportResult()
+        chunk = []
+        for line_number, row in rows:
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk, result)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk, result)
+
+        if not self.dry_run and (result.created or result.updated):
+            bump_catalog_version()
+
+        result.elapsed = time.perf_counter() - result.started
+        logger.info(
+            f"Catalog import: {result.rows} rows, {result.created} created, {result.updated} updated, "
+            f"{len(result.errors)} errors, {result.rows_per_second:.0f} rows/sec"
+        )
+        return result
+
+    def _import_chunk(self, chunk, result):
+        result.rows += len(chunk)
+        skus = [str(row.get('sku', '')).strip() for _, row in chunk]
+        existing = {
+            row['sku']: row for row in Product.objects.filter(sku__in=skus).values(
+                'id', 'sku', 'slug', 'price', 'featured_image', 'featured_image_urls', 'featured_image_derivatives'
+            )
+        }
+
+        # Rows with the same columns share one upsert statement
+        groups = {}
+        seen_skus = set()
+        for line_number, row in chunk:
+            try:
+                product, columns = self._build_product(row, existing)
+                if product.sku in seen_skus:
+                    raise ValidationError(f"Duplicate sku {product.sku} in the same chunk")
+                seen_skus.add(product.sku)
+            except (ValidationError, ValueError, ArithmeticError) as e:
+                messages = e.messages if isinstance(e, ValidationError) else [str(e)]
+                result.errors.append((line_number, '; '.join(messages)))
+                continue
+            groups.setdefault(columns, []).append(product)
+
+        self._assign_slugs([p for products in groups.values() for p in products], existing)
+
+        if self.dry_run:
+            return
+
+        with transaction.atomic():
+            for columns, products in groups.items():
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=list(columns),
+                )
+                for product in products:
+                    if product.sku in existing:
+                        result.updated += 1
+                    else:
+                        result.created += 1
+
+        # bulk_create sends no signals
+        invalidate_product_details([row['id'] for row in existing.values()])
+
+    def _build_product(self, row, existing):
+        """Validated Product plus the columns to update when the sku exists"""
+        row = {key: value for key, value in row.items() if key in CATALOG_FIELDS}
+        sku = str(row.get('sku', '')).strip()
+        if not sku:
+            raise ValidationError("sku is required")
+
+        values = {}
+        for field, value in row.items():
+            if field == 'sku':
+                continue
+            if isinstance(value, str):
+                value = value.strip()
+            if field == 'category':
+                if value in ('', None):
+                    values['category_id'] = None
+                elif value in self.category_ids:
+                    values['category_id'] = self.category_ids[value]
+                else:
+                    raise ValidationError(f"Unknown category slug: {value}")
+            elif field in BOOLEAN_FIELDS:
+                values[field] = _parse_bool(value)
+            elif value in ('', None) and field in NULLABLE_FIELDS:
+                values[field] = None
+            elif field in ('price', 'compare_price', 'cost_price'):
+                values[field] = Decimal(str(value))
+            else:
+                values[field] = value
+
+        product = Product(sku=sku, **values)
+        current = existing.get(sku)
+        if current is not None and 'price' not in row:
+            # The INSERT half of the upsert still needs every NOT NULL column
+            product.price = current['price']
+
+        # New products need every required field; updates only check the columns sent
+        exclude = ['id', 'slug', 'category']
+        if current is not None:
+            exclude += [field for field in CATALOG_FIELDS if field not in row]
+        product.clean_fields(exclude=exclude)
+
+        columns = [field for field in row if field != 'sku'] + ['updated_at']
+        if 'featured_image' in row:
+            self._resolve_image(product, current)
+            columns += ['featured_image_urls', 'featured_image_derivatives']
+        return product, frozenset(columns)
+
+    def _resolve_image(self, product, current):
+        """Keep stored URLs and derivatives when the image is unchanged"""
+        if current and (current['featured_image'] or None) == (product.featured_image.name or None):
+            product.featured_image_urls = current['featured_image_urls']
+            product.featured_image_derivatives = current['featured_image_derivatives']
+        else:
+            product.featured_image_urls = resolve_image_urls(product.featured_image)
+            product.featured_image_derivatives = {}
+
+    def _assign_slugs(self, products, existing):
+        """Unique slugs for new products (existing products keep theirs)"""
+        new_products = [p for p in products if p.sku not in existing]
+        candidates = {p.sku: slugify(p.name) for p in new_products}
+        taken = set(Product.objects.filter(slug__in=candidates.values()).values_list('slug', flat=True))
+        for product in new_products:
+            slug = candidates[product.sku]
+            if slug in taken:
+                slug = f"{slug}-{slugify(product.sku)}"
+            taken.add(slug)
+            product.slug = slug
+        for product in products:
+            if product.sku in existing:
+                product.slug = existing[product.sku]['slug']
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in ('1', 'true', 'yes', 'y'):
+        return True
+    if normalized in ('0', 'false', 'no', 'n', ''):
+        return False
+    raise ValidationError(f"Invalid boolean: {value}")
+
+
+def bulk_update_products(changes, chunk_size=1000):
+    """
+    Apply [{sku, price?, stock_quantity?, is_active?}, ...] with chunked
+    set-based UPDATEs in one transaction. Returns (summary, per-row results);
+    invalid, duplicate and unknown rows are reported and skipped.
+    """
+    results = [None] * len(changes)
+    valid = {}
+    for index, change in enumerate(changes):
+        sku = str(change.get('sku', '')).strip() if isinstance(change, dict) else ''
+        try:
+            if not sku:
+                raise ValidationError("sku is required")
+            if sku in valid:
+                raise ValidationError(f"Duplicate sku (first seen in row {valid[sku][0]})")
+            values = {}
+            for field in BULK_UPDATE_FIELDS:
+                if field in change:
+                    values[field] = Product._meta.get_field(field).clean(change[field], None)
+            if not values:
+                raise ValidationError(f"Nothing to update; send one of {', '.join(BULK_UPDATE_FIELDS)}")
+        except ValidationError as e:
+            results[index] = {'row': index, 'sku': sku, 'status': 'error', 'errors': e.messages}
+            continue
+        valid[sku] = (index, values)
+
+    updated_ids = []
+    skus = list(valid)
+    now = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(skus), chunk_size):
+            chunk = skus[start:start + chunk_size]
+            # Lock the rows so concurrent checkouts cannot lose their stock decrements
+            current_rows = Product.objects.select_for_update().filter(sku__in=chunk).values('id', 'sku', *BULK_UPDATE_FIELDS)
+            changed = {}
+            for current in current_rows:
+                index, values = valid.pop(current['sku'])
+                if all(current[field] == value for field, value in values.items()):
+                    results[index] = {'row': index, 'sku': current['sku'], 'status': 'unchanged'}
+                    continue
+                row = {field: values.get(field, current[field]) for field in BULK_UPDATE_FIELDS}
+                row['updated_at'] = now
+                changed[current['id']] = row
+                results[index] = {'row': index, 'sku': current['sku'], 'status': 'updated'}
+
+            bulk_assign(Product, changed, BULK_UPDATE_FIELDS + ['updated_at'], chunk_size=chunk_size)
+            updated_ids.extend(changed)
+
+    for sku, (index, _) in valid.items():
+        results[index] = {'row': index, 'sku': sku, 'status': 'error', 'errors': ["Product not found"]}
+
+    # Raw UPDATEs send no signals: drop only the touched detail documents
+    if updated_ids:
+        invalidate_product_details(updated_ids)
+        bump_catalog_version()
+
+    summary = {'total': len(changes), 'updated': 0, 'unchanged': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    return summary, results
+
+
+def export_catalog(file_format, chunk_size=2000):
+    """Yield the catalog as CSV or JSONL text, one chunk of rows at a time"""
+    columns = [field if field != 'category' else 'category__slug' for field in CATALOG_FIELDS]
+    rows = Product.objects.order_by('sku').values_list(*columns).iterator(chunk_size=chunk_size)
+
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CATALOG_FIELDS)
+        for count, values in enumerate(rows, start=1):
+            writer.writerow(['' if value is None else value for value in values])
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    elif file_format == 'jsonl':
+        lines = []
+        for values in rows:
+            record = dict(zip(CATALOG_FIELDS, values))
+            for field in ('price', 'compare_price', 'cost_price'):
+                if record[field] is not None:
+                    record[field] = str(record[field])
+            lines.append(json.dumps(record, ensure_ascii=False))
+            if len(lines) >= chunk_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+    else:
+        raise ValueError(f"Unsupported catalog format: {file_format}")
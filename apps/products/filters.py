@@ -3,7 +3,7 @@
 NexCart Product Filters
 """
 import django_filters
-from .models import Product
+from .models import InventorySummary, Product, ProductReview
 
 
 class ProductFilter(django_filters.FilterSet):
@@ -33,4 +33,25 @@ class ProductFilter(django_filters.FilterSet):
             description__icontains=value
         ) | queryset.filter(
             tags__icontains=value
-        )
\ No newline at end of file
+        )
+
+
+class ProductReviewFilter(django_filters.FilterSet):
+    """Review feed filter (star rating)"""
+    
+    rating = django_filters.ChoiceFilter(choices=[(stars, stars) for stars in range(1, 6)])
+    
+    class Meta:
+        model = ProductReview
+        fields = ['rating']
+
+
+class InventorySummaryFilter(django_filters.FilterSet):
+    """Inventory summary filter (low stock, category)"""
+    
+    low_stock = django_filters.BooleanFilter(field_name='is_low_stock')
+    category = django_filters.CharFilter(field_name='product__category__slug')
+    
+    class Meta:
+        model = InventorySummary
+        fields = ['low_stock', 'category']
@@ -0,0 +1,183 @@
+# Location: apps\products\images.py
+"""
+NexCart Product Image URLs
+Resolve storage URLs once at save time so serializers and the admin
+never call the storage backend per object, and generate resized
+WebP/JPEG derivatives in the background
+"""
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+import io
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Responsive widths (px): generated derivatives, or Cloudinary transformations until they exist
+IMAGE_VARIANT_WIDTHS = {
+    'thumbnail': 150,
+    'card': 400,
+    'detail': 1000,
+}
+
+CLOUDINARY_UPLOAD_SEGMENT = '/image/upload/'
+
+# format -> (file extension, Pillow format, save options)
+DERIVATIVE_FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def resolve_image_urls(field_file):
+    """
+    Commit a pending upload and return {'original': url, <variant>: url, ...}.
+    Returns an empty dict when there is no image or the URL cannot be built.
+    """
+    if not field_file or not field_file.name:
+        return {}
+
+    try:
+        # Upload now (instead of in Field.pre_save) so the URL reflects the stored name
+        if not field_file._committed:
+            field_file.save(field_file.name, field_file.file, save=False)
+        original = field_file.url
+    except Exception as e:
+        logger.error(f"Error resolving image URL for {field_file.name}: {str(e)}")
+        return {}
+
+    urls = {'original': original}
+    if CLOUDINARY_UPLOAD_SEGMENT in original:
+        for variant, width in IMAGE_VARIANT_WIDTHS.items():
+            urls[variant] = original.replace(
+                CLOUDINARY_UPLOAD_SEGMENT,
+                f'{CLOUDINARY_UPLOAD_SEGMENT}c_limit,w_{width},f_auto,q_auto/',
+                1
+            )
+    return urls
+
+
+def image_url(urls, field_file, variant='original'):
+    """
+    Stored URL for `variant` (falling back to the original).
+    Rows saved before URLs were stored fall back to the storage backend.
+    """
+    if urls:
+        return urls.get(variant) or urls.get('original')
+    if field_file and field_file.name:
+        try:
+            return field_file.url
+        except Exception as e:
+            logger.error(f"Error getting image URL for {field_file.name}: {str(e)}")
+    return None
+
+
+def absolute_url(url, request):
+    """Make a stored URL absolute; Cloudinary URLs already are"""
+    if not url or request is None or url.startswith(('http://', 'https://')):
+        return url
+    return request.build_absolute_uri(url)
+
+
+def srcset(derivatives, image_format, request=None):
+    """srcset string ("<url> <width>w, ...") for one derivative format"""
+    entries = []
+    seen_widths = set()
+    for variant in IMAGE_VARIANT_WIDTHS:
+        rendition = derivatives.get(variant, {}).get(image_format)
+        if not rendition or rendition['width'] in seen_widths:
+            continue
+        seen_widths.add(rendition['width'])
+        entries.append(f"{absolute_url(rendition['url'], request)} {rendition['width']}w")
+    return ', '.join(entries)
+
+
+def srcset_map(derivatives, request=None):
+    """{'webp': srcset, 'jpeg': srcset}, empty until derivatives are generated"""
+    if not derivatives:
+        return {}
+    return {image_format: srcset(derivatives, image_format, request) for image_format in DERIVATIVE_FORMATS}
+
+
+def absolute_srcset(value, request):
+    """Make every URL of a srcset string absolute"""
+    entries = []
+    for entry in value.split(', '):
+        url, _, descriptor = entry.rpartition(' ')
+        entries.append(f'{absolute_url(url, request)} {descriptor}')
+    return ', '.join(entries)
+
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def delete_derivative_files(storage, derivatives):
+    """Remove the files of a previous derivative run"""
+    for variant in IMAGE_VARIANT_WIDTHS:
+        for rendition in derivatives.get(variant, {}).values():
+            try:
+                storage.delete(rendition['name'])
+            except Exception as e:
+                logger.error(f"Error deleting derivative {rendition['name']}: {str(e)}")
+
+
+def generate_derivatives(field_file):
+    """
+    Write thumbnail/card/detail renditions of an image in every derivative
+    format next to the original and return their URLs, dimensions and sizes:
+    {'original': {width, height, bytes}, <variant>: {<format>: {name, url, width, height, bytes}}}
+    """
+    storage = field_file.storage
+    with field_file.open('rb') as f:
+        source = Image.open(f)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+
+    derivatives = {
+        'original': {'width': source.width, 'height': source.height, 'bytes': field_file.size},
+    }
+    rgb = _to_rgb(source)
+    directory, filename = os.path.split(field_file.name)
+    stem = os.path.splitext(filename)[0]
+
+    for variant, width in IMAGE_VARIANT_WIDTHS.items():
+        resized = rgb.copy()
+        if resized.width > width:
+            resized.thumbnail((width, resized.height), Image.LANCZOS)
+
+        derivatives[variant] = {}
+        for image_format, (extension, pil_format, options) in DERIVATIVE_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            content = buffer.getvalue()
+            name = storage.save(
+                os.path.join(directory, 'derivatives', f'{stem}_{variant}.{extension}'),
+                ContentFile(content)
+            )
+            derivatives[variant][image_format] = {
+                'name': name,
+                'url': storage.url(name),
+                'width': resized.width,
+                'height': resized.height,
+                'bytes': len(content),
+            }
+
+    return derivatives
+
+
+def queue_image_derivatives(instance, image_field, stale_derivatives=None):
+    """Enqueue derivative generation; a broker outage must not fail the save"""
+    from .tasks import generate_image_derivatives
+
+    try:
+        generate_image_derivatives.delay(
+            instance._meta.label_lower, str(instance.pk), image_field, stale_derivatives or {}
+        )
+    except Exception as e:
+        logger.error(f"Error queueing image derivatives for {instance.pk}: {str(e)}")
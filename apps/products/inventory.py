@@ -0,0 +1,361 @@
+# Location: apps\products\inventory.py
+"""
+NexCart Inventory
+Contention-safe stock reservation: every decrement is a conditional
+UPDATE, so concurrent checkouts can never oversell or lose an update,
+plus the periodically rebuilt inventory summary behind low-stock alerts
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from decimal import Decimal, ROUND_HALF_UP
+import logging
+
+from core.common.db import bulk_increment
+from .models import InventorySummary, Product, StockReservation
+from .cache import bump_catalog_version, set_cached_stocks
+
+logger = logging.getLogger(__name__)
+
+# Order items count as sold unless the order was cancelled or refunded
+SOLD_ORDER_STATUSES = ['pending', 'processing', 'shipped', 'delivered']
+
+# Attempts before giving up on a reservation that failed without a visible conflict
+RESERVE_ATTEMPTS = 3
+
+
+class InsufficientStock(Exception):
+    """
+    Raised when a reservation cannot be fully satisfied; nothing is reserved.
+    `conflicts` is a list of {product_id, name, requested, available}.
+    """
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        names = ', '.join(conflict['name'] or str(conflict['product_id']) for conflict in conflicts)
+        super().__init__(f"Insufficient stock for {names}")
+
+
+def _merge(items):
+    """{product_id: quantity} from a dict or (product_id, quantity) pairs"""
+    pairs = items.items() if isinstance(items, dict) else items
+    merged = {}
+    for product_id, quantity in pairs:
+        if quantity < 1:
+            raise ValueError(f"Quantity must be at least 1 (got {quantity})")
+        merged[str(product_id)] = merged.get(str(product_id), 0) + quantity
+    return merged
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField()
+    )
+
+
+def reserve_stock(items, stock_levels=None):
+    """
+    Decrement stock for every item in one conditional UPDATE.
+
+    A row only changes if it does not track inventory, allows backorders
+    (stock floors at 0) or has stock_quantity >= the requested quantity.
+    If any item misses, the statement is rolled back and InsufficientStock
+    reports each short item.
+
+    Returns {product_id: units actually taken off stock}: a backorder item
+    only takes what was on hand. `stock_levels` ({product_id: stock}) may
+    carry the levels of backorder products the caller already read under
+    lock; otherwise they are read (and locked) here.
+    """
+    quantities = _merge(items)
+    if not quantities:
+        return {}
+
+    for attempt in range(RESERVE_ATTEMPTS):
+        requested = _quantity_case(quantities)
+        try:
+            with transaction.atomic():
+                levels = _backorder_levels(quantities, stock_levels)
+                updated = Product.objects.filter(pk__in=list(quantities)).filter(
+                    Q(track_inventory=False) | Q(allow_backorder=True) | Q(stock_quantity__gte=requested)
+                ).update(
+                    stock_quantity=Case(
+                        When(track_inventory=True, then=Greatest(F('stock_quantity') - requested, Value(0))),
+                        default=F('stock_quantity')
+                    )
+                )
+                if updated != len(quantities):
+                    raise InsufficientStock([])
+        except InsufficientStock:
+            conflicts = get_stock_conflicts(quantities)
+            if conflicts:
+                raise InsufficientStock(conflicts)
+            # Stock came back between the UPDATE and the re-read: retry
+            logger.warning(f"Stock reservation retry {attempt + 1} without a visible conflict")
+            continue
+
+        _refresh_cached_stock(quantities)
+        return {
+            product_id: min(levels[product_id], quantity) if product_id in levels else quantity
+            for product_id, quantity in quantities.items()
+        }
+
+    raise InsufficientStock(get_stock_conflicts(quantities) or [
+        {'product_id': product_id, 'name': None, 'requested': quantity, 'available': None}
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def _backorder_levels(quantities, stock_levels=None):
+    """Stock on hand of the tracked backorder products among `quantities`"""
+    if stock_levels is not None:
+        return {str(product_id): max(stock, 0) for product_id, stock in stock_levels.items()}
+    return {
+        str(product_id): max(stock, 0) for product_id, stock in
+        Product.objects.select_for_update().filter(
+            pk__in=list(quantities), track_inventory=True, allow_backorder=True
+        ).values_list('id', 'stock_quantity')
+    }
+
+
+def release_stock(items):
+    """Return reserved stock (e.g. after cancellation) with one UPDATE per 500 products"""
+    quantities = _merge(items)
+    if not quantities:
+        return 0
+
+    updated = bulk_increment(
+        Product,
+        {product_id: {'stock_quantity': quantity} for product_id, quantity in quantities.items()},
+        where={'track_inventory': True}
+    )
+    _refresh_cached_stock(quantities, released=True)
+    return updated
+
+
+def hold_stock(reference, items, ttl=None, stock_levels=None):
+    """
+    Reserve stock and record it as held by `reference` until the hold expires
+    (STOCK_RESERVATION_TTL_MINUTES by default). Raises InsufficientStock.
+    Holds record only the units taken off stock, so releasing a backorder
+    never returns units that were not there. See reserve_stock for `stock_levels`.
+    """
+    quantities = _merge(items)
+    ttl = ttl or timedelta(minutes=settings.STOCK_RESERVATION_TTL_MINUTES)
+    expires_at = timezone.now() + ttl
+
+    with transaction.atomic():
+        taken = reserve_stock(quantities, stock_levels)
+        StockReservation.objects.bulk_create([
+            StockReservation(product_id=product_id, reference=reference, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in taken.items() if quantity > 0
+        ])
+
+
+def commit_reservations(reference, items=None):
+    """
+    Turn a hold into a sale: the stock stays decremented and the hold is
+    dropped. If the hold already expired, `items` are reserved again
+    (raises InsufficientStock when they are gone).
+    """
+    with transaction.atomic():
+        committed, _ = StockReservation.objects.filter(reference=reference).delete()
+        if not committed and items:
+            logger.warning(f"Stock hold for {reference} expired before commit; reserving again")
+            reserve_stock(items)
+    return committed
+
+
+def release_reservations(*references):
+    """
+    Return the stock still held by each reference (e.g. on cancellation):
+    one UPDATE for all their products however many references are given
+    """
+    with transaction.atomic():
+        held = list(
+            StockReservation.objects.select_for_update()
+            .filter(reference__in=[str(reference) for reference in references])
+            .values_list('id', 'product_id', 'quantity')
+        )
+        _release_rows(held)
+    return len(held)
+
+
+def release_expired_reservations(batch_size=500):
+    """
+    Sweep expired holds in batches: each batch returns its stock with one
+    UPDATE and deletes its rows with one DELETE. Rows locked by a concurrent
+    sweeper are skipped. Returns the number of holds released.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=timezone.now())
+                .order_by('expires_at')
+                .values_list('id', 'product_id', 'quantity')[:batch_size]
+            )
+            _release_rows(batch)
+        released += len(batch)
+        if len(batch) < batch_size:
+            break
+
+    if released:
+        logger.info(f"Released {released} expired stock reservations")
+    return released
+
+
+def _release_rows(rows):
+    if not rows:
+        return
+    release_stock([(product_id, quantity) for _, product_id, quantity in rows])
+    StockReservation.objects.filter(id__in=[reservation_id for reservation_id, _, _ in rows]).delete()
+
+
+def get_stock_conflicts(items):
+    """Items that cannot be reserved right now, with the stock available"""
+    quantities = _merge(items)
+    products = {
+        str(row['id']): row for row in Product.objects.filter(pk__in=list(quantities)).values(
+            'id', 'name', 'stock_quantity', 'track_inventory', 'allow_backorder'
+        )
+    }
+
+    conflicts = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            conflicts.append({'product_id': product_id, 'name': None, 'requested': quantity, 'available': 0})
+        elif product['track_inventory'] and not product['allow_backorder'] and product['stock_quantity'] < quantity:
+            conflicts.append({
+                'product_id': product_id,
+                'name': product['name'],
+                'requested': quantity,
+                'available': product['stock_quantity'],
+            })
+    return conflicts
+
+
+def _refresh_cached_stock(quantities, released=False):
+    """
+    Push the new stock levels to the detail-document stock counters after
+    commit; cached list responses (is_in_stock) only go stale when a product
+    sells out or comes back
+    """
+    def push():
+        stock = {
+            str(product_id): stock_quantity for product_id, stock_quantity in
+            Product.objects.filter(pk__in=list(quantities), track_inventory=True).values_list('id', 'stock_quantity')
+        }
+        set_cached_stocks(stock)
+        if released:
+            crossed_zero = any(stock[pk] == quantities[pk] for pk in stock)
+        else:
+            crossed_zero = any(value == 0 for value in stock.values())
+        if crossed_zero:
+            bump_catalog_version()
+
+    # The reservation is already committed: a failure here must not surface as a failed checkout
+    transaction.on_commit(push, robust=True)
+
+
+def refresh_inventory_summary(chunk_size=1000):
+    """
+    Rebuild InventorySummary for every inventory-tracked product.
+
+    Stock and 7/30-day units sold come from one grouped aggregate over
+    products and their order items; the rows are upserted in chunks and
+    summaries of products no longer tracked are dropped. Returns the number
+    of products summarized.
+    """
+    now = timezone.now()
+    sold = Q(orderitem__order__status__in=SOLD_ORDER_STATUSES)
+    rows = Product.objects.filter(track_inventory=True).values('id', 'stock_quantity').annotate(
+        units_sold_7d=Coalesce(
+            Sum('orderitem__quantity', filter=sold & Q(orderitem__created_at__gte=now - timedelta(days=7))),
+            Value(0)
+        ),
+        units_sold_30d=Coalesce(
+            Sum('orderitem__quantity', filter=sold & Q(orderitem__created_at__gte=now - timedelta(days=30))),
+            Value(0)
+        ),
+    ).order_by()
+
+    summarized = 0
+    batch = []
+    with transaction.atomic():
+        for row in rows.iterator(chunk_size=chunk_size):
+            batch.append(_summary_row(row, now))
+            if len(batch) >= chunk_size:
+                summarized += _upsert_summaries(batch)
+                batch = []
+        summarized += _upsert_summaries(batch)
+        InventorySummary.objects.filter(refreshed_at__lt=now).delete()
+
+    logger.info(f"Refreshed inventory summary for {summarized} products")
+    return summarized
+
+
+def _summary_row(row, now):
+    daily_rate = Decimal(row['units_sold_30d']) / 30
+    days_of_cover = None
+    if daily_rate:
+        days_of_cover = (max(row['stock_quantity'], 0) / daily_rate).quantize(Decimal('0.1'), ROUND_HALF_UP)
+
+    is_low_stock = row['stock_quantity'] <= settings.LOW_STOCK_THRESHOLD or (
+        days_of_cover is not None and days_of_cover < settings.LOW_STOCK_DAYS_OF_COVER
+    )
+    return InventorySummary(
+        product_id=row['id'],
+        stock_quantity=row['stock_quantity'],
+        units_sold_7d=row['units_sold_7d'],
+        units_sold_30d=row['units_sold_30d'],
+        daily_sell_rate=daily_rate.quantize(Decimal('0.01'), ROUND_HALF_UP),
+        days_of_cover=days_of_cover,
+        is_low_stock=is_low_stock,
+        refreshed_at=now,
+    )
+
+
+def _upsert_summaries(summaries):
+    if not summaries:
+        return 0
+    InventorySummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=[
+            'stock_quantity', 'units_sold_7d', 'units_sold_30d', 'daily_sell_rate',
+            'days_of_cover', 'is_low_stock', 'refreshed_at',
+        ],
+    )
+    return len(summaries)
+
+
+def build_low_stock_digest():
+    """
+    (subject, body) listing every low-stock product of the current summary,
+    fewest days of cover first; None when nothing is low
+    """
+    rows = list(
+        InventorySummary.objects.filter(is_low_stock=True, product__is_active=True)
+        .order_by(F('days_of_cover').asc(nulls_last=True), 'stock_quantity')
+        .values_list('product__sku', 'product__name', 'stock_quantity', 'units_sold_7d', 'units_sold_30d', 'days_of_cover')
+    )
+    if not rows:
+        return None
+
+    lines = [
+        f"{sku} {name}: {stock} in stock, {sold_7d} sold in 7 days, {sold_30d} in 30 days, "
+        f"{'no recent sales' if cover is None else f'{cover} days of cover'}"
+        for sku, name, stock, sold_7d, sold_30d, cover in rows
+    ]
+    subject = f"Low stock: {len(rows)} product{'s' if len(rows) != 1 else ''} need restocking"
+    body = "The following products are running low:\n\n" + "\n".join(lines)
+    return subject, body
+
@@ -0,0 +1,71 @@
+"""
+Benchmark ProductListSerializer: declarative DRF fields vs the hand-rolled read path
+Runs on in-memory products, so no database rows are created
+"""
+from decimal import Decimal
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from apps.products.images import resolve_image_urls
+from apps.products.models import Category, Product
+from apps.products.serializers import ProductListSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ProductListSerializer items/sec (declarative vs hand-rolled)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[20, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get('/api/products/')
+        category = Category(id=uuid.uuid4(), name='Electronics', slug='electronics')
+
+        self.stdout.write(f"{'items':>6} {'declarative/s':>15} {'hand-rolled/s':>15} {'speedup':>8}")
+        for size in options['sizes']:
+            products = [self._product(i, category) for i in range(size)]
+            serializer = ProductListSerializer(context={'request': request})
+
+            before = self._items_per_second(serializer.declarative_representation, products, options['repeat'])
+            after = self._items_per_second(serializer.to_representation, products, options['repeat'])
+
+            renderer = JSONRenderer()
+            identical = (
+                renderer.render([serializer.declarative_representation(p) for p in products])
+                == renderer.render([serializer.to_representation(p) for p in products])
+            )
+            if not identical:
+                self.stdout.write(self.style.ERROR(f'Output mismatch for {size} items'))
+
+            self.stdout.write(f'{size:>6} {before:>15,.0f} {after:>15,.0f} {after / before:>7.1f}x')
+
+    def _items_per_second(self, represent, products, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for product in products:
+                represent(product)
+        return len(products) * repeat / (time.perf_counter() - start)
+
+    def _product(self, i, category):
+        product = Product(
+            id=uuid.uuid4(),
+            name=f'Product {i}',
+            slug=f'product-{i}',
+            short_description='Benchmark product',
+            category=category,
+            price=Decimal('49.99'),
+            compare_price=Decimal('59.99') if i % 2 else None,
+            featured_image=f'products/product-{i}.jpg' if i % 3 else None,
+            stock_quantity=i % 5,
+            average_rating=Decimal('4.50'),
+            review_count=i,
+            is_featured=bool(i % 4 == 0),
+        )
+        # As stored by Product.save()
+        product.featured_image_urls = resolve_image_urls(product.featured_image)
+        return product
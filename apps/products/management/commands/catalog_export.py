@@ -0,0 +1,32 @@
+"""
+Stream the product catalog to CSV/JSONL in the catalog_import format
+"""
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from apps.products.catalog import export_catalog
+
+
+class Command(BaseCommand):
+    help = 'Export all products as CSV or JSONL (importable with catalog_import)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Output file (defaults to stdout)')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        output = open(options['path'], 'w', newline='', encoding='utf-8') if options['path'] else sys.stdout
+        try:
+            for text in export_catalog(options['format'], chunk_size=options['chunk_size']):
+                output.write(text)
+        finally:
+            if options['path']:
+                output.close()
+
+        if options['path']:
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ Exported catalog to {options['path']} in {time.perf_counter() - start:.2f}s"
+            ))
@@ -0,0 +1,32 @@
+"""
+Generate resized WebP/JPEG derivatives for images that don't have them yet
+"""
+from django.core.management.base import BaseCommand
+from apps.products.models import Category, Product, ProductImage
+from apps.products.tasks import generate_image_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generate image derivatives for existing category and product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true', help='Generate in this process instead of queueing Celery tasks')
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have derivatives')
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, image_field in [(Category, 'image'), (Product, 'featured_image'), (ProductImage, 'image')]:
+            queryset = model.objects.exclude(**{f'{image_field}__isnull': True}).exclude(**{image_field: ''})
+            if not options['force']:
+                queryset = queryset.filter(**{f'{image_field}_derivatives': {}})
+
+            for obj in queryset.only('pk', image_field, f'{image_field}_derivatives').iterator():
+                args = (model._meta.label_lower, str(obj.pk), image_field, getattr(obj, f'{image_field}_derivatives'))
+                if options['sync']:
+                    generate_image_derivatives(*args)
+                else:
+                    generate_image_derivatives.delay(*args)
+                total += 1
+
+        action = 'Generated' if options['sync'] else 'Queued'
+        self.stdout.write(self.style.SUCCESS(f'✓ {action} derivatives for {total} images'))
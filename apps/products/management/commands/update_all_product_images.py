@@ -2,6 +2,8 @@
 Simply update ALL existing products with image URLs based on their names
 """
 from django.core.management.base import BaseCommand
+from apps.products.cache import bump_catalog_version, invalidate_product_details
+from apps.products.images import resolve_image_urls
 from apps.products.models import Product
 
 
@@ -43,11 +45,11 @@ class Command(BaseCommand):
             'marketing strategy guide': 'https://images.unsplash.com/photo-1533750204176-3b0d38e9ac2d?w=800&q=80',
         }
 
-        updated_count = 0
+        updated = []
         not_matched = []
         
         # Get all products
-        all_products = Product.objects.all()
+        all_products = Product.objects.only('id', 'name', 'featured_image').iterator(chunk_size=1000)
         
         for product in all_products:
             product_name_lower = product.name.lower()
@@ -57,8 +59,9 @@ class Command(BaseCommand):
             
             if image_url:
                 product.featured_image = image_url
-                product.save(update_fields=['featured_image'])
-                updated_count += 1
+                product.featured_image_urls = resolve_image_urls(product.featured_image)
+                product.featured_image_derivatives = {}
+                updated.append(product)
                 self.stdout.write(
                     self.style.SUCCESS(f'✓ Updated: {product.name}')
                 )
@@ -68,10 +71,19 @@ class Command(BaseCommand):
                     self.style.WARNING(f'⚠ No image found for: {product.name}')
                 )
 
+        Product.objects.bulk_update(
+            updated,
+            ['featured_image', 'featured_image_urls', 'featured_image_derivatives'],
+            batch_size=500
+        )
+        # bulk_update sends no signals
+        invalidate_product_details([product.id for product in updated])
+        bump_catalog_version()
+
         # Summary
         self.stdout.write('')
         self.stdout.write(
-            self.style.SUCCESS(f'✓ Updated {updated_count} products with image URLs')
+            self.style.SUCCESS(f'✓ Updated {len(updated)} products with image URLs')
         )
         
         if not_matched:
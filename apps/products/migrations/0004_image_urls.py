@@ -0,0 +1,54 @@
+# Generated by Django 5.2.10 on 2026-10-18 23:25
+
+from django.db import migrations, models
+
+
+def backfill_image_urls(apps, schema_editor):
+    """Resolve URLs for images saved before they were stored"""
+    from apps.products.images import resolve_image_urls
+
+    for model_name, image_field, urls_field in [
+        ('Category', 'image', 'image_urls'),
+        ('Product', 'featured_image', 'featured_image_urls'),
+        ('ProductImage', 'image', 'image_urls'),
+    ]:
+        model = apps.get_model('products', model_name)
+        batch = []
+        for obj in model.objects.exclude(**{f'{image_field}__isnull': True}).exclude(**{image_field: ''}).iterator():
+            setattr(obj, urls_field, resolve_image_urls(getattr(obj, image_field)))
+            batch.append(obj)
+            if len(batch) >= 500:
+                model.objects.bulk_update(batch, [urls_field])
+                batch = []
+        model.objects.bulk_update(batch, [urls_field])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_merge_0002_alter_featured_image_0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='image_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='featured_image_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='image_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='featured_image',
+            field=models.ImageField(blank=True, max_length=500, null=True, upload_to='products/'),
+        ),
+        migrations.RunPython(backfill_image_urls, migrations.RunPython.noop),
+    ]
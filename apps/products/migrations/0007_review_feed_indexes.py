@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 23:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['product', 'is_approved', '-created_at'], name='product_rev_product_d51f30_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productreview',
+            index=models.Index(fields=['product', 'is_approved', '-helpful_count'], name='product_rev_product_bc74b4_idx'),
+        ),
+    ]
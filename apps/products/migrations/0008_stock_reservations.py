@@ -0,0 +1,57 @@
+# Generated by Django 5.2.10 on 2026-10-18 23:52
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def hold_stock_of_pending_orders(apps, schema_editor):
+    """
+    Orders placed before reservations existed already decremented stock and
+    relied on cancel_expired_orders to return it. Give them holds that are
+    already due so the sweeper returns the stock instead.
+    """
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    StockReservation = apps.get_model('products', 'StockReservation')
+
+    now = timezone.now()
+    items = OrderItem.objects.filter(
+        order__status='pending',
+        order__payment_status='pending',
+        product__isnull=False
+    ).values_list('order_id', 'product_id', 'quantity')
+
+    StockReservation.objects.bulk_create([
+        StockReservation(reference=str(order_id), product_id=product_id, quantity=quantity, expires_at=now)
+        for order_id, product_id, quantity in items.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_review_feed_indexes'),
+        ('orders', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('reference', models.CharField(db_index=True, help_text='Holder, e.g. the order id', max_length=64)),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Stock Reservation',
+                'verbose_name_plural': 'Stock Reservations',
+                'db_table': 'stock_reservations',
+                'ordering': ['expires_at'],
+            },
+        ),
+        migrations.RunPython(hold_stock_of_pending_orders, migrations.RunPython.noop),
+    ]
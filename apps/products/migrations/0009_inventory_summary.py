@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 23:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inventory_summary', serialize=False, to='products.product')),
+                ('stock_quantity', models.IntegerField(default=0)),
+                ('units_sold_7d', models.IntegerField(default=0)),
+                ('units_sold_30d', models.IntegerField(default=0)),
+                ('daily_sell_rate', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, help_text='Stock divided by the 30-day daily sell rate; empty when nothing sold', max_digits=10, null=True)),
+                ('is_low_stock', models.BooleanField(db_index=True, default=False)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Inventory Summary',
+                'verbose_name_plural': 'Inventory Summaries',
+                'db_table': 'inventory_summary',
+                'ordering': ['days_of_cover'],
+            },
+        ),
+    ]
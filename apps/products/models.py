@@ -6,9 +6,35 @@ Product catalog with categories, reviews, and inventory
 from django.db import models
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import transaction
+from .images import resolve_image_urls, queue_image_derivatives
 import uuid
 
 
+def _resolve_urls_on_save(instance, image_field, kwargs):
+    """
+    Store resolved URLs for `<image_field>_urls` when the image changes and
+    queue regeneration of `<image_field>_derivatives` after commit
+    """
+    urls_field = f'{image_field}_urls'
+    derivatives_field = f'{image_field}_derivatives'
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and image_field not in update_fields:
+        return
+    
+    urls = resolve_image_urls(getattr(instance, image_field))
+    if urls.get('original') == getattr(instance, urls_field).get('original'):
+        return
+    
+    stale_derivatives = getattr(instance, derivatives_field)
+    setattr(instance, urls_field, urls)
+    setattr(instance, derivatives_field, {})
+    if update_fields is not None:
+        kwargs['update_fields'] = {*update_fields, urls_field, derivatives_field}
+    if urls or stale_derivatives:
+        transaction.on_commit(lambda: queue_image_derivatives(instance, image_field, stale_derivatives))
+
+
 class Category(models.Model):
     """Product categories with hierarchical support"""
     
@@ -26,6 +52,8 @@ class Category(models.Model):
     )
     
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    image_urls = models.JSONField(default=dict, blank=True, editable=False)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -43,6 +71,7 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        _resolve_urls_on_save(self, 'image', kwargs)
         super().save(*args, **kwargs)
 
 
@@ -94,7 +123,9 @@ class Product(models.Model):
     allow_backorder = models.BooleanField(default=False)
     
     # Media
-    featured_image = models.ImageField(upload_to='products/', blank=True, null=True)
+    featured_image = models.ImageField(upload_to='products/', max_length=500, blank=True, null=True)
+    featured_image_urls = models.JSONField(default=dict, blank=True, editable=False)
+    featured_image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     
     # SEO
     meta_title = models.CharField(max_length=200, blank=True)
@@ -114,6 +145,13 @@ class Product(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(5)]
     )
     review_count = models.IntegerField(default=0)
+    # Approved-review aggregates maintained incrementally (see ProductService.apply_rating_change)
+    rating_sum = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -137,6 +175,7 @@ class Product(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+        _resolve_urls_on_save(self, 'featured_image', kwargs)
         super().save(*args, **kwargs)
     
     @property
@@ -150,6 +189,11 @@ class Product(models.Model):
         if self.compare_price and self.compare_price > self.price:
             return int(((self.compare_price - self.price) / self.compare_price) * 100)
         return 0
+    
+    @property
+    def rating_histogram(self):
+        """Approved review counts per star: {'1': n, ..., '5': n}"""
+        return {str(stars): getattr(self, f'rating_{stars}_count') for stars in range(1, 6)}
 
 
 class ProductImage(models.Model):
@@ -162,6 +206,8 @@ class ProductImage(models.Model):
         related_name='images'
     )
     image = models.ImageField(upload_to='products/')
+    image_urls = models.JSONField(default=dict, blank=True, editable=False)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     alt_text = models.CharField(max_length=200, blank=True)
     position = models.IntegerField(default=0)
     
@@ -175,6 +221,10 @@ class ProductImage(models.Model):
     
     def __str__(self):
         return f"Image for {self.product.name}"
+    
+    def save(self, *args, **kwargs):
+        _resolve_urls_on_save(self, 'image', kwargs)
+        super().save(*args, **kwargs)
 
 
 class ProductReview(models.Model):
@@ -216,9 +266,27 @@ class ProductReview(models.Model):
         verbose_name_plural = 'Product Reviews'
         ordering = ['-created_at']
         unique_together = ['product', 'user']
+        indexes = [
+            # Review feed: approved reviews of one product, newest or most helpful first
+            models.Index(fields=['product', 'is_approved', '-created_at']),
+            models.Index(fields=['product', 'is_approved', '-helpful_count']),
+        ]
     
     def __str__(self):
         return f"Review by {self.user.email} for {self.product.name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {'product_id', 'rating', 'is_approved'} <= set(field_names):
+            # Remember what is already counted so saves and deletes can apply deltas
+            instance._counted = (instance.product_id, instance.counted_rating)
+        return instance
+    
+    @property
+    def counted_rating(self):
+        """The rating this review contributes to product aggregates (None if unapproved)"""
+        return self.rating if self.is_approved else None
 
 
 class Wishlist(models.Model):
@@ -246,4 +314,70 @@ class Wishlist(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.user.email} - {self.product.name}"
\ No newline at end of file
+        return f"{self.user.email} - {self.product.name}"
+
+
+class StockReservation(models.Model):
+    """
+    Stock held for a pending order. Holding already decremented
+    Product.stock_quantity, so availability stays a single-column read;
+    expired holds are returned by the release_expired_reservations sweeper.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    reference = models.CharField(max_length=64, db_index=True, help_text="Holder, e.g. the order id")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'stock_reservations'
+        verbose_name = 'Stock Reservation'
+        verbose_name_plural = 'Stock Reservations'
+        ordering = ['expires_at']
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for {self.reference}"
+
+
+class InventorySummary(models.Model):
+    """
+    Per-product stock and sell-through snapshot, rebuilt periodically by
+    refresh_inventory_summary from one aggregate query over order items
+    """
+    
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='inventory_summary'
+    )
+    stock_quantity = models.IntegerField(default=0)
+    units_sold_7d = models.IntegerField(default=0)
+    units_sold_30d = models.IntegerField(default=0)
+    daily_sell_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    days_of_cover = models.DecimalField(
+        max_digits=10,
+        decimal_places=1,
+        null=True,
+        blank=True,
+        help_text="Stock divided by the 30-day daily sell rate; empty when nothing sold"
+    )
+    is_low_stock = models.BooleanField(default=False, db_index=True)
+    
+    refreshed_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'inventory_summary'
+        verbose_name = 'Inventory Summary'
+        verbose_name_plural = 'Inventory Summaries'
+        ordering = ['days_of_cover']
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.stock_quantity} in stock"
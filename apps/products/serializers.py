@@ -4,7 +4,11 @@ NexCart Product Serializers
 """
 from rest_framework import serializers
 from django.db.models import Count
-from .models import Category, Product, ProductImage, ProductReview, Wishlist
+from .models import Category, InventorySummary, Product, ProductImage, ProductReview, Wishlist
+from .images import image_url, absolute_url, srcset_map
+from decimal import Decimal
+
+TWO_PLACES = Decimal('0.01')
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -12,24 +16,24 @@ class CategorySerializer(serializers.ModelSerializer):
     # This maps directly to the annotated field in our View
     product_count = serializers.IntegerField(source='products_count_annotated', read_only=True)
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'image', 'parent', 'children', 'is_active', 'product_count']
+        fields = ['id', 'name', 'slug', 'description', 'image', 'image_srcset', 'parent', 'children', 'is_active', 'product_count']
     
     def get_image(self, obj):
         """Return full URL for category image"""
-        if obj.image and obj.image.name:
-            try:
-                request = self.context.get('request')
-                if request:
-                    return request.build_absolute_uri(obj.image.url)
-                return obj.image.url
-            except Exception:
-                return None
-        return None
+        return absolute_url(image_url(obj.image_urls, obj.image), self.context.get('request'))
+    
+    def get_image_srcset(self, obj):
+        """Return {'webp': srcset, 'jpeg': srcset} for responsive images"""
+        return srcset_map(obj.image_derivatives, self.context.get('request'))
     
     def get_children(self, obj):
+        # Use children prefetched by ProductService.get_detail_queryset when available
+        if hasattr(obj, 'active_children'):
+            return CategorySerializer(obj.active_children, many=True, context=self.context).data
         if obj.children.exists():
             # Apply the same annotation logic to children for nested counts
             children_qs = obj.children.filter(is_active=True).annotate(
@@ -42,22 +46,19 @@ class CategorySerializer(serializers.ModelSerializer):
 class ProductImageSerializer(serializers.ModelSerializer):
     """Product image serializer"""
     image = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'position']
+        fields = ['id', 'image', 'srcset', 'alt_text', 'position']
     
     def get_image(self, obj):
         """Return full URL for image"""
-        if obj.image and obj.image.name:
-            try:
-                request = self.context.get('request')
-                if request:
-                    return request.build_absolute_uri(obj.image.url)
-                return obj.image.url
-            except Exception:
-                return None
-        return None
+        return absolute_url(image_url(obj.image_urls, obj.image), self.context.get('request'))
+    
+    def get_srcset(self, obj):
+        """Return {'webp': srcset, 'jpeg': srcset} for responsive images"""
+        return srcset_map(obj.image_derivatives, self.context.get('request'))
 
 
 class ProductReviewSerializer(serializers.ModelSerializer):
@@ -75,33 +76,68 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'is_verified_purchase', 'is_approved', 'helpful_count', 'created_at', 'updated_at']
 
 
+def _decimal_to_string(value):
+    """Match DRF DecimalField output for the 2-place model decimals"""
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value).strip())
+    return '{:f}'.format(value.quantize(TWO_PLACES))
+
+
 class ProductListSerializer(serializers.ModelSerializer):
-    """Product list serializer (minimal fields)"""
+    """
+    Product list serializer (minimal fields)
+    
+    Used for every item of list, wishlist, cart and recommendation responses,
+    so to_representation is hand-rolled instead of walking the declared fields
+    per instance. Output is identical to the declarative path.
+    """
     category_name = serializers.CharField(source='category.name', read_only=True)
     featured_image = serializers.SerializerMethodField()
+    featured_image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'slug', 'short_description', 'category', 'category_name',
             'price', 'compare_price', 'discount_percentage', 'featured_image',
-            'is_in_stock', 'average_rating', 'review_count', 'is_featured'
+            'featured_image_srcset', 'is_in_stock', 'average_rating', 'review_count', 'is_featured'
         ]
     
+    def to_representation(self, instance):
+        data = {
+            'id': str(instance.id),
+            'name': instance.name,
+            'slug': instance.slug,
+            'short_description': instance.short_description,
+            'category': instance.category_id,
+        }
+        # Declarative CharField(source='category.name') skips the key without a category
+        if instance.category_id is not None:
+            data['category_name'] = instance.category.name
+        data['price'] = _decimal_to_string(instance.price)
+        data['compare_price'] = _decimal_to_string(instance.compare_price)
+        data['discount_percentage'] = instance.discount_percentage
+        data['featured_image'] = self.get_featured_image(instance)
+        data['featured_image_srcset'] = self.get_featured_image_srcset(instance)
+        data['is_in_stock'] = instance.is_in_stock
+        data['average_rating'] = _decimal_to_string(instance.average_rating)
+        data['review_count'] = instance.review_count
+        data['is_featured'] = instance.is_featured
+        return data
+    
+    def declarative_representation(self, instance):
+        """Field-by-field DRF output, kept as the reference for tests and benchmarks"""
+        return super().to_representation(instance)
+    
     def get_featured_image(self, obj):
         """Return full URL for featured image"""
-        # Check if field has any value (string path or file object)
-        if obj.featured_image and obj.featured_image.name:
-            try:
-                request = self.context.get('request')
-                if request:
-                    return request.build_absolute_uri(obj.featured_image.url)
-                return obj.featured_image.url
-            except Exception as e:
-                # If URL generation fails, return None
-                print(f"Error getting image URL for {obj.name}: {e}")
-                return None
-        return None
+        return absolute_url(image_url(obj.featured_image_urls, obj.featured_image), self.context.get('request'))
+    
+    def get_featured_image_srcset(self, obj):
+        """Return {'webp': srcset, 'jpeg': srcset} for responsive images"""
+        return srcset_map(obj.featured_image_derivatives, self.context.get('request'))
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
@@ -111,6 +147,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     reviews = serializers.SerializerMethodField()
     tags_list = serializers.SerializerMethodField()
     featured_image = serializers.SerializerMethodField()
+    featured_image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
@@ -118,26 +155,19 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'id', 'name', 'slug', 'description', 'short_description',
             'category', 'tags', 'tags_list', 'price', 'compare_price',
             'discount_percentage', 'sku', 'stock_quantity', 'track_inventory',
-            'allow_backorder', 'featured_image', 'images', 'meta_title',
+            'allow_backorder', 'featured_image', 'featured_image_srcset', 'images', 'meta_title',
             'meta_description', 'is_active', 'is_featured', 'is_in_stock',
             'view_count', 'purchase_count', 'average_rating', 'review_count',
-            'reviews', 'created_at', 'updated_at'
+            'rating_histogram', 'reviews', 'created_at', 'updated_at'
         ]
     
     def get_featured_image(self, obj):
         """Return full URL for featured image"""
-        # Check if field has any value (string path or file object)
-        if obj.featured_image and obj.featured_image.name:
-            try:
-                request = self.context.get('request')
-                if request:
-                    return request.build_absolute_uri(obj.featured_image.url)
-                return obj.featured_image.url
-            except Exception as e:
-                # If URL generation fails, return None
-                print(f"Error getting image URL for {obj.name}: {e}")
-                return None
-        return None
+        return absolute_url(image_url(obj.featured_image_urls, obj.featured_image), self.context.get('request'))
+    
+    def get_featured_image_srcset(self, obj):
+        """Return {'webp': srcset, 'jpeg': srcset} for responsive images"""
+        return srcset_map(obj.featured_image_derivatives, self.context.get('request'))
     
     def get_tags_list(self, obj):
         if obj.tags:
@@ -145,7 +175,9 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         return []
     
     def get_reviews(self, obj):
-        reviews = obj.reviews.filter(is_approved=True).order_by('-created_at')[:5]
+        if hasattr(obj, 'recent_reviews'):
+            return ProductReviewSerializer(obj.recent_reviews, many=True).data
+        reviews = obj.reviews.filter(is_approved=True).select_related('user').order_by('-created_at')[:5]
         return ProductReviewSerializer(reviews, many=True).data
 
 
@@ -157,4 +189,20 @@ class WishlistSerializer(serializers.ModelSerializer):
     class Meta:
         model = Wishlist
         fields = ['id', 'product', 'product_id', 'created_at']
-        read_only_fields = ['id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+
+
+class InventorySummarySerializer(serializers.ModelSerializer):
+    """Inventory summary row (admin)"""
+    product_id = serializers.UUIDField(read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    product_sku = serializers.CharField(source='product.sku', read_only=True)
+    
+    class Meta:
+        model = InventorySummary
+        fields = [
+            'product_id', 'product_name', 'product_sku', 'stock_quantity',
+            'units_sold_7d', 'units_sold_30d', 'daily_sell_rate', 'days_of_cover',
+            'is_low_stock', 'refreshed_at'
+        ]
+
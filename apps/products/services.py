@@ -3,48 +3,128 @@
 NexCart Product Services
 Business logic for product management
 """
-from django.db.models import Avg, F
-from django.core.cache import cache
-from .models import Product, ProductReview
+from django.db.models import Case, Count, F, FloatField, Prefetch, Q, Sum, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
+from decimal import Decimal, ROUND_HALF_UP
+from core.common.db import bulk_assign
+from .models import Category, Product, ProductReview
+from .buffers import buffer_product_view, buffer_activity
+from .cache import bump_catalog_version, invalidate_product_details
+from .inventory import get_stock_conflicts, release_stock, reserve_stock
 import logging
 
 logger = logging.getLogger(__name__)
 
+RATING_AGGREGATE_FIELDS = [
+    'review_count', 'rating_sum',
+    'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+]
+
 
 class ProductService:
     """Product business logic"""
     
+    @staticmethod
+    def get_detail_queryset():
+        """
+        Active products with everything ProductDetailSerializer reads,
+        fetched in a fixed number of queries regardless of row counts
+        """
+        active_children = Category.objects.filter(is_active=True).annotate(
+            products_count_annotated=Count('products', distinct=True)
+        ).order_by('name')
+        
+        return Product.objects.filter(is_active=True).select_related('category').prefetch_related(
+            'images',
+            Prefetch(
+                'reviews',
+                queryset=ProductReview.objects.filter(is_approved=True).select_related('user').order_by('-created_at')[:5],
+                to_attr='recent_reviews'
+            ),
+            Prefetch('category__children', queryset=active_children, to_attr='active_children'),
+            Prefetch('category__active_children__children', queryset=active_children, to_attr='active_children'),
+        )
+    
     @staticmethod
     def update_product_rating(product_id):
-        """Update product average rating and review count"""
-        try:
-            product = Product.objects.get(id=product_id)
-            reviews = ProductReview.objects.filter(
-                product=product,
-                is_approved=True
-            )
-            
-            aggregate = reviews.aggregate(
-                avg_rating=Avg('rating'),
-                count=F('id')
+        """Recompute one product's rating aggregates from its approved reviews"""
+        ProductService.reconcile_product_ratings(product_ids=[product_id])
+    
+    @staticmethod
+    def apply_rating_change(product_id, old_rating, new_rating):
+        """
+        Move one review between rating buckets with a single atomic UPDATE.
+        A rating of None means the review is not counted (unapproved or absent).
+        """
+        if old_rating == new_rating:
+            return
+        
+        deltas = {field: 0 for field in RATING_AGGREGATE_FIELDS}
+        for rating, sign in ((old_rating, -1), (new_rating, 1)):
+            if rating is not None:
+                deltas['review_count'] += sign
+                deltas['rating_sum'] += sign * rating
+                deltas[f'rating_{rating}_count'] += sign
+        
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        # Every SET expression reads the pre-update row, so the average uses the new totals
+        review_count = F('review_count') + deltas['review_count']
+        rating_sum = F('rating_sum') + deltas['rating_sum']
+        updates['average_rating'] = Case(
+            When(GreaterThan(review_count, 0), then=Round(Cast(rating_sum, FloatField()) / review_count, 2)),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+        Product.objects.filter(id=product_id).update(**updates)
+    
+    @staticmethod
+    def reconcile_product_ratings(product_ids=None):
+        """
+        Rebuild rating aggregates from approved reviews with one grouped
+        query and rewrite only the products that drifted.
+        Returns the number of products corrected.
+        """
+        reviews = ProductReview.objects.filter(is_approved=True)
+        products = Product.objects.all()
+        if product_ids is not None:
+            reviews = reviews.filter(product_id__in=product_ids)
+            products = products.filter(id__in=product_ids)
+        
+        aggregates = reviews.values('product_id').annotate(
+            review_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'rating_{stars}_count': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)}
+        ).order_by()
+        expected = {row.pop('product_id'): row for row in aggregates}
+        
+        empty = {field: 0 for field in RATING_AGGREGATE_FIELDS}
+        drifted = {}
+        for stored in products.values('id', 'average_rating', *RATING_AGGREGATE_FIELDS).iterator(chunk_size=2000):
+            product_id = stored.pop('id')
+            row = dict(expected.get(product_id, empty))
+            row['average_rating'] = (
+                (Decimal(row['rating_sum']) / row['review_count']).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                if row['review_count'] else Decimal('0.00')
             )
-            
-            product.average_rating = aggregate['avg_rating'] or 0
-            product.review_count = reviews.count()
-            product.save(update_fields=['average_rating', 'review_count'])
-            
-            # Clear cache
-            cache_key = f'product_detail_{product_id}'
-            cache.delete(cache_key)
-            
-            logger.info(f"Updated rating for product {product_id}")
-            
-        except Product.DoesNotExist:
-            logger.error(f"Product {product_id} not found")
+            if row != stored:
+                drifted[product_id] = row
+        
+        if drifted:
+            bulk_assign(Product, drifted, RATING_AGGREGATE_FIELDS + ['average_rating'])
+            # Raw UPDATEs send no signals
+            invalidate_product_details(list(drifted))
+            bump_catalog_version()
+            logger.info(f"Reconciled rating aggregates for {len(drifted)} products")
+        
+        return len(drifted)
     
     @staticmethod
     def increment_view_count(product_id):
-        """Increment product view count"""
+        """Increment product view count (buffered in Redis when available)"""
+        if buffer_product_view(product_id):
+            return
+        
         try:
             Product.objects.filter(id=product_id).update(
                 view_count=F('view_count') + 1
@@ -52,6 +132,25 @@ class ProductService:
         except Exception as e:
             logger.error(f"Error incrementing view count: {str(e)}")
     
+    @staticmethod
+    def record_activity(activity_type, product_id=None, user=None, session_id=''):
+        """Record a user activity (buffered in Redis when available)"""
+        from apps.users.models import UserActivity
+        
+        activity = {
+            'user_id': user.id if user else None,
+            'session_id': session_id,
+            'activity_type': activity_type,
+            'product_id': product_id,
+        }
+        if buffer_activity(activity):
+            return
+        
+        try:
+            UserActivity.objects.create(**activity)
+        except Exception as e:
+            logger.error(f"Error recording activity: {str(e)}")
+    
     @staticmethod
     def increment_purchase_count(product_id, quantity=1):
         """Increment product purchase count"""
@@ -64,51 +163,17 @@ class ProductService:
     
     @staticmethod
     def check_stock_availability(product_id, quantity):
-        """Check if product has enough stock"""
-        try:
-            product = Product.objects.get(id=product_id)
-            
-            if not product.track_inventory:
-                return True
-            
-            if product.stock_quantity >= quantity:
-                return True
-            
-            if product.allow_backorder:
-                return True
-            
-            return False
-            
-        except Product.DoesNotExist:
-            return False
+        """Check if product has enough stock (advisory; reserve_stock is authoritative)"""
+        return not get_stock_conflicts({product_id: quantity})
     
     @staticmethod
     def reduce_stock(product_id, quantity):
-        """Reduce product stock quantity"""
-        try:
-            product = Product.objects.get(id=product_id)
-            
-            if product.track_inventory:
-                if product.stock_quantity >= quantity:
-                    product.stock_quantity -= quantity
-                    product.save(update_fields=['stock_quantity'])
-                    logger.info(f"Reduced stock for product {product_id} by {quantity}")
-                else:
-                    logger.warning(f"Insufficient stock for product {product_id}")
-            
-        except Product.DoesNotExist:
-            logger.error(f"Product {product_id} not found")
+        """Atomically reduce product stock; raises InsufficientStock when short"""
+        reserve_stock({product_id: quantity})
+        logger.info(f"Reduced stock for product {product_id} by {quantity}")
     
     @staticmethod
     def restore_stock(product_id, quantity):
         """Restore product stock quantity (e.g., after order cancellation)"""
-        try:
-            product = Product.objects.get(id=product_id)
-            
-            if product.track_inventory:
-                product.stock_quantity += quantity
-                product.save(update_fields=['stock_quantity'])
-                logger.info(f"Restored stock for product {product_id} by {quantity}")
-            
-        except Product.DoesNotExist:
-            logger.error(f"Product {product_id} not found")
\ No newline at end of file
+        if release_stock({product_id: quantity}):
+            logger.info(f"Restored stock for product {product_id} by {quantity}")
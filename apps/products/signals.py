@@ -0,0 +1,116 @@
+# Location: apps\products\signals.py
+"""
+NexCart Product Signals
+Keep catalog caches in sync with product and category writes
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Category, Product, ProductImage, ProductReview
+from .cache import (
+    bump_catalog_version,
+    build_product_detail_document,
+    invalidate_product_details,
+    invalidate_review_pages
+)
+from .services import ProductService
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_catalog_cache(sender, **kwargs):
+    """
+    Any catalog write invalidates every cached catalog response, once the
+    write is committed (a read in between would cache the old rows under
+    the new version)
+    """
+    transaction.on_commit(bump_catalog_version, robust=True)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_detail(sender, instance, **kwargs):
+    """Write-through: rebuild the detail document of a saved product once committed"""
+    product_id = instance.id
+    transaction.on_commit(lambda: build_product_detail_document(product_id), robust=True)
+
+
+@receiver(post_delete, sender=Product)
+def drop_product_detail(sender, instance, **kwargs):
+    product_ids = [instance.id]
+    transaction.on_commit(lambda: invalidate_product_details(product_ids), robust=True)
+
+
+@receiver(post_save, sender=ProductReview)
+def update_rating_on_review_save(sender, instance, created, **kwargs):
+    """
+    Apply a review create/approve/unapprove/re-rate as a rating delta.
+    Connected before refresh_parent_product_detail so the rebuilt document sees it.
+    """
+    counted = (instance.product_id, instance.counted_rating)
+    if created:
+        previous = (instance.product_id, None)
+    elif hasattr(instance, '_counted'):
+        previous = instance._counted
+    else:
+        # Previously counted state unknown (e.g. loaded with only()): recompute
+        ProductService.update_product_rating(instance.product_id)
+        instance._counted = counted
+        return
+    
+    if previous[0] != instance.product_id:
+        ProductService.apply_rating_change(previous[0], previous[1], None)
+        ProductService.apply_rating_change(instance.product_id, None, counted[1])
+    else:
+        ProductService.apply_rating_change(instance.product_id, previous[1], counted[1])
+    instance._counted = counted
+
+
+@receiver(post_delete, sender=ProductReview)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    if hasattr(instance, '_counted'):
+        ProductService.apply_rating_change(instance._counted[0], instance._counted[1], None)
+    else:
+        ProductService.update_product_rating(instance.product_id)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def refresh_parent_product_detail(sender, instance, **kwargs):
+    """Images and reviews are embedded in the product detail document"""
+    product_id = instance.product_id
+    transaction.on_commit(lambda: build_product_detail_document(product_id), robust=True)
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def drop_review_pages(sender, instance, **kwargs):
+    """Review writes drop the product's cached first feed pages"""
+    product_id = instance.product_id
+    transaction.on_commit(lambda: invalidate_review_pages(product_id), robust=True)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_product_details(sender, instance, **kwargs):
+    """
+    A category is embedded in the documents of its own products and, as a
+    child or grandchild (category__active_children__children), in those of
+    its parent's and grandparent's products
+    """
+    category_ids = [instance.id]
+    if instance.parent_id:
+        category_ids.append(instance.parent_id)
+        grandparent_id = Category.objects.filter(pk=instance.parent_id).values_list('parent_id', flat=True).first()
+        if grandparent_id:
+            category_ids.append(grandparent_id)
+    product_ids = list(Product.objects.filter(category_id__in=category_ids).values_list('id', flat=True))
+    transaction.on_commit(lambda: invalidate_product_details(product_ids), robust=True)
@@ -0,0 +1,122 @@
+# Location: apps\products\tasks.py
+"""
+NexCart Product Celery Tasks
+Background tasks for catalog maintenance
+"""
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.core.mail import send_mail
+from .buffers import flush_view_counts, flush_activities
+from .images import IMAGE_VARIANT_WIDTHS, delete_derivative_files, generate_derivatives
+from .services import ProductService
+from .inventory import build_low_stock_digest, refresh_inventory_summary, release_expired_reservations
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_buffered_writes():
+    """Apply buffered view counts and user activity to the database"""
+    try:
+        products = flush_view_counts()
+        activities = flush_activities()
+        logger.info(f"Flushed view counts for {products} products and {activities} activities")
+    except Exception as e:
+        logger.error(f"Error flushing buffered writes: {str(e)}")
+
+
+@shared_task
+def release_expired_stock_reservations():
+    """Return stock held by pending orders whose hold has expired"""
+    try:
+        release_expired_reservations()
+    except Exception as e:
+        logger.error(f"Error releasing expired stock reservations: {str(e)}")
+
+
+@shared_task
+def refresh_inventory_summary_task():
+    """Rebuild the per-product stock and sell-through summary"""
+    try:
+        refresh_inventory_summary()
+    except Exception as e:
+        logger.error(f"Error refreshing inventory summary: {str(e)}")
+
+
+@shared_task
+def send_low_stock_digest():
+    """Email every admin one digest of all low-stock products"""
+    from apps.users.models import User
+    
+    try:
+        refresh_inventory_summary()
+        digest = build_low_stock_digest()
+        if digest is None:
+            return
+        
+        recipients = list(
+            User.objects.filter(role='admin', is_active=True).exclude(email='').values_list('email', flat=True)
+        )
+        if not recipients:
+            logger.warning("Low-stock digest skipped: no admin recipients")
+            return
+        
+        subject, message = digest
+        send_mail(
+            subject,
+            message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=recipients,
+            fail_silently=False,
+        )
+        
+        logger.info(f"Low-stock digest sent to {len(recipients)} admins")
+        
+    except Exception as e:
+        logger.error(f"Error sending low-stock digest: {str(e)}")
+
+
+@shared_task
+def reconcile_product_ratings():
+    """Correct drift in the incrementally maintained rating aggregates"""
+    try:
+        corrected = ProductService.reconcile_product_ratings()
+        logger.info(f"Rating reconciliation corrected {corrected} products")
+    except Exception as e:
+        logger.error(f"Error reconciling product ratings: {str(e)}")
+
+
+@shared_task
+def generate_image_derivatives(model_label, pk, image_field, stale_derivatives=None):
+    """Generate resized WebP/JPEG renditions of an uploaded image"""
+    model = apps.get_model(model_label)
+    urls_field = f'{image_field}_urls'
+    derivatives_field = f'{image_field}_derivatives'
+    
+    try:
+        obj = model.objects.get(pk=pk)
+        field_file = getattr(obj, image_field)
+        
+        if stale_derivatives:
+            delete_derivative_files(field_file.storage, stale_derivatives)
+        if not field_file or not field_file.name:
+            return
+        
+        derivatives = generate_derivatives(field_file)
+        
+        urls = getattr(obj, urls_field)
+        for variant in IMAGE_VARIANT_WIDTHS:
+            urls[variant] = derivatives[variant]['jpeg']['url']
+        setattr(obj, derivatives_field, derivatives)
+        
+        # Saving without the image field fires the cache signals without re-queueing
+        obj.save(update_fields=[urls_field, derivatives_field])
+        
+        logger.info(f"Generated image derivatives for {model_label} {pk}")
+        
+    except model.DoesNotExist:
+        logger.error(f"{model_label} {pk} not found")
+    except Exception as e:
+        logger.error(f"Error generating image derivatives for {model_label} {pk}: {str(e)}")
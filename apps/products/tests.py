@@ -0,0 +1,982 @@
+# Location: apps\products\tests.py
+"""
+NexCart Product Tests
+"""
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import close_old_connections, connection, OperationalError
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from rest_framework.test import APITestCase
+from rest_framework import status
+from apps.users.models import User, UserActivity
+from .models import Category, InventorySummary, Product, ProductImage, ProductReview, StockReservation
+from .buffers import apply_view_counts, create_activities, flush_view_counts
+from .cache import get_catalog_version, set_cached_stock
+from .inventory import (
+    InsufficientStock,
+    commit_reservations,
+    hold_stock,
+    refresh_inventory_summary,
+    release_expired_reservations,
+    release_reservations,
+    release_stock,
+    reserve_stock
+)
+from .catalog import CatalogImportService, export_catalog, read_rows
+from .cache import PRODUCT_DETAIL_KEY
+from .serializers import ProductListSerializer
+from .services import ProductService
+from .tasks import generate_image_derivatives, send_low_stock_digest
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+import io
+import os
+import tempfile
+import time
+
+
+class CatalogResponseCacheTest(APITestCase):
+    """Test full-response caching of public catalog endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Phone',
+            description='A phone',
+            category=self.category,
+            price='199.99',
+            sku='PHONE-001',
+            stock_quantity=10
+        )
+
+    def test_second_request_is_served_from_cache(self):
+        """Test repeated list request does not hit the database"""
+        url = reverse('products:product-list')
+        first = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_query_params_are_normalized(self):
+        """Test parameter order does not change the cache entry"""
+        url = reverse('products:product-list')
+        self.client.get(url, {'ordering': 'price', 'page_size': 5})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(f'{url}?page_size=5&ordering=price')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_conditional_get_returns_not_modified(self):
+        """Test matching If-None-Match returns 304 without a body"""
+        url = reverse('products:product-list')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_product_write_invalidates_cache(self):
+        """Test saving a product serves fresh data"""
+        url = reverse('products:product-list')
+        etag = self.client.get(url)['ETag']
+
+        self.product.price = '149.99'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'][0]['price'], '149.99')
+
+    def test_invalidation_waits_for_commit(self):
+        """Test an uncommitted write does not move the cache version"""
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.price = '149.99'
+            self.product.save()
+            self.assertEqual(get_catalog_version(), version)
+
+        self.assertTrue(callbacks)
+
+
+class ProductDetailDocumentTest(APITestCase):
+    """Test product detail served from cached documents"""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = Product.objects.create(
+                name='Camera', description='Test', price='299.00', sku='CAM-1', stock_quantity=3
+            )
+        self.url = reverse('products:product-detail', kwargs={'id': self.product.id})
+
+    def test_detail_served_from_document(self):
+        """Test a warm document needs only the view-count write"""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['sku'], 'CAM-1')
+
+    def test_save_rebuilds_document(self):
+        """Test write-through on product save"""
+        self.product.name = 'Camera Pro'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['name'], 'Camera Pro')
+
+    def test_stock_counter_overlay(self):
+        """Test fast stock counter overrides the document"""
+        set_cached_stock(self.product.id, 0)
+
+        data = self.client.get(self.url).json()
+
+        self.assertEqual(data['stock_quantity'], 0)
+        self.assertFalse(data['is_in_stock'])
+
+    def test_inactive_product_not_found(self):
+        """Test deactivated products drop out of the document cache"""
+        self.product.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_grandchild_category_edit_refreshes_document(self):
+        """Test renaming a grandchild category reaches products of the grandparent"""
+        grandparent = Category.objects.create(name='Photo', slug='photo')
+        child = Category.objects.create(name='Lenses', slug='lenses', parent=grandparent)
+        grandchild = Category.objects.create(name='Primes', slug='primes', parent=child)
+        self.product.category = grandparent
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.client.get(self.url)
+
+        grandchild.name = 'Prime Lenses'
+        with self.captureOnCommitCallbacks(execute=True):
+            grandchild.save()
+
+        children = self.client.get(self.url).json()['category']['children']
+        self.assertEqual(children[0]['children'][0]['name'], 'Prime Lenses')
+
+    def test_rolled_back_save_keeps_document(self):
+        """Test a write that never commits does not reach the document"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.name = 'Camera Pro'
+            self.product.save()
+
+        self.assertTrue(callbacks)
+        self.assertEqual(self.client.get(self.url).json()['name'], 'Camera')
+
+
+class FakeViewBuffer:
+    """The Redis hash commands the view-count buffer uses, answering with bytes"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, {})
+        fields[field.encode()] = str(int(fields.get(field.encode(), 0)) + amount).encode()
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field.encode())
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class Pipeline:
+            calls = []
+
+            def __getattr__(self, name):
+                return lambda *args: self.calls.append((getattr(client, name), args))
+
+            def execute(self):
+                calls, self.calls = self.calls, []
+                return [method(*args) for method, args in calls]
+
+        return Pipeline()
+
+
+class BufferedWritesTest(APITestCase):
+    """Test flushing of buffered view counts and activity"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', description='Test', price='10.00', sku=f'SKU-{i}'
+            )
+            for i in range(3)
+        ]
+
+    def test_view_counts_applied_in_one_statement(self):
+        """Test aggregated view counts land in a single UPDATE"""
+        counts = {str(p.id): i + 1 for i, p in enumerate(self.products)}
+
+        with self.assertNumQueries(1):
+            apply_view_counts(counts)
+
+        for i, product in enumerate(self.products):
+            product.refresh_from_db()
+            self.assertEqual(product.view_count, i + 1)
+
+    def test_flush_keeps_reported_view_count(self):
+        """Test the detail view count never drops when buffered views are flushed"""
+        cache.clear()
+        url = reverse('products:product-detail', kwargs={'id': self.products[0].id})
+        redis = FakeViewBuffer()
+        with mock.patch('apps.products.buffers.get_redis_client', return_value=redis):
+            reported = [self.client.get(url).json()['view_count'] for _ in range(3)]
+            flush_view_counts()
+            reported += [self.client.get(url).json()['view_count'] for _ in range(2)]
+
+        self.assertEqual(reported, [0, 1, 2, 3, 4])
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].view_count, 3)
+
+    def test_activities_bulk_created(self):
+        """Test activity events are inserted and orphans dropped"""
+        events = [
+            {'user_id': str(self.user.id), 'session_id': 's1', 'activity_type': 'view', 'product_id': str(p.id)}
+            for p in self.products
+        ]
+        events.append({
+            'user_id': str(self.user.id), 'session_id': 's1', 'activity_type': 'view',
+            'product_id': '00000000-0000-0000-0000-000000000000'
+        })
+
+        created = create_activities(events)
+
+        self.assertEqual(created, 3)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 3)
+
+
+class ProductDetailQueryTest(APITestCase):
+    """Test product detail runs a fixed number of queries"""
+
+    def setUp(self):
+        cache.clear()
+        self.parent = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Laptop', description='Test', category=self.parent, price='999.00', sku='LAPTOP-1'
+        )
+        self.url = reverse('products:product-detail', kwargs={'id': self.product.id})
+
+    def _add_related_rows(self, count):
+        for i in range(count):
+            Category.objects.create(name=f'Child {self.parent.children.count()}', parent=self.parent)
+            ProductImage.objects.create(product=self.product, image=f'products/{i}.jpg', position=i)
+            user = User.objects.create_user(email=f'reviewer{User.objects.count()}@example.com', password='pass12345')
+            ProductReview.objects.create(product=self.product, user=user, rating=5, comment='Great')
+
+    def test_query_count_does_not_grow_with_related_rows(self):
+        """Test query count is the same for 1 and 10 children/images/reviews"""
+        # product+category, images, reviews+users, children, grandchildren, view count
+        expected_queries = 6
+
+        self._add_related_rows(1)
+        cache.clear()
+        with self.assertNumQueries(expected_queries):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()['reviews']), 1)
+
+        self._add_related_rows(9)
+        cache.clear()
+        with self.assertNumQueries(expected_queries):
+            response = self.client.get(self.url)
+
+        data = response.json()
+        self.assertEqual(len(data['images']), 10)
+        self.assertEqual(len(data['reviews']), 5)
+        self.assertEqual(len(data['category']['children']), 10)
+        self.assertEqual(data['reviews'][0]['user_name'], data['reviews'][0]['user_email'])
+
+
+class ProductListSerializerTest(APITestCase):
+    """Test the hand-rolled list serializer matches the declarative one"""
+
+    def test_output_is_byte_identical(self):
+        """Test JSON is identical with and without category, image and compare price"""
+        category = Category.objects.create(name='Books')
+        Product.objects.create(
+            name='Novel', description='Test', category=category, price='12.50',
+            compare_price='20.00', sku='BOOK-1', featured_image='products/novel.jpg'
+        )
+        Product.objects.create(name='Loose item', description='Test', price='3', sku='LOOSE-1', stock_quantity=0)
+        request = APIRequestFactory().get('/api/products/')
+        serializer = ProductListSerializer(context={'request': request})
+        renderer = JSONRenderer()
+
+        for product in Product.objects.select_related('category'):
+            self.assertEqual(
+                renderer.render(serializer.to_representation(product)),
+                renderer.render(serializer.declarative_representation(product))
+            )
+
+
+class ImageUrlResolutionTest(APITestCase):
+    """Test image URLs are resolved at save time"""
+
+    def test_urls_stored_on_save(self):
+        """Test saving a product stores its image URL"""
+        product = Product.objects.create(
+            name='Lamp', description='Test', price='15.00', sku='LAMP-1', featured_image='products/lamp.jpg'
+        )
+        self.assertEqual(product.featured_image_urls, {'original': '/media/products/lamp.jpg'})
+
+        product.stock_quantity = 4
+        product.save(update_fields=['stock_quantity'])
+        product.refresh_from_db()
+        self.assertEqual(product.featured_image_urls['original'], '/media/products/lamp.jpg')
+
+    def test_list_serialization_skips_storage(self):
+        """Test list serialization uses the stored URL"""
+        product = Product.objects.create(
+            name='Desk', description='Test', price='80.00', sku='DESK-1', featured_image='products/desk.jpg'
+        )
+        product.featured_image_urls = {'original': 'https://cdn.example.com/desk.jpg'}
+        request = APIRequestFactory().get('/api/products/')
+
+        data = ProductListSerializer(product, context={'request': request}).data
+
+        self.assertEqual(data['featured_image'], 'https://cdn.example.com/desk.jpg')
+
+
+class ImageDerivativeTest(APITestCase):
+    """Test the WebP/JPEG derivative pipeline on local storage"""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.override = override_settings(MEDIA_ROOT=self.media_root.name)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.media_root.cleanup()
+
+    def _upload(self, width, height):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (width, height), (200, 50, 50, 128)).save(buffer, 'PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def test_derivatives_generated_with_dimensions(self):
+        """Test renditions are written and recorded on the product"""
+        product = Product.objects.create(
+            name='Poster', description='Test', price='9.99', sku='POSTER-1', featured_image=self._upload(1200, 600)
+        )
+
+        generate_image_derivatives('products.product', str(product.id), 'featured_image')
+        product.refresh_from_db()
+
+        derivatives = product.featured_image_derivatives
+        self.assertEqual(derivatives['original']['width'], 1200)
+        self.assertEqual(derivatives['thumbnail']['webp']['width'], 150)
+        self.assertEqual(derivatives['thumbnail']['webp']['height'], 75)
+        self.assertEqual(derivatives['detail']['jpeg']['width'], 1000)
+        for variant in ('thumbnail', 'card', 'detail'):
+            for rendition in derivatives[variant].values():
+                path = os.path.join(self.media_root.name, rendition['name'])
+                self.assertEqual(os.path.getsize(path), rendition['bytes'])
+        self.assertEqual(product.featured_image_urls['thumbnail'], derivatives['thumbnail']['jpeg']['url'])
+
+        data = ProductListSerializer(product).data
+        self.assertEqual(
+            data['featured_image_srcset']['webp'],
+            ', '.join(f"{derivatives[v]['webp']['url']} {w}w" for v, w in [('thumbnail', 150), ('card', 400), ('detail', 1000)])
+        )
+
+    def test_small_image_is_not_upscaled(self):
+        """Test renditions never exceed the original width"""
+        product = Product.objects.create(
+            name='Icon', description='Test', price='1.00', sku='ICON-1', featured_image=self._upload(300, 300)
+        )
+
+        generate_image_derivatives('products.product', str(product.id), 'featured_image')
+        product.refresh_from_db()
+
+        self.assertEqual(product.featured_image_derivatives['detail']['jpeg']['width'], 300)
+        self.assertEqual(len(ProductListSerializer(product).data['featured_image_srcset']['jpeg'].split(', ')), 2)
+
+    def test_image_change_clears_derivatives(self):
+        """Test replacing the image drops the old renditions"""
+        product = Product.objects.create(
+            name='Mug', description='Test', price='5.00', sku='MUG-1', featured_image=self._upload(500, 500)
+        )
+        generate_image_derivatives('products.product', str(product.id), 'featured_image')
+        product.refresh_from_db()
+
+        product.featured_image = self._upload(800, 800)
+        product.save()
+
+        self.assertEqual(product.featured_image_derivatives, {})
+        self.assertEqual(ProductListSerializer(product).data['featured_image_srcset'], {})
+
+
+class CatalogImportExportTest(APITestCase):
+    """Test streaming catalog import/export"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Garden')
+        self.existing = Product.objects.create(
+            name='Hose', description='Test', category=self.category, price='25.00', sku='HOSE-1', stock_quantity=2
+        )
+
+    def _import(self, text, file_format='csv', **kwargs):
+        return CatalogImportService(**kwargs).run(read_rows(io.StringIO(text), file_format))
+
+    def test_csv_upsert_on_sku(self):
+        """Test new SKUs are created and existing ones updated in place"""
+        result = self._import(
+            'sku,name,description,category,price,stock_quantity\n'
+            'HOSE-1,Hose,Test,garden,19.99,40\n'
+            'RAKE-1,Rake,Test,garden,12.00,5\n'
+        )
+
+        self.assertEqual((result.created, result.updated, result.errors), (1, 1, []))
+        self.existing.refresh_from_db()
+        self.assertEqual(str(self.existing.price), '19.99')
+        self.assertEqual(self.existing.stock_quantity, 40)
+        rake = Product.objects.get(sku='RAKE-1')
+        self.assertEqual((rake.slug, rake.category_id), ('rake', self.category.id))
+
+    def test_partial_update_keeps_other_columns(self):
+        """Test JSONL rows only touch the columns they contain"""
+        result = self._import('{"sku": "HOSE-1", "stock_quantity": 7}\n', 'jsonl')
+
+        self.assertEqual(result.updated, 1)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.stock_quantity, 7)
+        self.assertEqual(self.existing.name, 'Hose')
+        self.assertEqual(self.existing.category_id, self.category.id)
+
+    def test_invalid_rows_reported(self):
+        """Test validation errors carry line numbers and skip only the bad rows"""
+        result = self._import(
+            'sku,name,description,category,price\n'
+            'A-1,Good,Test,garden,1.00\n'
+            'A-2,Bad category,Test,nowhere,1.00\n'
+            'A-3,Bad price,Test,garden,abc\n'
+            'A-4,,Test,garden,1.00\n',
+            chunk_size=2
+        )
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5])
+        self.assertFalse(Product.objects.filter(sku__in=['A-2', 'A-3', 'A-4']).exists())
+
+    def test_dry_run_writes_nothing(self):
+        """Test dry run validates without writing"""
+        result = self._import('sku,name,description,price\nNEW-1,New,Test,1.00\n', dry_run=True)
+
+        self.assertEqual(result.errors, [])
+        self.assertFalse(Product.objects.filter(sku='NEW-1').exists())
+
+    def test_export_round_trip(self):
+        """Test an export re-imports as pure updates"""
+        Product.objects.create(name='Seeds', description='Test, with comma', price='3.50', sku='SEEDS-1')
+
+        for file_format in ('csv', 'jsonl'):
+            text = ''.join(export_catalog(file_format, chunk_size=1))
+            result = self._import(text, file_format)
+            self.assertEqual((result.created, result.updated, result.errors), (0, 2, []))
+
+        self.assertEqual(Product.objects.get(sku='SEEDS-1').description, 'Test, with comma')
+
+
+class BulkProductUpdateTest(APITestCase):
+    """Test the admin bulk price/stock/status endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='adminpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products = [
+                Product.objects.create(name=f'Item {i}', description='Test', price='10.00', sku=f'ITEM-{i}', stock_quantity=5)
+                for i in range(3)
+            ]
+        self.url = reverse('products:product-bulk-update')
+
+    def test_requires_admin(self):
+        """Test regular users are rejected"""
+        user = User.objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user)
+
+        response = self.client.post(self.url, {'products': [{'sku': 'ITEM-0', 'price': '1.00'}]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_per_row_results(self):
+        """Test updates apply and every row gets a result"""
+        self.client.force_authenticate(self.admin)
+        payload = {'products': [
+            {'sku': 'ITEM-0', 'price': '12.50', 'stock_quantity': 40},
+            {'sku': 'ITEM-1', 'is_active': False},
+            {'sku': 'ITEM-2', 'stock_quantity': 5},
+            {'sku': 'MISSING', 'price': '1.00'},
+            {'sku': 'ITEM-0', 'price': '9.00'},
+            {'sku': 'ITEM-2', 'stock_quantity': -1},
+        ]}
+
+        response = self.client.post(self.url, payload, format='json')
+
+        data = response.json()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((data['updated'], data['unchanged'], data['error']), (2, 1, 3))
+        self.assertEqual(
+            [r['status'] for r in data['results']],
+            ['updated', 'updated', 'unchanged', 'error', 'error', 'error']
+        )
+        self.products[0].refresh_from_db()
+        self.assertEqual((str(self.products[0].price), self.products[0].stock_quantity), ('12.50', 40))
+        self.products[1].refresh_from_db()
+        self.assertFalse(self.products[1].is_active)
+
+    def test_only_changed_documents_invalidated(self):
+        """Test untouched products keep their cached detail documents"""
+        self.client.force_authenticate(self.admin)
+
+        self.client.post(self.url, {'products': [{'sku': 'ITEM-0', 'price': '11.00'}]}, format='json')
+
+        self.assertIsNone(cache.get(PRODUCT_DETAIL_KEY.format(self.products[0].id)))
+        self.assertIsNotNone(cache.get(PRODUCT_DETAIL_KEY.format(self.products[1].id)))
+
+
+class RatingAggregateTest(APITestCase):
+    """Test incrementally maintained rating aggregates"""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Kettle', description='Test', price='30.00', sku='KETTLE-1')
+        self.users = [
+            User.objects.create_user(email=f'rater{i}@example.com', password='testpass123') for i in range(3)
+        ]
+
+    def _review(self, user, rating, **kwargs):
+        return ProductReview.objects.create(product=self.product, user=user, rating=rating, comment='Ok', **kwargs)
+
+    def _assert_aggregates(self, count, total, average, histogram):
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, count)
+        self.assertEqual(self.product.rating_sum, total)
+        self.assertEqual(str(self.product.average_rating), average)
+        self.assertEqual(self.product.rating_histogram, histogram)
+
+    def test_create_approve_unapprove_delete(self):
+        """Test each review write adjusts the aggregates"""
+        five = self._review(self.users[0], 5)
+        self._review(self.users[1], 4)
+        two = self._review(self.users[2], 2, is_approved=False)
+        self._assert_aggregates(2, 9, '4.50', {'1': 0, '2': 0, '3': 0, '4': 1, '5': 1})
+
+        two.is_approved = True
+        two.save()
+        self._assert_aggregates(3, 11, '3.67', {'1': 0, '2': 1, '3': 0, '4': 1, '5': 1})
+
+        five = ProductReview.objects.get(id=five.id)
+        five.is_approved = False
+        five.save()
+        self._assert_aggregates(2, 6, '3.00', {'1': 0, '2': 1, '3': 0, '4': 1, '5': 0})
+
+        ProductReview.objects.filter(product=self.product).delete()
+        self._assert_aggregates(0, 0, '0.00', {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0})
+
+    def test_review_create_endpoint_updates_rating(self):
+        """Test creating a review through the API counts it"""
+        self.client.force_authenticate(self.users[0])
+
+        response = self.client.post(
+            reverse('products:review-create'),
+            {'product': str(self.product.id), 'product_id': str(self.product.id), 'rating': 3, 'comment': 'Fine'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self._assert_aggregates(1, 3, '3.00', {'1': 0, '2': 0, '3': 1, '4': 0, '5': 0})
+
+    def test_reconciliation_fixes_drift(self):
+        """Test reconciliation rewrites only drifted products"""
+        self._review(self.users[0], 5)
+        self._review(self.users[1], 1)
+        Product.objects.filter(id=self.product.id).update(review_count=7, rating_sum=1, rating_5_count=0)
+
+        self.assertEqual(ProductService.reconcile_product_ratings(), 1)
+        self._assert_aggregates(2, 6, '3.00', {'1': 1, '2': 0, '3': 0, '4': 0, '5': 1})
+        self.assertEqual(ProductService.reconcile_product_ratings(), 0)
+
+
+class ReviewFeedTest(APITestCase):
+    """Test the cursor-paginated, cached review feed"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='Tent', description='Test', price='120.00', sku='TENT-1')
+        for i in range(12):
+            user = User.objects.create_user(email=f'camper{i}@example.com')
+            ProductReview.objects.create(
+                product=self.product, user=user, rating=i % 5 + 1, comment='Ok', helpful_count=i
+            )
+        self.url = reverse('products:product-reviews', kwargs={'product_id': self.product.id})
+
+    def test_cursor_pages_without_user_queries(self):
+        """Test pages follow cursors and fetch users with the reviews"""
+        with self.assertNumQueries(1):
+            first = self.client.get(self.url, {'ordering': '-helpful_count'}).json()
+        self.assertEqual([r['helpful_count'] for r in first['results']], list(range(11, 1, -1)))
+
+        with self.assertNumQueries(1):
+            second = self.client.get(first['next']).json()
+        self.assertEqual([r['helpful_count'] for r in second['results']], [1, 0])
+        self.assertIsNone(second['next'])
+
+    def test_tied_helpful_counts_page_without_gaps(self):
+        """Test many reviews tied on helpful_count page by seeking, never skipping or repeating"""
+        for i in range(12, 40):
+            user = User.objects.create_user(email=f'camper{i}@example.com')
+            ProductReview.objects.create(product=self.product, user=user, rating=5, comment='Ok')
+        ProductReview.objects.filter(product=self.product).update(helpful_count=0)
+
+        ids, previous_ids, url = [], [], self.url
+        params = {'ordering': '-helpful_count', 'page_size': 5}
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                page = self.client.get(url, params).json()
+            self.assertNotIn('OFFSET', queries[-1]['sql'])
+            ids += [r['id'] for r in page['results']]
+            url, params = page['next'], None
+        self.assertEqual(len(ids), 40)
+        self.assertEqual(set(ids), {str(pk) for pk in ProductReview.objects.values_list('id', flat=True)})
+
+        # And back again through the previous links
+        url = page['previous']
+        while url:
+            page = self.client.get(url).json()
+            previous_ids = [r['id'] for r in page['results']] + previous_ids
+            url = page['previous']
+        self.assertEqual(previous_ids, ids[:-5])
+
+    def test_only_known_orderings_cached(self):
+        """Test arbitrary ?ordering= values do not create cache entries"""
+        self.client.get(self.url, {'ordering': 'helpful_count'})
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'ordering': 'helpful_count'})
+
+        self.client.get(self.url, {'ordering': 'bogus'})
+        with self.assertNumQueries(1):
+            self.client.get(self.url, {'ordering': 'bogus'})
+
+    def test_star_filter(self):
+        """Test ?rating= limits the feed to one star value"""
+        data = self.client.get(self.url, {'rating': 5}).json()
+
+        self.assertEqual({r['rating'] for r in data['results']}, {5})
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(self.client.get(self.url, {'rating': 6}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_first_page_cached_until_review_write(self):
+        """Test the first page is served from cache and dropped on review writes"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(len(cached.json()['results']), 10)
+
+        review = ProductReview.objects.filter(product=self.product).order_by('created_at').last()
+        review.comment = 'Updated'
+        with self.captureOnCommitCallbacks(execute=True):
+            review.save()
+
+        self.assertEqual(self.client.get(self.url).json()['results'][0]['comment'], 'Updated')
+
+
+class InventoryReservationTest(APITestCase):
+    """Test conditional, all-or-nothing stock reservations"""
+
+    def setUp(self):
+        self.hot = Product.objects.create(name='Console', description='Test', price='499.00', sku='HOT-1', stock_quantity=3)
+        self.cold = Product.objects.create(name='Cable', description='Test', price='9.00', sku='COLD-1', stock_quantity=50)
+        self.digital = Product.objects.create(
+            name='E-book', description='Test', price='5.00', sku='EBOOK-1', stock_quantity=0, track_inventory=False
+        )
+
+    def test_multi_item_reservation_in_one_statement(self):
+        """Test several products are decremented by a single UPDATE"""
+        with CaptureQueriesContext(connection) as queries:
+            # No backorder levels to read: the caller already knows there are none
+            reserve_stock({self.hot.id: 2, self.cold.id: 10, self.digital.id: 1}, stock_levels={})
+
+        # The rest is the savepoint that scopes the all-or-nothing rollback
+        self.assertEqual([q['sql'].split()[0] for q in queries if 'SAVEPOINT' not in q['sql']], ['UPDATE'])
+
+        self.hot.refresh_from_db()
+        self.cold.refresh_from_db()
+        self.digital.refresh_from_db()
+        self.assertEqual((self.hot.stock_quantity, self.cold.stock_quantity, self.digital.stock_quantity), (1, 40, 0))
+
+    def test_short_item_reserves_nothing(self):
+        """Test one short item fails the whole reservation and is reported"""
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_stock([(self.cold.id, 5), (self.hot.id, 2), (self.hot.id, 2)])
+
+        self.assertEqual(raised.exception.conflicts, [
+            {'product_id': str(self.hot.id), 'name': 'Console', 'requested': 4, 'available': 3}
+        ])
+        self.cold.refresh_from_db()
+        self.assertEqual(self.cold.stock_quantity, 50)
+
+    def test_backorder_floors_at_zero(self):
+        """Test backorderable products never go negative"""
+        Product.objects.filter(id=self.hot.id).update(allow_backorder=True)
+
+        reserve_stock({self.hot.id: 5})
+        release_stock({self.hot.id: 2})
+
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.stock_quantity, 2)
+
+    def test_backorder_hold_releases_only_units_taken(self):
+        """Test releasing a backorder hold returns what was on hand, not what was ordered"""
+        Product.objects.filter(id__in=[self.hot.id, self.cold.id]).update(allow_backorder=True)
+
+        hold_stock('order-backorder', {self.hot.id: 5, self.cold.id: 5}, ttl=timedelta(seconds=-1))
+
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('product__sku', 'quantity')),
+            {'HOT-1': 3, 'COLD-1': 5}
+        )
+        release_expired_reservations()
+        self.hot.refresh_from_db()
+        self.cold.refresh_from_db()
+        self.assertEqual((self.hot.stock_quantity, self.cold.stock_quantity), (3, 50))
+
+    def test_checkout_conflict_returns_409(self):
+        """Test checkout reports short items and leaves stock untouched"""
+        from apps.orders.models import Cart, CartItem, Order
+
+        user = User.objects.create_user(email='shopper@example.com')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.hot, quantity=4, price=self.hot.price)
+        CartItem.objects.create(cart=cart, product=self.cold, quantity=1, price=self.cold.price)
+        self.client.force_authenticate(user)
+
+        response = self.client.post(reverse('orders:order-create'), {
+            'email': 'shopper@example.com', 'phone': '123', 'shipping_first_name': 'Test',
+            'shipping_last_name': 'Shopper', 'shipping_address_line1': '1 Street', 'shipping_city': 'City',
+            'shipping_state': 'ST', 'shipping_postal_code': '00000', 'shipping_country': 'US',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()['conflicts'][0]['available'], 3)
+        self.assertFalse(Order.objects.exists())
+        self.cold.refresh_from_db()
+        self.assertEqual(self.cold.stock_quantity, 50)
+
+
+class InventoryConcurrencyTest(TransactionTestCase):
+    """Stress test: parallel checkouts against one hot SKU never oversell"""
+
+    workers = 8
+    attempts = 40
+
+    def test_parallel_reservations_never_oversell(self):
+        """Test successful reservations exactly consume the stock"""
+        stock = 25
+        hot = Product.objects.create(name='Drop', description='Test', price='99.00', sku='DROP-1', stock_quantity=stock)
+        other = Product.objects.create(name='Sticker', description='Test', price='1.00', sku='STICKER-1', stock_quantity=1000)
+
+        def checkout(_):
+            try:
+                for _ in range(50):
+                    try:
+                        reserve_stock({hot.id: 1, other.id: 1})
+                        return True
+                    except InsufficientStock:
+                        return False
+                    except OperationalError:
+                        # SQLite allows one writer at a time ("database is locked"): back off and retry
+                        time.sleep(0.01)
+                raise RuntimeError('Writer never got the database lock')
+            finally:
+                close_old_connections()
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            outcomes = list(pool.map(checkout, range(self.attempts)))
+
+        hot.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(outcomes.count(True), stock)
+        self.assertEqual(hot.stock_quantity, 0)
+        self.assertEqual(other.stock_quantity, 1000 - stock)
+
+
+class StockReservationTest(APITestCase):
+    """Test time-bound stock holds"""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Sneaker', description='Test', price='89.00', sku='SNKR-1', stock_quantity=10)
+
+    def _stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock_quantity
+
+    def test_hold_decrements_and_expiry_releases(self):
+        """Test the sweeper returns only expired holds"""
+        hold_stock('order-expired', {self.product.id: 3}, ttl=timedelta(seconds=-1))
+        hold_stock('order-live', {self.product.id: 2})
+        self.assertEqual(self._stock(), 5)
+
+        self.assertEqual(release_expired_reservations(), 1)
+
+        self.assertEqual(self._stock(), 8)
+        self.assertEqual(list(StockReservation.objects.values_list('reference', flat=True)), ['order-live'])
+
+    def test_sweeper_batches(self):
+        """Test each batch is one stock UPDATE regardless of holds per product"""
+        for i in range(5):
+            hold_stock(f'order-{i}', {self.product.id: 1}, ttl=timedelta(seconds=-1))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(release_expired_reservations(batch_size=2), 5)
+
+        updates = [q for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(self._stock(), 10)
+
+    def test_commit_keeps_stock_and_release_is_idempotent(self):
+        """Test paid holds stay sold and a released hold is not returned twice"""
+        hold_stock('order-paid', {self.product.id: 4})
+        hold_stock('order-cancelled', {self.product.id: 1})
+
+        commit_reservations('order-paid')
+        release_reservations('order-cancelled')
+        release_reservations('order-cancelled')
+
+        self.assertEqual(self._stock(), 6)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_commit_after_expiry_reserves_again(self):
+        """Test paying after the hold lapsed takes the stock again"""
+        hold_stock('order-late', {self.product.id: 4}, ttl=timedelta(seconds=-1))
+        release_expired_reservations()
+
+        commit_reservations('order-late', [(self.product.id, 4)])
+
+        self.assertEqual(self._stock(), 6)
+
+
+@override_settings(LOW_STOCK_THRESHOLD=5, LOW_STOCK_DAYS_OF_COVER=7)
+class InventorySummaryTest(APITestCase):
+    """Test the inventory summary, its admin endpoint and the low-stock digest"""
+
+    def setUp(self):
+        from apps.orders.models import Order, OrderItem
+
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='adminpass123')
+        self.fast = Product.objects.create(name='Fast Seller', description='Test', price='10.00', sku='FAST-1', stock_quantity=20)
+        self.slow = Product.objects.create(name='Slow Seller', description='Test', price='10.00', sku='SLOW-1', stock_quantity=100)
+        self.empty = Product.objects.create(name='Sold Out', description='Test', price='10.00', sku='OUT-1', stock_quantity=0)
+        Product.objects.create(name='Untracked', description='Test', price='10.00', sku='FREE-1', track_inventory=False)
+
+        def order(status, days_ago, items):
+            created = Order.objects.create(
+                email='buyer@example.com', phone='555', shipping_first_name='A', shipping_last_name='B',
+                shipping_address_line1='1 Street', shipping_city='City', shipping_state='ST',
+                shipping_country='US', shipping_postal_code='00000', subtotal=0, total=0, status=status
+            )
+            for product, quantity in items:
+                item = OrderItem.objects.create(
+                    order=created, product=product, product_name=product.name, product_sku=product.sku,
+                    quantity=quantity, price=product.price, total=Decimal(product.price) * quantity
+                )
+                OrderItem.objects.filter(pk=item.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+        order('delivered', 2, [(self.fast, 30), (self.slow, 1)])
+        order('processing', 20, [(self.fast, 30)])
+        order('delivered', 45, [(self.fast, 100)])
+        order('cancelled', 1, [(self.fast, 500)])
+
+    def test_refresh_aggregates_in_one_query(self):
+        """Test units sold per window skip cancelled and old orders, read with one SELECT"""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(refresh_inventory_summary(), 3)
+
+        selects = [q for q in queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+
+        fast = InventorySummary.objects.get(product=self.fast)
+        self.assertEqual((fast.units_sold_7d, fast.units_sold_30d), (30, 60))
+        self.assertEqual(str(fast.daily_sell_rate), '2.00')
+        self.assertEqual(str(fast.days_of_cover), '10.0')
+        self.assertFalse(fast.is_low_stock)
+
+        slow = InventorySummary.objects.get(product=self.slow)
+        self.assertEqual(str(slow.days_of_cover), '3000.0')
+        empty = InventorySummary.objects.get(product=self.empty)
+        self.assertIsNone(empty.days_of_cover)
+        self.assertTrue(empty.is_low_stock)
+
+    def test_refresh_updates_and_drops_rows(self):
+        """Test a second refresh picks up stock changes and untracked products"""
+        refresh_inventory_summary()
+        Product.objects.filter(pk=self.fast.pk).update(stock_quantity=10)
+        Product.objects.filter(pk=self.slow.pk).update(track_inventory=False)
+
+        refresh_inventory_summary()
+
+        fast = InventorySummary.objects.get(product=self.fast)
+        self.assertEqual((fast.stock_quantity, str(fast.days_of_cover), fast.is_low_stock), (10, '5.0', True))
+        self.assertFalse(InventorySummary.objects.filter(product=self.slow).exists())
+
+    def test_admin_endpoint(self):
+        """Test admins list and filter the summary; other users are rejected"""
+        url = reverse('products:inventory-summary')
+        user = User.objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.post(url).json(), {'products': 3})
+
+        response = self.client.get(url, {'low_stock': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['product_sku'] for row in response.json()['results']], ['OUT-1'])
+
+    def test_digest_is_one_email(self):
+        """Test every low-stock product goes out in a single email to all admins"""
+        User.objects.create_superuser(email='ops@example.com', password='adminpass123')
+        Product.objects.filter(pk=self.fast.pk).update(stock_quantity=4)
+
+        send_low_stock_digest()
+
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(sorted(message.to), ['admin@example.com', 'ops@example.com'])
+        self.assertIn('FAST-1', message.body)
+        self.assertIn('OUT-1', message.body)
+        self.assertNotIn('SLOW-1', message.body)
+
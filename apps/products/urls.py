@@ -11,7 +11,10 @@ from .views import (
     WishlistView,
     WishlistAddView,
     WishlistRemoveView,
-    track_activity
+    track_activity,
+    catalog_cache_stats,
+    bulk_update_products_view,
+    InventorySummaryView
 )
 
 app_name = 'products'
@@ -36,4 +39,9 @@ urlpatterns = [
     
     # Activity tracking
     path('activity/track/', track_activity, name='track-activity'),
+    
+    # Administrative
+    path('admin/cache/stats/', catalog_cache_stats, name='catalog-cache-stats'),
+    path('admin/products/bulk-update/', bulk_update_products_view, name='product-bulk-update'),
+    path('admin/inventory/summary/', InventorySummaryView.as_view(), name='inventory-summary'),
 ]
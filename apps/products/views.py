@@ -6,30 +6,46 @@ from rest_framework import generics, filters, status, serializers
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import JSONRenderer
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.cache import cache
+from django.http import Http404, HttpResponse
 from django.db.models import Q
 from django.db.models import Count # Add this import at the top
 
-from .models import Category, Product, ProductReview, Wishlist
+from .models import Category, InventorySummary, Product, ProductReview, Wishlist
 from .serializers import (
     CategorySerializer,
+    InventorySummarySerializer,
     ProductListSerializer,
     ProductDetailSerializer,
     ProductReviewSerializer,
     WishlistSerializer
 )
-from .filters import ProductFilter
+from .filters import InventorySummaryFilter, ProductFilter, ProductReviewFilter
 from .services import ProductService
+from .cache import (
+    CachedResponseMixin,
+    get_response_cache_stats,
+    get_product_detail_document,
+    get_cached_review_page,
+    set_cached_review_page,
+    normalize_query_params
+)
+from .catalog import bulk_update_products
+from .inventory import refresh_inventory_summary
 from apps.users.models import UserActivity
+from apps.users.permissions import IsAdmin
+from core.common.pagination import KeysetPagination
 
 from django.db.models import Count, Q
 from django.db.models.functions import Coalesce
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(CachedResponseMixin, generics.ListAPIView):
     """List all parent categories with recursive product counts"""
     permission_classes = [AllowAny]
     serializer_class = CategorySerializer
+    cache_name = 'categories'
 
     def get_queryset(self):
         # Annotate with products in this category PLUS products in child categories
@@ -39,8 +55,9 @@ class CategoryListView(generics.ListAPIView):
         ).order_by('name') # Resolves the UnorderedObjectListWarning
 
 
-class ProductListView(generics.ListAPIView):
+class ProductListView(CachedResponseMixin, generics.ListAPIView):
     """List and filter products"""
+    cache_name = 'product_list'
     queryset = Product.objects.filter(is_active=True).select_related('category').order_by('-created_at')
     serializer_class = ProductListSerializer
     permission_classes = [AllowAny]
@@ -51,48 +68,90 @@ class ProductListView(generics.ListAPIView):
 
 
 class ProductDetailView(generics.RetrieveAPIView):
-    """Get product details"""
-    queryset = Product.objects.filter(is_active=True)
+    """Get product details (served from the cached detail document)"""
     serializer_class = ProductDetailSerializer
     permission_classes = [AllowAny]
     lookup_field = 'id'
     
+    def get_queryset(self):
+        return ProductService.get_detail_queryset()
+    
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
+        product_id = kwargs[self.lookup_field]
+        document = get_product_detail_document(product_id, request)
+        if document is None:
+            raise Http404('No Product matches the given query.')
         
+        self.record_view(request, product_id)
+        return Response(document)
+    
+    def record_view(self, request, product_id):
         # Increment view count
-        ProductService.increment_view_count(instance.id)
+        ProductService.increment_view_count(product_id)
         
         # Track user activity
         if request.user.is_authenticated:
-            UserActivity.objects.create(
+            ProductService.record_activity(
+                'view',
+                product_id=product_id,
                 user=request.user,
-                session_id=request.session.session_key or '',
-                activity_type='view',
-                product=instance
+                session_id=request.session.session_key or ''
             )
-        
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
 
 
-class FeaturedProductsView(generics.ListAPIView):
+class FeaturedProductsView(CachedResponseMixin, generics.ListAPIView):
     """Get featured products"""
+    cache_name = 'featured_products'
     queryset = Product.objects.filter(is_active=True, is_featured=True).select_related('category')[:8]
     serializer_class = ProductListSerializer
     permission_classes = [AllowAny]
 
 
 class ProductReviewListCreateView(generics.ListCreateAPIView):
-    """List and create product reviews"""
+    """
+    List and create product reviews
+    
+    The feed filters by ?rating=1..5, orders by ?ordering=-created_at (default)
+    or -helpful_count and pages with cursors. Default-size first pages are
+    cached per product and dropped on review writes.
+    """
     serializer_class = ProductReviewSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_class = ProductReviewFilter
+    ordering_fields = ['created_at', 'helpful_count']
+    ordering = '-created_at'
     
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
         return ProductReview.objects.filter(
             product_id=product_id,
             is_approved=True
-        ).order_by('-created_at')
+        ).select_related('user')
+    
+    def list(self, request, *args, **kwargs):
+        product_id = self.kwargs.get('product_id')
+        # Only first pages of the default page size and a known ordering are cached
+        cacheable = (
+            product_id
+            and not set(request.query_params) - {'rating', 'ordering'}
+            and all(
+                ordering.removeprefix('-') in self.ordering_fields
+                for ordering in request.query_params.getlist('ordering')
+            )
+        )
+        if not cacheable:
+            return super().list(request, *args, **kwargs)
+        
+        variant = f"{request.get_host()}?{normalize_query_params(request.query_params)}"
+        data = get_cached_review_page(product_id, variant)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = JSONRenderer().render(response.data)
+            set_cached_review_page(product_id, variant, data)
+        return HttpResponse(data, content_type='application/json')
     
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -109,10 +168,8 @@ class ProductReviewListCreateView(generics.ListCreateAPIView):
         ).exists():
             raise serializers.ValidationError("You have already reviewed this product")
         
+        # Rating aggregates are updated by the ProductReview post_save signal
         serializer.save(user=self.request.user, product_id=product_id)
-        
-        # Update product rating
-        ProductService.update_product_rating(product_id)
 
 
 class WishlistView(generics.ListAPIView):
@@ -151,6 +208,54 @@ class WishlistRemoveView(generics.DestroyAPIView):
         return Wishlist.objects.filter(user=self.request.user)
 
 
+class InventorySummaryView(generics.ListAPIView):
+    """
+    Per-product stock, 7/30-day units sold and days of cover (admin).
+    GET lists the last refresh (?low_stock=true, ?category=<slug>);
+    POST rebuilds the summary now.
+    """
+    serializer_class = InventorySummarySerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_class = InventorySummaryFilter
+    ordering_fields = ['days_of_cover', 'stock_quantity', 'units_sold_7d', 'units_sold_30d']
+    ordering = ['days_of_cover']
+    
+    def get_queryset(self):
+        return InventorySummary.objects.select_related('product').only(
+            *[f.name for f in InventorySummary._meta.concrete_fields], 'product__name', 'product__sku'
+        )
+    
+    def post(self, request):
+        products = refresh_inventory_summary()
+        return Response({'products': products})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def catalog_cache_stats(request):
+    """Response cache hit/miss counters for the public catalog endpoints"""
+    return Response(get_response_cache_stats())
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def bulk_update_products_view(request):
+    """
+    Bulk price/stock/status changes:
+    {"products": [{"sku": ..., "price": ..., "stock_quantity": ..., "is_active": ...}, ...]}
+    """
+    changes = request.data.get('products') if isinstance(request.data, dict) else request.data
+    if not isinstance(changes, list) or not changes:
+        return Response(
+            {'error': 'products must be a non-empty list'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    summary, results = bulk_update_products(changes)
+    return Response({**summary, 'results': results})
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def track_activity(request):
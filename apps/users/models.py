@@ -8,6 +8,8 @@ from django.db import models
 from django.utils import timezone
 import uuid
 
+from .settings_cache import get_store_settings, invalidate_store_settings
+
 
 class UserManager(BaseUserManager):
     """Custom user manager for email-based authentication"""
@@ -213,11 +215,18 @@ class StoreSettings(models.Model):
     def save(self, *args, **kwargs):
         self.pk = 1
         super(StoreSettings, self).save(*args, **kwargs)
+        invalidate_store_settings()
 
     @classmethod
     def load(cls):
+        """Fresh row from the database (use for updates)"""
         obj, created = cls.objects.get_or_create(pk=1)
         return obj
 
+    @classmethod
+    def current(cls):
+        """Cached, read-only settings for per-request checks"""
+        return get_store_settings()
+
     def __str__(self):
         return "Global Store Settings"
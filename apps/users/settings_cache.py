@@ -0,0 +1,73 @@
+# Location: apps\users\settings_cache.py
+"""
+NexCart Store Settings Cache
+Per-process copy of the StoreSettings singleton, revalidated against a
+shared version stamp so most reads cost neither a DB nor a cache round trip
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STORE_SETTINGS_VERSION_KEY = 'store_settings:version'
+
+_lock = threading.Lock()
+_state = {'settings': None, 'version': None, 'checked_at': 0.0}
+
+
+def _local_ttl():
+    return getattr(settings, 'STORE_SETTINGS_LOCAL_TTL', 5)
+
+
+def _current_version():
+    version = cache.get(STORE_SETTINGS_VERSION_KEY)
+    if version is None:
+        cache.add(STORE_SETTINGS_VERSION_KEY, 1, timeout=None)
+        version = cache.get(STORE_SETTINGS_VERSION_KEY, 1)
+    return version
+
+
+def get_store_settings():
+    """
+    StoreSettings for read-only use. Within STORE_SETTINGS_LOCAL_TTL seconds
+    the process-local copy is returned as is; after that one cache read of the
+    version stamp decides whether the row is loaded again.
+    """
+    from .models import StoreSettings
+
+    now = time.monotonic()
+    cached = _state['settings']
+    if cached is not None and now - _state['checked_at'] < _local_ttl():
+        return cached
+
+    with _lock:
+        try:
+            version = _current_version()
+        except Exception as e:
+            logger.error(f"Error reading store settings version: {str(e)}")
+            version = None
+
+        if _state['settings'] is None or version is None or version != _state['version']:
+            _state['settings'] = StoreSettings.load()
+        _state['version'] = version
+        _state['checked_at'] = now
+        return _state['settings']
+
+
+def invalidate_store_settings():
+    """Drop this process's copy now and every other process's after commit"""
+    _state['settings'] = None
+
+    def bump():
+        try:
+            cache.incr(STORE_SETTINGS_VERSION_KEY)
+        except ValueError:
+            cache.add(STORE_SETTINGS_VERSION_KEY, 1, timeout=None)
+            cache.incr(STORE_SETTINGS_VERSION_KEY)
+        _state['settings'] = None
+
+    transaction.on_commit(bump, robust=True)
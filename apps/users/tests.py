@@ -6,7 +6,8 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import User, UserProfile
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import User, UserProfile, StoreSettings
 
 
 class UserModelTest(TestCase):
@@ -81,4 +82,58 @@ class AuthenticationAPITest(APITestCase):
         }
         response = self.client.post(url, data, format='json')
         
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class StoreSettingsCacheTest(APITestCase):
+    """Test the cached StoreSettings singleton and maintenance mode"""
+    
+    def setUp(self):
+        self.store_settings = StoreSettings.load()
+    
+    def tearDown(self):
+        # Leave a non-maintenance copy cached for the tests that follow
+        self.store_settings.maintenance_mode = False
+        self.store_settings.save()
+        StoreSettings.current()
+    
+    def _enable_maintenance(self):
+        self.store_settings.maintenance_mode = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store_settings.save()
+    
+    def test_reads_are_served_from_process_cache(self):
+        """Test repeated reads cost no queries"""
+        StoreSettings.current()
+        
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertFalse(StoreSettings.current().maintenance_mode)
+    
+    def test_save_invalidates_cached_copy(self):
+        """Test a save is visible on the next read"""
+        StoreSettings.current()
+        
+        self._enable_maintenance()
+        
+        self.assertTrue(StoreSettings.current().maintenance_mode)
+    
+    def test_maintenance_mode_blocks_storefront(self):
+        """Test storefront requests get 503 while exempt paths still work"""
+        self._enable_maintenance()
+        
+        response = self.client.get(reverse('products:product-list'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.get(reverse('api-health')).status_code, status.HTTP_200_OK)
+    
+    def test_admin_passes_maintenance_mode(self):
+        """Test admins can use the API to turn maintenance off"""
+        admin = User.objects.create_superuser(email='admin@example.com', password='adminpass123')
+        self._enable_maintenance()
+        token = str(RefreshToken.for_user(admin).access_token)
+        
+        response = self.client.get(reverse('users:admin-settings'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.json()['maintenance_mode'])
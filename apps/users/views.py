@@ -13,6 +13,7 @@ from django.conf import settings
 import requests
 import logging
 
+from apps.orders.cart_store import merge_guest_cart
 from .models import User, UserProfile, StoreSettings
 from .permissions import IsAdmin
 from .serializers import (
@@ -40,6 +41,9 @@ class RegisterView(APIView):
             # Create user profile
             UserProfile.objects.create(user=user)
             
+            # Carry over the cart built before signing in
+            merge_guest_cart(request, user)
+            
             # Generate tokens
             refresh = RefreshToken.for_user(user)
             
@@ -73,6 +77,9 @@ class LoginView(APIView):
                         'error': 'Account is disabled'
                     }, status=status.HTTP_403_FORBIDDEN)
                 
+                # Carry over the cart built before signing in
+                merge_guest_cart(request, user)
+                
                 # Generate tokens
                 refresh = RefreshToken.for_user(user)
                 
@@ -138,6 +145,9 @@ class GoogleAuthView(APIView):
                 # Create profile
                 UserProfile.objects.create(user=user)
             
+            # Carry over the cart built before signing in
+            merge_guest_cart(request, user)
+            
             # Generate tokens
             refresh = RefreshToken.for_user(user)
             
@@ -226,6 +236,9 @@ class DiscordAuthView(APIView):
             if created:
                 UserProfile.objects.create(user=user)
             
+            # Carry over the cart built before signing in
+            merge_guest_cart(request, user)
+            
             # Generate tokens
             refresh = RefreshToken.for_user(user)
             
@@ -302,6 +315,9 @@ class MicrosoftAuthView(APIView):
             if created:
                 UserProfile.objects.create(user=user)
             
+            # Carry over the cart built before signing in
+            merge_guest_cart(request, user)
+            
             # Generate tokens
             refresh = RefreshToken.for_user(user)
             
@@ -29,6 +29,41 @@ app.conf.beat_schedule = {
         'task': 'apps.orders.tasks.cancel_expired_orders',
         'schedule': crontab(minute=0),
     },
+    # Write changed Redis carts to the database every 5 minutes
+    'persist-dirty-carts': {
+        'task': 'apps.orders.tasks.persist_dirty_carts',
+        'schedule': crontab(minute='*/5'),
+    },
+    # Drop expired Idempotency-Key records hourly
+    'purge-expired-idempotency-keys': {
+        'task': 'apps.orders.tasks.purge_expired_idempotency_keys',
+        'schedule': crontab(minute=30),
+    },
+    # Flush buffered view counts and user activity every minute
+    'flush-buffered-writes': {
+        'task': 'apps.products.tasks.flush_buffered_writes',
+        'schedule': crontab(),
+    },
+    # Return stock held by unpaid orders once their hold expires
+    'release-expired-stock-reservations': {
+        'task': 'apps.products.tasks.release_expired_stock_reservations',
+        'schedule': crontab(),
+    },
+    # Fix drift in denormalized product rating aggregates daily at 3:30 AM
+    'reconcile-product-ratings': {
+        'task': 'apps.products.tasks.reconcile_product_ratings',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    # Rebuild the inventory summary every hour
+    'refresh-inventory-summary': {
+        'task': 'apps.products.tasks.refresh_inventory_summary_task',
+        'schedule': crontab(minute=15),
+    },
+    # Email admins the low-stock digest daily at 7 AM
+    'send-low-stock-digest': {
+        'task': 'apps.products.tasks.send_low_stock_digest',
+        'schedule': crontab(hour=7, minute=0),
+    },
 }
 
 
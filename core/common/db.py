@@ -0,0 +1,137 @@
+# Location: core\common\db.py
+"""
+NexCart Database Utilities
+Set-based helpers for hot write paths
+"""
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+
+def bulk_increment(model, deltas, chunk_size=500, where=None):
+    """
+    Apply per-row integer increments in one UPDATE per chunk.
+
+    `deltas` maps primary key -> {field_name: delta}; every row must carry the
+    same set of fields. `where` ({field_name: value}) limits the update to
+    rows with those column values. PostgreSQL gets `UPDATE ... FROM (VALUES
+    ...)`; other backends fall back to a single UPDATE with CASE expressions.
+    Returns the number of rows updated.
+    """
+    if not deltas:
+        return 0
+
+    items = list(deltas.items())
+    fields = list(items[0][1].keys())
+    where = where or {}
+    updated = 0
+
+    for start in range(0, len(items), chunk_size):
+        chunk = items[start:start + chunk_size]
+        if connection.vendor == 'postgresql':
+            updated += _update_from_values(model, fields, chunk, where)
+        else:
+            updated += _update_with_case(model, fields, chunk, where)
+
+    return updated
+
+
+def _update_from_values(model, fields, chunk, where):
+    qn = connection.ops.quote_name
+    opts = model._meta
+    pk_type = opts.pk.db_type(connection)
+    columns = [opts.get_field(name).column for name in fields]
+    conditions = [(opts.get_field(name), value) for name, value in where.items()]
+
+    row_sql = '(' + ', '.join([f'%s::{pk_type}'] + ['%s::integer'] * len(fields)) + ')'
+    values_sql = ', '.join([row_sql] * len(chunk))
+    aliases = ', '.join(['pk'] + [f'd{i}' for i in range(len(fields))])
+    assignments = ', '.join(
+        f'{qn(column)} = t.{qn(column)} + v.d{i}' for i, column in enumerate(columns)
+    )
+    sql = (
+        f'UPDATE {qn(opts.db_table)} AS t SET {assignments} '
+        f'FROM (VALUES {values_sql}) AS v({aliases}) '
+        f'WHERE t.{qn(opts.pk.column)} = v.pk'
+        + ''.join(f' AND t.{qn(field.column)} = %s' for field, _ in conditions)
+    )
+
+    params = []
+    for pk, row in chunk:
+        params.append(str(pk))
+        params.extend(int(row[name]) for name in fields)
+    params.extend(field.get_db_prep_value(value, connection) for field, value in conditions)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _update_with_case(model, fields, chunk, where):
+    updates = {}
+    for name in fields:
+        whens = [When(pk=pk, then=Value(int(row[name]))) for pk, row in chunk]
+        updates[name] = F(name) + Case(*whens, default=Value(0), output_field=IntegerField())
+    return model.objects.filter(pk__in=[pk for pk, _ in chunk], **where).update(**updates)
+
+
+def bulk_assign(model, rows, fields, chunk_size=1000):
+    """
+    Set per-row column values in one UPDATE per chunk, without building the
+    CASE expressions of QuerySet.bulk_update.
+
+    `rows` maps primary key -> {field_name: value} for every name in `fields`.
+    PostgreSQL gets `UPDATE ... FROM (VALUES ...)`; other backends run one
+    prepared UPDATE per row through executemany.
+    Returns the number of rows updated.
+    """
+    if not rows:
+        return 0
+
+    opts = model._meta
+    model_fields = [opts.get_field(name) for name in fields]
+    params = [
+        [field.get_db_prep_save(row[field.name], connection) for field in model_fields]
+        + [opts.pk.get_db_prep_save(pk, connection)]
+        for pk, row in rows.items()
+    ]
+    updated = 0
+
+    for start in range(0, len(params), chunk_size):
+        chunk = params[start:start + chunk_size]
+        if connection.vendor == 'postgresql':
+            updated += _assign_from_values(model, model_fields, chunk)
+        else:
+            updated += _assign_row_by_row(model, model_fields, chunk)
+
+    return updated
+
+
+def _assign_from_values(model, model_fields, chunk):
+    qn = connection.ops.quote_name
+    opts = model._meta
+    casts = [field.db_type(connection) for field in model_fields] + [opts.pk.db_type(connection)]
+
+    row_sql = '(' + ', '.join(f'%s::{cast}' for cast in casts) + ')'
+    values_sql = ', '.join([row_sql] * len(chunk))
+    aliases = ', '.join([f'v{i}' for i in range(len(model_fields))] + ['pk'])
+    assignments = ', '.join(f'{qn(field.column)} = v.v{i}' for i, field in enumerate(model_fields))
+    sql = (
+        f'UPDATE {qn(opts.db_table)} AS t SET {assignments} '
+        f'FROM (VALUES {values_sql}) AS v({aliases}) '
+        f'WHERE t.{qn(opts.pk.column)} = v.pk'
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in chunk for value in row])
+        return cursor.rowcount
+
+
+def _assign_row_by_row(model, model_fields, chunk):
+    qn = connection.ops.quote_name
+    opts = model._meta
+    assignments = ', '.join(f'{qn(field.column)} = %s' for field in model_fields)
+    sql = f'UPDATE {qn(opts.db_table)} SET {assignments} WHERE {qn(opts.pk.column)} = %s'
+
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, chunk)
+        return cursor.rowcount
@@ -2,8 +2,11 @@
 """
 NexCart Custom Pagination
 """
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination, _reverse_ordering
 from rest_framework.response import Response
+import json
 
 
 class CustomPagination(PageNumberPagination):
@@ -21,4 +24,111 @@ class CustomPagination(PageNumberPagination):
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
             'results': data
-        })
\ No newline at end of file
+        })
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination: pages seek from the last row of the previous
+    page instead of counting and skipping with OFFSET. The cursor carries
+    every ordering column, the requested one followed by created_at and id,
+    so rows tied on the requested column (e.g. helpful_count) are sought
+    past as well.
+    """
+    
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    ordering = '-created_at'
+    # Appended, in the direction of the requested ordering, to make every position unique
+    tiebreak = ('created_at', 'id')
+    
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(super().get_ordering(request, queryset, view))
+        direction = '-' if ordering[0].startswith('-') else ''
+        ordered = {field.lstrip('-') for field in ordering}
+        return ordering + tuple(direction + field for field in self.tiebreak if field not in ordered)
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset, seeking on the full ordering
+        # instead of its first column plus an offset over ties
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+        
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        
+        if current_position is not None:
+            queryset = queryset.filter(self._seek(current_position, reverse))
+        
+        # One extra row tells whether another page follows
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+        
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+        
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+        
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        
+        return self.page
+    
+    def _seek(self, position, reverse):
+        """
+        Rows after `position` in the ordering (before it for reverse cursors):
+        the row comparison (a, b, c) > (x, y, z) spelled out column by column,
+        since the columns may sort in different directions
+        """
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        
+        condition, equal = Q(), Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+    
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            values.append(str(instance[name] if isinstance(instance, dict) else getattr(instance, name)))
+        return json.dumps(values)
@@ -0,0 +1,23 @@
+# Location: core\common\redis_utils.py
+"""
+NexCart Redis Utilities
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def get_redis_client():
+    """
+    Raw Redis client behind the default cache.
+    Returns None when the cache is not Redis-backed (e.g. LocMemCache in dev),
+    so callers can fall back to their direct database path.
+    """
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+    except Exception as e:
+        logger.error(f"Error getting Redis connection: {str(e)}")
+        return None
@@ -57,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.maintenance_middleware.MaintenanceModeMiddleware',
 ]
 
 ROOT_URLCONF = 'core.config.urls'
@@ -249,6 +250,34 @@ else:
         }
     }
 
+# Full-response cache for public catalog endpoints (seconds)
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 300))
+
+# Write-through product detail documents (seconds)
+PRODUCT_DETAIL_CACHE_TIMEOUT = int(os.getenv('PRODUCT_DETAIL_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# How long a pending order holds its stock before the sweeper releases it
+STOCK_RESERVATION_TTL_MINUTES = int(os.getenv('STOCK_RESERVATION_TTL_MINUTES', 30))
+
+# Cart storage: 'database' (Cart/CartItem rows) or 'redis' (hashes persisted at checkout
+# and by the write-behind task); 'redis' falls back to the database without a Redis cache
+CART_STORE = os.getenv('CART_STORE', 'database')
+CART_TTL_DAYS = int(os.getenv('CART_TTL_DAYS', 30))
+
+# How long a stored Idempotency-Key response is replayed
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+# How long a key stays claimed while its first request runs; a crashed request frees it after this.
+# Must exceed the longest a request can run (gunicorn's --timeout, 30s by default), or a slow
+# request loses its claim and a retry runs the view a second time
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 300))
+
+# Low-stock alerts: at or below this many units, or fewer days of cover at the 30-day sell rate
+LOW_STOCK_THRESHOLD = int(os.getenv('LOW_STOCK_THRESHOLD', 5))
+LOW_STOCK_DAYS_OF_COVER = int(os.getenv('LOW_STOCK_DAYS_OF_COVER', 7))
+
+# Seconds a process trusts its copy of StoreSettings before checking the version stamp
+STORE_SETTINGS_LOCAL_TTL = int(os.getenv('STORE_SETTINGS_LOCAL_TTL', 5))
+
 # Celery Configuration
 CELERY_BROKER_URL = REDIS_URL
 if USE_REDIS_SSL:
@@ -0,0 +1,52 @@
+# Location: core\middleware\maintenance_middleware.py
+"""
+NexCart Maintenance Mode Middleware
+Answers 503 while StoreSettings.maintenance_mode is on
+"""
+from django.conf import settings
+from django.http import JsonResponse
+import logging
+
+from apps.users.settings_cache import get_store_settings
+
+logger = logging.getLogger(__name__)
+
+# Reachable during maintenance: the Django admin, login/token refresh
+# (so admins can sign in), health checks and payment webhooks
+DEFAULT_EXEMPT_PATHS = ['/admin/', '/api/users/auth/', '/api/health/', '/api/webhooks/']
+
+
+class MaintenanceModeMiddleware:
+    """Block storefront traffic in maintenance mode; admins pass through"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.exempt_paths = tuple(getattr(settings, 'MAINTENANCE_EXEMPT_PATHS', DEFAULT_EXEMPT_PATHS))
+    
+    def __call__(self, request):
+        if (
+            get_store_settings().maintenance_mode
+            and not request.path.startswith(self.exempt_paths)
+            and not self._is_admin(request)
+        ):
+            response = JsonResponse(
+                {'error': 'The store is down for maintenance. Please try again soon.'},
+                status=503
+            )
+            response['Retry-After'] = '300'
+            return response
+        
+        return self.get_response(request)
+    
+    def _is_admin(self, request):
+        """Session users (Django admin) or a valid admin JWT"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return getattr(user, 'role', None) == 'admin'
+        
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except Exception:
+            return False
+        return result is not None and result[0].role == 'admin'